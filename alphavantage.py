@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Module to decode Alpha Vantage TIME_SERIES_DAILY stock price data
+
+The JSON payload is read from the response stream in fixed size chunks and
+each daily record is matched directly in the raw bytes. The fields of a batch
+of records are then converted in one numpy operation per column and copied
+into one preallocated record array (numpy structured array, OHLCV_DTYPE), so
+no per-line python strings are built and the whitespace/newline layout of
+the payload does not matter.
+
+The DailySeries returned holds views of the record array, one per column,
+oldest trading day first - the columns share one buffer, nothing is copied
+date                   - numpy.datetime64[D]
+open, high, low, close - numpy.float64
+volume                 - numpy.int64
+
+Note - the correct functioning of this code depends on the format of stock
+data/info from www.alphavantage.com
+"""
+
+import collections
+import io
+import re
+import urllib.parse
+import numpy as np
+
+#Columnar price data for one stock symbol
+DailySeries = collections.namedtuple('DailySeries',
+                                     ['date', 'open', 'high', 'low', 'close', 'volume'])
+
+COLUMN_DTYPES = ('datetime64[D]', np.float64, np.float64, np.float64, np.float64,
+                 np.int64)
+
+#One record per trading day - the parser fills one array of these in place &
+#... the DailySeries columns it returns are views of it (see as_series())
+OHLCV_DTYPE = np.dtype(list(zip(DailySeries._fields, COLUMN_DTYPES)))
+
+QUERY_URL = "http://www.alphavantage.co/query"
+API_KEY = "demo"
+
+CHUNK_SIZE = 64 * 1024      # Bytes read from the stream per chunk
+BYTES_PER_RECORD = 150      # Approximate size of one day of data in the payload
+MIN_CAPACITY = 256          # Smallest number of records preallocated
+
+#One day of data, e.g.
+# "2018-03-02": {"1. open": "91.58", "2. high": "93.15", "3. low": "90.86",
+#                "4. close": "93.05", "5. volume": "32830395"}
+_RECORD = re.compile(rb'"(\d{4}-\d{2}-\d{2})"\s*:\s*\{'
+                     rb'\s*"1\. open"\s*:\s*"([^"]*)"\s*,'
+                     rb'\s*"2\. high"\s*:\s*"([^"]*)"\s*,'
+                     rb'\s*"3\. low"\s*:\s*"([^"]*)"\s*,'
+                     rb'\s*"4\. close"\s*:\s*"([^"]*)"\s*,'
+                     rb'\s*"5\. volume"\s*:\s*"([^"]*)"\s*\}')
+
+#Messages returned by the API in place of price data (bad symbol, rate limit)
+_API_MESSAGE = re.compile(rb'"(Error Message|Note|Information)"\s*:\s*"([^"]*)"')
+
+
+class ApiLimitError(ValueError):
+    """
+    Raised when the API returns a call frequency/limit message ("Note" or
+    "Information") in place of price data - the request can be retried later
+    """
+
+
+class NotModified(Exception):
+    """
+    Raised when a conditional request is answered 304 Not Modified - the
+    data already held for the URL is still current
+    """
+
+
+def _grow(records, capacity):
+    """
+    Function to enlarge the preallocated record array
+    Input parameters : records - numpy structured array, capacity - new length
+    Return parameters : numpy structured array with the existing data copied
+    """
+    grown = np.empty(capacity, dtype=records.dtype)
+    grown[:len(records)] = records
+    return grown
+
+
+def as_series(records):
+    """
+    Function to return the columns of a record array as a DailySeries
+    The columns are views of the one record buffer, nothing is copied.
+    Input parameters : records - numpy structured array of OHLCV_DTYPE
+    Return parameters : DailySeries of numpy arrays
+    """
+    return DailySeries(*(records[name] for name in DailySeries._fields))
+
+
+def to_records(prices):
+    """
+    Function to return price data as one record array of OHLCV_DTYPE
+    Input parameters : prices - DailySeries of numpy arrays
+    Return parameters : numpy structured array - the buffer itself (no copy)
+    if the columns are the views of one record array made by as_series()
+    """
+    records = getattr(prices.date, 'base', None)
+    if (isinstance(records, np.ndarray) and records.dtype == OHLCV_DTYPE and
+            len(records) == len(prices.date) and
+            all(column.base is records for column in prices)):
+        return records
+    records = np.empty(len(prices.date), dtype=OHLCV_DTYPE)
+    for name, column in zip(DailySeries._fields, prices):
+        records[name] = column
+    return records
+
+
+def parse_daily(stream, size_hint=0, chunk_size=CHUNK_SIZE):
+    """
+    Function to decode a TIME_SERIES_DAILY payload from a stream into columns
+    Input parameters
+    1. stream - file like object with a read(size) method returning bytes,
+       e.g. the response from urllib.request.urlopen()
+    2. size_hint - integer/expected payload size in bytes (e.g. the
+       Content-Length header), used to size the preallocated arrays
+    3. chunk_size - integer/number of bytes read per chunk
+    Return parameters : DailySeries of numpy arrays, oldest trading day first
+    Raises ValueError if the payload contains no daily price data, or
+    ApiLimitError (a ValueError) for a call frequency message
+    """
+    capacity = max(MIN_CAPACITY, int(size_hint or 0) // BYTES_PER_RECORD + 1)
+    records = np.empty(capacity, dtype=OHLCV_DTYPE)
+    num_records = 0
+    head = b''          # Start of the payload, kept for error messages
+    pending = b''       # Bytes not yet matched, i.e. a partial record
+
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        if len(head) < 1024:
+            head += chunk[:1024 - len(head)]
+        buffer = pending + chunk
+
+        matches = _RECORD.findall(buffer)
+        if matches:
+            #Carry the unmatched tail into the next chunk - it may hold the
+            #... start of a record split across two reads
+            pending = buffer[_last_match_end(buffer, matches[-1]):]
+            records, num_records = _store(records, num_records, matches)
+        else:
+            pending = buffer
+
+    if num_records == 0:
+        message = _API_MESSAGE.search(head + pending)
+        if message:
+            error_type = ValueError if message.group(1) == b'Error Message' \
+                else ApiLimitError
+            raise error_type("Alpha Vantage {} : {}".format(
+                message.group(1).decode('utf-8', 'ignore'),
+                message.group(2).decode('utf-8', 'ignore')))
+        raise ValueError("No daily price data found in the payload")
+
+    #Alpha Vantage lists the most recent day first - reverse into date order,
+    #... one copy of the record buffer, shared by all the columns returned
+    return as_series(records[num_records - 1::-1].copy())
+
+
+def _last_match_end(buffer, last_match):
+    """
+    Function to find the offset just after the last matched record
+    Input parameters : buffer - bytes, last_match - tuple of matched fields
+    Return parameters : integer offset into buffer
+    """
+    start = buffer.rindex(b'"' + last_match[0] + b'"')
+    return _RECORD.match(buffer, start).end()
+
+
+def _store(records, num_records, matches):
+    """
+    Function to convert a batch of matched records & copy them into the
+    record array
+    Input parameters
+    1. records - numpy structured array of OHLCV_DTYPE, preallocated
+    2. num_records - integer/number of records already stored
+    3. matches - list of tuples of bytes (date, open, high, low, close, volume)
+    Return parameters : tuple (record array, enlarged if it was full,
+    integer/number of records stored)
+    """
+    #One fixed width byte array for the whole batch, converted a column at a time
+    fields = np.array(matches, dtype='S24')
+    end = num_records + len(matches)
+    if end > len(records):
+        records = _grow(records, max(end, 2 * len(records)))
+    for col_num, name in enumerate(DailySeries._fields):
+        records[name][num_records:end] = fields[:, col_num].astype(OHLCV_DTYPE[name])
+    return records, end
+
+
+def parse_daily_bytes(data):
+    """
+    Function to decode a TIME_SERIES_DAILY payload already held in memory
+    Input parameters : data - bytes
+    Return parameters : DailySeries of numpy arrays, oldest trading day first
+    """
+    return parse_daily(io.BytesIO(data), len(data))
+
+
+def daily_url(symbol, outputsize='full', apikey=API_KEY, query_url=QUERY_URL):
+    """
+    Function to build the URL of the TIME_SERIES_DAILY data for one symbol
+    Input parameters
+    1. symbol - text/stock symbol e.g. 'MSFT'
+    2. outputsize - text/'full' for the entire history or 'compact' for the
+       latest 100 trading days
+    3. apikey - text/Alpha Vantage API key
+    4. query_url - text/URL of the query service, e.g. a local stand-in
+    Return parameters : text/URL
+    """
+    query = urllib.parse.urlencode((('function', 'TIME_SERIES_DAILY'),
+                                    ('symbol', symbol),
+                                    ('outputsize', outputsize),
+                                    ('apikey', apikey)))
+    return query_url + '?' + query
+
+
+def conditional_headers(validators):
+    """
+    Function to build the headers of a conditional request
+    Input parameters : validators - dictionary with the 'etag' &/or
+    'last_modified' of the data already held, or None
+    Return parameters : dictionary of HTTP headers
+    """
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+def update_validators(validators, response_headers):
+    """
+    Function to keep the ETag & Last-Modified headers of a response, to make
+    the next request for the same URL conditional
+    Input parameters : validators - dictionary updated in place, or None,
+    response_headers - http.client.HTTPMessage
+    """
+    if validators is not None:
+        validators['etag'] = response_headers.get('ETag')
+        validators['last_modified'] = response_headers.get('Last-Modified')
+
+
+def fetch_daily(url, timeout=30, validators=None):
+    """
+    Function to read & decode the TIME_SERIES_DAILY data at a URL
+    The response is decoded as it is read, it is never held whole in memory.
+    Input parameters
+    1. url - text
+    2. timeout - seconds to wait for the server
+    3. validators - dictionary with the 'etag' & 'last_modified' of the last
+       response for this URL, sent as If-None-Match & If-Modified-Since &
+       updated in place from the new response. None for a plain request.
+    Return parameters : DailySeries of numpy arrays, oldest trading day first
+    Raises NotModified if the server answers 304, urllib.error.URLError on
+    network errors & ValueError on bad data
+    """
+    #Imported here - callers that only decode payloads do not need it
+    import urllib.error
+    import urllib.request
+    request = urllib.request.Request(url, headers=conditional_headers(validators))
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            prices = parse_daily(response, response.getheader('Content-Length', 0))
+            update_validators(validators, response.headers)
+            return prices
+    except urllib.error.HTTPError as err:
+        if err.code == 304:
+            raise NotModified(url)
+        raise
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+Program to render the stock price charts of a whole watchlist to image files,
+headless (matplotlib Agg backend, no window), on a pool of worker processes
+
+1. The price history of every symbol is brought up to date in the local cache
+   first, all symbols concurrently (fetch_engine.py & price_cache.py).
+2. Each worker process then opens the cached (memory-mapped) data of a symbol
+   & draws its line chart (as matplotlib1.py) & candlestick chart (as
+   Candlestick_1.py), see stock_charts.py. Each worker creates one figure
+   when it starts & clears & reuses it for every chart it draws.
+
+Use from the command line, e.g.
+    python batch_charts.py --out charts --format png svg MSFT AAPL IBM
+    python batch_charts.py MSFT IBM --indicator SMA:50 RSI:14
+"""
+
+import argparse
+import multiprocessing
+import os
+
+import alphavantage
+import fetch_engine
+import indicators
+import price_cache
+
+CHARTS = ('line', 'candlestick')
+FORMATS = ('png',)
+FIGURE_SIZE = (10, 6)   # inches
+DPI = 100
+
+#The figure of a worker process, created by _init_worker()
+_figure = None
+
+
+def _init_worker(figure_size, dpi):
+    """
+    Function run once in each worker process to create the reused figure
+    """
+    #Matplotlib is imported by the worker processes only - the parent process
+    #... just downloads & hands out the symbols
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    global _figure
+    _figure = Figure(figsize=figure_size, dpi=dpi)
+    FigureCanvasAgg(_figure)
+
+
+def draw_chart(fig, chart, symbol, prices, overlays=()):
+    """
+    Function to draw one chart of a stock symbol on a (cleared) figure
+    Input parameters
+    1. fig - matplotlib figure
+    2. chart - text/'line' or 'candlestick'
+    3. symbol - text/stock symbol
+    4. prices - DailySeries of numpy arrays
+    5. overlays - list of indicator objects drawn on the chart
+    Return parameters : list of chart objects, to be kept until the figure is saved
+    """
+    import stock_charts
+
+    fig.clear()
+    ax = fig.add_subplot(1, 1, 1)
+    if chart == 'line':
+        line_charts = stock_charts.plot_close_prices(ax, symbol, prices, overlays)
+        stock_charts.format_line_chart(ax, symbol)
+        fig.tight_layout()
+        return line_charts
+    if chart == 'candlestick':
+        return stock_charts.plot_candlestick(fig, ax, symbol, prices, overlays=overlays)
+    raise ValueError("Unknown chart {}, expected one of {}".format(chart, CHARTS))
+
+
+def _render_symbol(task):
+    """
+    Function run in a worker process to draw & save the charts of one symbol
+    Input parameters : task - tuple (symbol, out_dir, charts, formats,
+    cache_dir, indicator_specs)
+    Return parameters : tuple (symbol, list of file names written, error text
+    or None)
+    """
+    symbol, out_dir, charts, formats, cache_dir, indicator_specs = task
+    prices = price_cache.load_cached(symbol, cache_dir)
+    if prices is None or len(prices.date) == 0:
+        return symbol, [], "No cached price data"
+    file_names = []
+    try:
+        for chart in charts:
+            overlays = [indicators.from_spec(spec) for spec in indicator_specs]
+            chart_objects = draw_chart(_figure, chart, symbol, prices, overlays)
+            for file_format in formats:
+                file_name = os.path.join(out_dir, '{}_{}.{}'.format(symbol, chart,
+                                                                    file_format))
+                _figure.savefig(file_name, format=file_format)
+                file_names.append(file_name)
+            del chart_objects
+    except Exception as err:
+        return symbol, file_names, "{} : {}".format(type(err).__name__, err)
+    return symbol, file_names, None
+
+
+def render_watchlist(symbols, out_dir, charts=CHARTS, formats=FORMATS, processes=None,
+                     cache_dir=price_cache.CACHE_DIR, refresh=True,
+                     apikey=alphavantage.API_KEY, query_url=alphavantage.QUERY_URL,
+                     figure_size=FIGURE_SIZE, dpi=DPI, indicator_specs=()):
+    """
+    Function to render the charts of a list of stock symbols to image files
+    Input parameters
+    1. symbols - list of text/stock symbols
+    2. out_dir - text/directory the files are written to, created if needed
+    3. charts - tuple of text/charts drawn per symbol, see CHARTS
+    4. formats - tuple of text/file formats, e.g. ('png', 'svg')
+    5. processes - integer/number of worker processes, the number of CPUs if
+       not given
+    6. cache_dir - text/price cache directory
+    7. refresh - boolean, if True the cache is updated from the web first
+    8. apikey, query_url - see alphavantage.daily_url()
+    9. figure_size, dpi - size of the images in inches & dots per inch
+    10. indicator_specs - list of text/indicators drawn on every chart, e.g.
+        ['SMA:50', 'Bollinger:20:2'], see indicators.from_spec()
+    Return parameters : dictionary of symbol -> (list of file names written,
+    error text or None)
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    results = {}
+    if refresh:
+        #Downloading is I/O bound - use threads, not the process pool
+        with fetch_engine.Fetcher() as fetcher:
+            loaded = fetcher.load_many(symbols, cache_dir, True, apikey, query_url)
+        for symbol, prices in loaded.items():
+            if isinstance(prices, Exception):
+                results[symbol] = ([], "{} : {}".format(type(prices).__name__, prices))
+
+    #Check the indicators before starting the workers
+    for spec in indicator_specs:
+        indicators.from_spec(spec)
+    tasks = [(symbol, out_dir, tuple(charts), tuple(formats), cache_dir,
+              tuple(indicator_specs)) for symbol in symbols if symbol not in results]
+    with multiprocessing.Pool(processes, initializer=_init_worker,
+                              initargs=(figure_size, dpi)) as pool:
+        for symbol, file_names, error in pool.imap_unordered(_render_symbol, tasks):
+            results[symbol] = (file_names, error)
+    return results
+
+
+def main():
+    """
+    Function to read the command line options & render the watchlist
+    """
+    parser = argparse.ArgumentParser(description="Render stock price charts to files")
+    parser.add_argument('symbols', nargs='+', help="stock symbols e.g. MSFT AAPL")
+    parser.add_argument('--out', default='charts', help="output directory")
+    parser.add_argument('--chart', nargs='+', choices=CHARTS, default=list(CHARTS),
+                        help="charts drawn for each symbol")
+    parser.add_argument('--format', nargs='+', default=list(FORMATS),
+                        help="image file formats e.g. png svg")
+    parser.add_argument('--indicator', nargs='+', default=[],
+                        help="indicators drawn on the charts e.g. SMA:50 Bollinger:20:2 RSI:14")
+    parser.add_argument('--processes', type=int, default=None,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument('--cache-dir', default=price_cache.CACHE_DIR)
+    parser.add_argument('--no-refresh', action='store_true',
+                        help="use the cached price data without reading the web")
+    parser.add_argument('--query-url', default=alphavantage.QUERY_URL)
+    parser.add_argument('--apikey', default=alphavantage.API_KEY)
+    args = parser.parse_args()
+
+    results = render_watchlist([symbol.upper() for symbol in args.symbols], args.out,
+                               args.chart, args.format, args.processes, args.cache_dir,
+                               not args.no_refresh, args.apikey, args.query_url,
+                               indicator_specs=args.indicator)
+    for symbol, (file_names, error) in sorted(results.items()):
+        if error is None:
+            print("{} : {} files written".format(symbol, len(file_names)))
+        else:
+            print("{} : Error - {}".format(symbol, error))
+
+
+if __name__ == '__main__':
+    main()
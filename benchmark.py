@@ -0,0 +1,311 @@
+# -*- coding: utf-8 -*-
+"""
+Program to time each stage of the stock price pipeline (read -> decode ->
+store -> draw) on synthetic Alpha Vantage payloads of growing size
+
+1. synthetic_payload() builds a TIME_SERIES_DAILY payload of any number of
+   daily bars (a random walk on business days, most recent day first, as
+   Alpha Vantage sends it). The payloads are written to files & served by the
+   local stand-in server (stub_server.py), or read from the files directly.
+2. Each stage is run 'repeat' times & the fastest time is kept, then run once
+   more under tracemalloc to measure its peak memory (python & numpy
+   allocations).
+3. The results are printed as bars/second, MB/second & peak MB per stage &
+   compared with a baseline file - a stage slower than the baseline by more
+   than the tolerance is reported as a regression.
+
+Use from the command line, e.g.
+    python benchmark.py
+    python benchmark.py --sizes 1000 10000 100000 1000000 --source file
+    python benchmark.py --save-baseline
+"""
+
+import argparse
+import io
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import urllib.request
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import alphavantage
+import batch_charts
+import indicators
+import ohlcv_store
+import price_db
+import stock_dates
+import stub_server
+
+SIZES = (1000, 10000, 100000)
+SOURCES = ('http', 'file')
+STAGES = ('download', 'fetch_decode', 'decode', 'dates', 'store_write', 'store_read',
+          'db_save', 'db_load', 'indicators', 'render_line', 'render_candlestick')
+BASELINE_FILE = 'benchmark_baseline.json'
+TOLERANCE = 1.25            # Slower than baseline * TOLERANCE is a regression
+MEGABYTE = 1024 * 1024
+
+#One day of data in the layout Alpha Vantage uses
+RECORD_FORMAT = ('    "{}": {{\n        "1. open": "{:.4f}",\n        "2. high": "{:.4f}",\n'
+                 '        "3. low": "{:.4f}",\n        "4. close": "{:.4f}",\n'
+                 '        "5. volume": "{}"\n    }}')
+
+
+def synthetic_payload(num_bars, symbol='BENCH', seed=0):
+    """
+    Function to build a TIME_SERIES_DAILY payload of random daily bars
+    Input parameters
+    1. num_bars - integer/number of trading days
+    2. symbol - text/stock symbol written in the meta data
+    3. seed - integer/random number seed, the same seed gives the same payload
+    Return parameters : bytes, most recent day first
+    """
+    rng = np.random.RandomState(seed)
+    dates = np.busday_offset(np.datetime64('1900-01-01', 'D'), np.arange(num_bars),
+                             roll='forward')
+    close = 100.0 * np.exp(np.cumsum(rng.normal(0.0, 0.01, num_bars)))
+    open_price = close * np.exp(rng.normal(0.0, 0.005, num_bars))
+    spread = np.abs(rng.normal(0.0, 0.01, num_bars)) * close
+    high = np.maximum(open_price, close) + spread
+    low = np.minimum(open_price, close) - spread
+    volume = rng.randint(100000, 50000000, num_bars)
+
+    records = ',\n'.join(RECORD_FORMAT.format(*row) for row in zip(
+        dates[::-1].astype(str), open_price[::-1], high[::-1], low[::-1],
+        close[::-1], volume[::-1]))
+    return ('{{\n    "Meta Data": {{\n        "1. Information": "Daily Prices",\n'
+            '        "2. Symbol": "{}",\n        "3. Last Refreshed": "{}"\n    }},\n'
+            '    "Time Series (Daily)": {{\n{}\n    }}\n}}'
+            .format(symbol, dates[-1], records)).encode('ascii')
+
+
+def write_payloads(payload_dir, sizes):
+    """
+    Function to write one synthetic payload file per size, named so the
+    stand-in server serves it for symbol 'BENCH<size>'
+    Return parameters : dictionary of size -> (symbol, file name, payload size)
+    """
+    os.makedirs(payload_dir, exist_ok=True)
+    payloads = {}
+    for num_bars in sizes:
+        symbol = 'BENCH{}'.format(num_bars)
+        file_name = os.path.join(payload_dir, symbol + '.json')
+        data = synthetic_payload(num_bars, symbol)
+        with open(file_name, 'wb') as payload_file:
+            payload_file.write(data)
+        payloads[num_bars] = (symbol, file_name, len(data))
+    return payloads
+
+
+def measure(function, repeat=3):
+    """
+    Function to time a benchmark stage & measure its peak memory
+    Input parameters : function - called with no arguments, repeat - integer
+    Return parameters : tuple (fastest time in seconds, peak bytes allocated,
+    result of the last call)
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    del result
+    #Memory is measured in a separate run - tracemalloc slows python code down
+    tracemalloc.start()
+    try:
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return best, peak, result
+
+
+def _read_url(url):
+    with urllib.request.urlopen(url) as response:
+        return response.read()
+
+
+def _read_file(file_name):
+    with open(file_name, 'rb') as payload_file:
+        return payload_file.read()
+
+
+def _decode_file(file_name):
+    with open(file_name, 'rb') as payload_file:
+        return alphavantage.parse_daily(payload_file, os.path.getsize(file_name))
+
+
+def _render(fig, chart, symbol, prices):
+    chart_objects = batch_charts.draw_chart(fig, chart, symbol, prices)
+    fig.savefig(io.BytesIO(), format='png')
+    return chart_objects
+
+
+def run_benchmarks(sizes=SIZES, source='http', repeat=3, stages=STAGES, work_dir=None):
+    """
+    Function to run the benchmark stages on payloads of each size
+    Input parameters
+    1. sizes - list of integers/numbers of daily bars
+    2. source - text/'http' payloads read from the local stand-in server,
+       'file' payloads read from files
+    3. repeat - integer/number of timed runs of each stage, the fastest is kept
+    4. stages - list of text/stages run, see STAGES
+    5. work_dir - text/directory for the payload, store & database files, a
+       temporary directory (removed afterwards) if not given
+    Return parameters : list of dictionaries, one per stage & size, with keys
+    stage, bars, bytes, seconds, peak_bytes
+    """
+    temp_dir = tempfile.mkdtemp(prefix='stock_bench_') if work_dir is None else None
+    work_dir = temp_dir or work_dir
+    server = None
+    results = []
+    try:
+        payloads = write_payloads(os.path.join(work_dir, 'payloads'), sizes)
+        if source == 'http':
+            server, query_url = stub_server.start_server(os.path.join(work_dir, 'payloads'))
+        conn = price_db.connect(os.path.join(work_dir, 'bench.db'))
+        fig = Figure(figsize=batch_charts.FIGURE_SIZE, dpi=batch_charts.DPI)
+        FigureCanvasAgg(fig)
+        store_dir = os.path.join(work_dir, 'store')
+        overlays = [indicators.SMA(50), indicators.Bollinger(20, 2), indicators.RSI(14),
+                    indicators.ATR(14)]
+
+        for num_bars in sizes:
+            symbol, file_name, num_bytes = payloads[num_bars]
+            if source == 'http':
+                url = alphavantage.daily_url(symbol, query_url=query_url)
+                read_raw = lambda: _read_url(url)
+                read_decode = lambda: alphavantage.fetch_daily(url)
+            else:
+                read_raw = lambda: _read_file(file_name)
+                read_decode = lambda: _decode_file(file_name)
+            data = _read_file(file_name)
+            prices = alphavantage.parse_daily_bytes(data)
+
+            stage_functions = {
+                'download': (read_raw, num_bytes),
+                'fetch_decode': (read_decode, num_bytes),
+                'decode': (lambda: alphavantage.parse_daily_bytes(data), num_bytes),
+                'dates': (lambda: stock_dates.to_mpl_dates(prices.date), 0),
+                'store_write': (lambda: ohlcv_store.write_series(symbol, prices, store_dir), 0),
+                'store_read': (lambda: [np.array(column) for column in
+                                        ohlcv_store.open_series(symbol, store_dir)], 0),
+                'db_save': (lambda: price_db.save_prices(conn, symbol, prices), 0),
+                'db_load': (lambda: price_db.load_prices(conn, symbol), 0),
+                'indicators': (lambda: [indicator.compute(prices) for indicator in overlays], 0),
+                'render_line': (lambda: _render(fig, 'line', symbol, prices), 0),
+                'render_candlestick': (lambda: _render(fig, 'candlestick', symbol, prices), 0),
+            }
+            for stage in stages:
+                function, stage_bytes = stage_functions[stage]
+                if stage == 'store_read':
+                    ohlcv_store.write_series(symbol, prices, store_dir)
+                elif stage == 'db_load':
+                    price_db.save_prices(conn, symbol, prices)
+                seconds, peak, _ = measure(function, repeat)
+                results.append({'stage': stage, 'bars': num_bars, 'bytes': stage_bytes,
+                                'seconds': seconds, 'peak_bytes': peak})
+        conn.close()
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        if temp_dir is not None:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return results
+
+
+def _key(result):
+    return '{}:{}'.format(result['stage'], result['bars'])
+
+
+def load_baseline(file_name=BASELINE_FILE):
+    """
+    Function to read a baseline file
+    Return parameters : dictionary of 'stage:bars' -> result dictionary, empty
+    if there is no baseline file
+    """
+    try:
+        with open(file_name) as baseline_file:
+            return json.load(baseline_file)['results']
+    except (OSError, ValueError, KeyError):
+        return {}
+
+
+def save_baseline(results, file_name=BASELINE_FILE):
+    """
+    Function to write the results as the new baseline file
+    """
+    with open(file_name, 'w') as baseline_file:
+        json.dump({'python': sys.version.split()[0], 'numpy': np.__version__,
+                   'results': {_key(result): result for result in results}},
+                  baseline_file, indent=1, sort_keys=True)
+
+
+def print_report(results, baseline=None, tolerance=TOLERANCE):
+    """
+    Function to print the throughput & peak memory of each stage, with the
+    change against the baseline
+    Return parameters : list of text/'stage:bars' keys slower than the
+    baseline by more than the tolerance
+    """
+    baseline = baseline or {}
+    regressions = []
+    print('{:<20}{:>9}{:>11}{:>14}{:>10}{:>10}{:>10}'.format(
+        'stage', 'bars', 'ms', 'bars/s', 'MB/s', 'peak MB', 'vs base'))
+    for result in results:
+        seconds = max(result['seconds'], 1e-9)
+        mb_per_second = '{:.1f}'.format(result['bytes'] / MEGABYTE / seconds) \
+            if result['bytes'] else '-'
+        change = ''
+        base = baseline.get(_key(result))
+        if base is not None:
+            ratio = seconds / max(base['seconds'], 1e-9)
+            change = '{:.2f}x'.format(ratio)
+            if ratio > tolerance:
+                change += ' !'
+                regressions.append(_key(result))
+        print('{:<20}{:>9}{:>11.2f}{:>14.0f}{:>10}{:>10.1f}{:>10}'.format(
+            result['stage'], result['bars'], seconds * 1000, result['bars'] / seconds,
+            mb_per_second, result['peak_bytes'] / MEGABYTE, change))
+    return regressions
+
+
+def main():
+    """
+    Function to read the command line options, run the benchmarks & report
+    """
+    parser = argparse.ArgumentParser(description="Benchmark the stock price pipeline")
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(SIZES),
+                        help="numbers of daily bars e.g. 1000 10000 1000000")
+    parser.add_argument('--source', choices=SOURCES, default='http',
+                        help="read the payloads from the local server or from files")
+    parser.add_argument('--stage', nargs='+', choices=STAGES, default=list(STAGES),
+                        help="stages to run")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="timed runs of each stage, the fastest is reported")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline file")
+    parser.add_argument('--save-baseline', action='store_true',
+                        help="write the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="slowdown against the baseline reported as a regression")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.source, args.repeat, args.stage)
+    regressions = print_report(results, load_baseline(args.baseline), args.tolerance)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+        print("Baseline written to {}".format(args.baseline))
+    elif regressions:
+        print("Slower than the baseline : {}".format(', '.join(regressions)))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+Module to draw candlestick charts of daily stock prices
+
+Replaces candlestick_ohlc() from the old matplotlib.finance module, which
+created one Rectangle & one Line2D artist per bar. Here the price arrays are
+used directly : the vertices of every candle body are built in one numpy
+operation & drawn as a single PolyCollection, and every wick (high-low line)
+as a single LineCollection, so tens of thousands of bars stay quick to draw.
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.colors import to_rgba
+
+COLOR_UP = 'g'      # Close >= open
+COLOR_DOWN = 'r'    # Close < open
+
+
+def candle_vertices(dates, open_price, close_price, width=0.6):
+    """
+    Function to build the corner points of the candle bodies
+    Input parameters
+    1. dates - array of matplotlib date numbers (x axis)
+    2. open_price, close_price - arrays of float
+    3. width - float/width of a body in days
+    Return parameters : numpy array, shape (bars, 4, 2)
+    """
+    dates = np.asarray(dates, dtype=np.float64)
+    half_width = width / 2.0
+    verts = np.empty((len(dates), 4, 2))
+    verts[:, (0, 1), 0] = (dates - half_width)[:, None]
+    verts[:, (2, 3), 0] = (dates + half_width)[:, None]
+    verts[:, (0, 3), 1] = np.asarray(open_price)[:, None]
+    verts[:, (1, 2), 1] = np.asarray(close_price)[:, None]
+    return verts
+
+
+def wick_segments(dates, high_price, low_price):
+    """
+    Function to build the end points of the candle wicks (low to high lines)
+    Input parameters : dates - array of matplotlib date numbers,
+    high_price, low_price - arrays of float
+    Return parameters : numpy array, shape (bars, 2, 2)
+    """
+    segments = np.empty((len(dates), 2, 2))
+    segments[:, :, 0] = np.asarray(dates, dtype=np.float64)[:, None]
+    segments[:, 0, 1] = low_price
+    segments[:, 1, 1] = high_price
+    return segments
+
+
+def candle_colors(open_price, close_price, colorup=COLOR_UP, colordown=COLOR_DOWN,
+                  alpha=1.0):
+    """
+    Function to return the RGBA colour of each candle
+    Input parameters : open_price, close_price - arrays of float,
+    colorup, colordown - matplotlib colours, alpha - float/opacity
+    Return parameters : numpy array, shape (bars, 4)
+    """
+    palette = np.array([to_rgba(colordown, alpha), to_rgba(colorup, alpha)])
+    return palette[(np.asarray(close_price) >= np.asarray(open_price)).astype(np.intp)]
+
+
+def candlestick_ohlc(ax, dates, open_price, high_price, low_price, close_price,
+                     width=0.6, colorup=COLOR_UP, colordown=COLOR_DOWN, alpha=1.0,
+                     label=None):
+    """
+    Function to draw a candlestick chart on a matplotlib axes
+    Input parameters
+    1. ax - matplotlib axes
+    2. dates - array of matplotlib date numbers (see stock_dates.to_mpl_dates)
+    3. open_price, high_price, low_price, close_price - arrays of float
+    4. width - float/width of a candle body in days
+    5. colorup, colordown - matplotlib colours of rising & falling candles
+    6. alpha - float/opacity
+    7. label - text/legend label
+    Return parameters : tuple (LineCollection of wicks, PolyCollection of bodies)
+    """
+    colors = candle_colors(open_price, close_price, colorup, colordown, alpha)
+    wicks = LineCollection(wick_segments(dates, high_price, low_price),
+                           colors=colors, linewidths=0.5)
+    bodies = PolyCollection(candle_vertices(dates, open_price, close_price, width),
+                            facecolors=colors, edgecolors=colors, linewidths=0.5,
+                            label=label)
+    ax.add_collection(wicks)
+    ax.add_collection(bodies)
+
+    #Collections are not included in the axes data limits automatically
+    if len(dates) > 0:
+        dates = np.asarray(dates, dtype=np.float64)
+        ax.update_datalim(((dates.min() - width, np.min(low_price)),
+                           (dates.max() + width, np.max(high_price))))
+        ax.autoscale_view()
+    return wicks, bodies
+
+
+def update_candles(wicks, bodies, dates, open_price, high_price, low_price,
+                   close_price, width=0.6, colorup=COLOR_UP, colordown=COLOR_DOWN,
+                   alpha=1.0):
+    """
+    Function to replace the bars drawn by candlestick_ohlc() with new data,
+    reusing the existing artists
+    Input parameters : wicks, bodies - as returned by candlestick_ohlc(),
+    the rest as for candlestick_ohlc()
+    Return parameters : None
+    """
+    colors = candle_colors(open_price, close_price, colorup, colordown, alpha)
+    wicks.set_segments(wick_segments(dates, high_price, low_price))
+    wicks.set_color(colors)
+    bodies.set_verts(candle_vertices(dates, open_price, close_price, width))
+    bodies.set_facecolor(colors)
+    bodies.set_edgecolor(colors)
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+"""
+Program & module to bulk import used car listings (e.g. a dealer feed) from a
+CSV or JSONL file into the cars_for_sale table of sqlite_database1.py
+
+1. The file is read in batches of 'batch_rows' rows, so the memory used does
+   not grow with the size of the file.
+2. Each batch is checked a column at a time with numpy - the integer columns
+   are converted in one step & compared with column_min_max, the text columns
+   must not be empty. Rows that fail are rejected & counted by column, only a
+   few examples of each batch's rejects are reported.
+3. The good rows of a batch are written with one executemany() in one
+   transaction, INSERT OR IGNORE as add_cars() - a row with an ID already in
+   the table is skipped. While importing the database uses WAL with
+   synchronous=NORMAL (one fsync per checkpoint, not per commit).
+4. For large imports the secondary indexes (table_indexes) & the full text
+   search index can be dropped & built again at the end, which is much
+   quicker than updating them row by row.
+
+CSV files have a header line of column names (any case & order, see
+sqlite_database1.column_names), JSONL files one object per line with column
+names as keys. The ID may be left out or empty, sqlite3 then chooses it.
+
+Use from the command line, e.g.
+    python car_import.py dealer_feed.csv --db used_car_stock.db --drop-indexes
+"""
+
+import argparse
+import collections
+import csv
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+import sqlite_database1
+
+BATCH_ROWS = 100000         # Rows per transaction
+MAX_EXAMPLES = 3            # Rejected rows reported per batch
+FORMATS = ('csv', 'jsonl')
+
+#Pragmas set for the duration of an import
+IMPORT_PRAGMAS = (('journal_mode', 'WAL'), ('synchronous', 'NORMAL'),
+                  ('cache_size', '-65536'), ('temp_store', 'MEMORY'))
+
+ImportSummary = collections.namedtuple('ImportSummary', ['rows_read', 'rows_written',
+                                                         'rows_rejected', 'rows_ignored',
+                                                         'seconds'])
+
+BatchReport = collections.namedtuple('BatchReport', ['batch', 'first_line', 'last_line',
+                                                     'rows_written', 'rows_rejected',
+                                                     'rows_ignored', 'reject_counts',
+                                                     'examples'])
+
+
+def file_format(file_name):
+    """
+    Function to choose the file format from the file name extension
+    Return parameters : text/'csv' or 'jsonl'
+    """
+    extension = os.path.splitext(file_name)[1].lower().lstrip('.')
+    if extension in ('json', 'jsonl', 'ndjson'):
+        return 'jsonl'
+    return 'csv'
+
+
+def _column_numbers(names):
+    """
+    Function to find the column number of each field of the file
+    Input parameters : names - list of text/field names of the file
+    Return parameters : list of integers, one per column of the table, the
+    field number of that column or None if the file does not have it
+    Raises ValueError if a column other than ID is missing
+    """
+    fields = {str(name).strip().lower(): field_num for field_num, name in enumerate(names)}
+    numbers = [fields.get(col_name.lower()) for col_name in sqlite_database1.column_names]
+    missing = [col_name for col_name, number in zip(sqlite_database1.column_names, numbers)
+               if number is None and col_name != 'ID']
+    if missing:
+        raise ValueError("Columns {} not found in the file, it has {}".format(missing, names))
+    return numbers
+
+
+def read_csv(stream, batch_rows=BATCH_ROWS):
+    """
+    Function to read a CSV file in batches
+    Input parameters : stream - open text file, batch_rows - integer
+    Yield parameters : tuple
+    1. list of tuples, one per table column in column_names order, holding the
+       values of each row of the batch (None for a column the file does not have)
+    2. integer/file line number of the first row
+    3. integer/number of rows
+    """
+    reader = csv.reader(stream)
+    numbers = _column_numbers(next(reader, []))
+    line = 2
+    while True:
+        rows = list(itertools.islice(reader, batch_rows))
+        if not rows:
+            return
+        #Turn the rows into columns in one step - short rows are filled with '',
+        #.. which is rejected as empty
+        fields = list(itertools.zip_longest(*rows, fillvalue=''))
+        missing = (None,) * len(rows)
+        yield ([missing if number is None or number >= len(fields) else fields[number]
+                for number in numbers], line, len(rows))
+        line += len(rows)
+
+
+def read_jsonl(stream, batch_rows=BATCH_ROWS):
+    """
+    Function to read a JSONL file in batches
+    Input parameters & yield parameters : as read_csv(), a line that is not a
+    JSON object gives a row of None values, which is rejected
+    """
+    names = [col_name.lower() for col_name in sqlite_database1.column_names]
+    line = 1
+    while True:
+        lines = list(itertools.islice(stream, batch_rows))
+        if not lines:
+            return
+        records = []
+        for text in lines:
+            try:
+                records.append({key.lower(): value for key, value in json.loads(text).items()})
+            except (ValueError, AttributeError):
+                records.append({})
+        yield [tuple(record.get(name) for record in records) for name in names], \
+            line, len(lines)
+        line += len(lines)
+
+
+def _integer_column(values):
+    """
+    Function to convert a column of values to integers
+    Input parameters : values - tuple of text or numbers
+    Return parameters : tuple (numpy array of int64, numpy array of bool, True
+    where the value is a whole number)
+    """
+    #All text or all integers convert in one step (numpy would truncate floats)
+    if set(map(type, values)) in ({str}, {int}):
+        try:
+            return np.array(values, dtype=np.int64), np.ones(len(values), dtype=bool)
+        except (ValueError, OverflowError):
+            pass
+    numbers = np.zeros(len(values), dtype=np.int64)
+    valid = np.zeros(len(values), dtype=bool)
+    for row_num, value in enumerate(values):
+        try:
+            number = int(value)
+            if number == float(value):
+                numbers[row_num] = number
+                valid[row_num] = True
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return numbers, valid
+
+
+def validate(columns):
+    """
+    Function to check a batch of rows against the table columns, a column at
+    a time
+    1. INTEGER columns must be whole numbers within column_min_max (if given)
+    2. TEXT columns must not be empty
+    3. The ID may be missing (None or empty), sqlite3 then chooses it
+    Input parameters : columns - list of tuples from read_csv() or read_jsonl()
+    Return parameters : tuple
+    1. list of tuples, the good rows converted to the column types
+    2. numpy array of bool, True for each good row
+    3. list of numpy arrays of bool, one per column, True where the value is bad
+    """
+    bad_columns = []
+    converted = []
+    for col_num, values in enumerate(columns):
+        if sqlite_database1.column_types[col_num] == 'INTEGER':
+            missing = None
+            if col_num == 0 and (None in values or '' in values):
+                missing = np.array([value is None or value == '' for value in values])
+                values = [0 if empty else value for empty, value in zip(missing, values)]
+            numbers, valid = _integer_column(values)
+            if sqlite_database1.column_min_max[col_num]:
+                min_value, max_value = sqlite_database1.column_min_max[col_num]
+                valid &= (numbers >= min_value) & (numbers <= max_value)
+            numbers = numbers.tolist()
+            if missing is not None:
+                valid |= missing
+                numbers = [None if empty else number for empty, number
+                           in zip(missing.tolist(), numbers)]
+            converted.append(numbers)
+        else:
+            if set(map(type, values)) == {str} and '' not in values:
+                valid = np.ones(len(values), dtype=bool)
+            else:
+                valid = np.array([isinstance(value, str) and value != ''
+                                  for value in values], dtype=bool)
+            converted.append(values)
+        bad_columns.append(~valid)
+    good = ~np.logical_or.reduce(bad_columns)
+    return list(itertools.compress(zip(*converted), good.tolist())), good, bad_columns
+
+
+def _rejects(columns, first_line, good, bad_columns, max_examples=MAX_EXAMPLES):
+    """
+    Function to count the rejected rows of a batch by column & describe a few
+    Return parameters : tuple (dictionary of text/column name -> integer count,
+    list of text/examples)
+    """
+    counts = {}
+    for col_name, bad in zip(sqlite_database1.column_names, bad_columns):
+        if bad.any():
+            counts[col_name] = int(bad.sum())
+    examples = []
+    for row_num in np.flatnonzero(~good)[:max_examples].tolist():
+        reasons = ['{} {!r}'.format(col_name, columns[col_num][row_num])
+                   for col_num, col_name in enumerate(sqlite_database1.column_names)
+                   if bad_columns[col_num][row_num]]
+        examples.append('line {} : {}'.format(first_line + row_num, ', '.join(reasons)))
+    return counts, examples
+
+
+def print_report(report):
+    """
+    Function to print the outcome of one batch - the counts & a few examples,
+    never the whole batch
+    """
+    print("Batch {} (lines {}-{}) : {} written, {} rejected, {} duplicate IDs ignored"
+          .format(report.batch, report.first_line, report.last_line, report.rows_written,
+                  report.rows_rejected, report.rows_ignored))
+    if report.rows_rejected:
+        print("    Rejected by column : {}".format(', '.join(
+            '{} {}'.format(col_name, count) for col_name, count in report.reject_counts.items())))
+        for example in report.examples:
+            print("    e.g. {}".format(example))
+
+
+def set_pragmas(conn, pragmas):
+    """
+    Function to set sqlite3 pragmas
+    Input parameters : conn - sqlite3 connection, pragmas - tuple of (name, value)
+    Return parameters : tuple of (name, value) of the previous settings
+    """
+    previous = []
+    for name, value in pragmas:
+        previous.append((name, conn.execute('PRAGMA ' + name).fetchone()[0]))
+        conn.execute('PRAGMA {} = {}'.format(name, value))
+    return tuple(previous)
+
+
+def construct_insert():
+    """
+    Function to build the INSERT OR IGNORE command used for every batch
+    Global variables used : sqlite_database1.car_table, column_names
+    """
+    names = [col_name.lower() for col_name in sqlite_database1.column_names]
+    return sqlite_database1.construct_command(
+        'INSERT OR IGNORE INTO ', sqlite_database1.car_table, ' (', ', '.join(names),
+        ') VALUES (', ', '.join('?' * len(names)), ')')
+
+
+def import_cars(conn, stream, file_type='csv', batch_rows=BATCH_ROWS, drop_indexes=False,
+                report=print_report):
+    """
+    Function to import the cars in a CSV or JSONL file, one transaction per batch
+    Input parameters
+    1. conn - sqlite3 connection, the cars_for_sale table must exist (see
+       sqlite_database1.create_table())
+    2. stream - open text file
+    3. file_type - text/'csv' or 'jsonl'
+    4. batch_rows - integer/rows read, checked & written at a time
+    5. drop_indexes - boolean, True to drop the table_indexes & the full
+       text search triggers before the import & create them again after it
+       (the full text index is then built again from the whole table)
+    6. report - function(BatchReport) called after each batch, None for no
+       reports
+    Return parameters : ImportSummary
+    Global variables used : sqlite_database1.car_table, table_indexes
+    """
+    if file_type not in FORMATS:
+        raise ValueError("Unknown file type {}, expected one of {}".format(file_type, FORMATS))
+    batches = read_csv(stream, batch_rows) if file_type == 'csv' else \
+        read_jsonl(stream, batch_rows)
+    command = construct_insert()
+    start = time.perf_counter()
+    rows_read = rows_written = rows_rejected = rows_ignored = 0
+
+    previous = set_pragmas(conn, IMPORT_PRAGMAS)
+    try:
+        if drop_indexes:
+            with conn:
+                for index_name, _ in sqlite_database1.table_indexes:
+                    conn.execute('DROP INDEX IF EXISTS ' + index_name)
+                for trigger_name, _ in sqlite_database1.text_search_triggers():
+                    conn.execute('DROP TRIGGER IF EXISTS ' + trigger_name)
+        for batch, (columns, first_line, num_rows) in enumerate(batches, 1):
+            good_rows, good, bad_columns = validate(columns)
+            #rowcount counts the rows inserted, not those written by triggers
+            with conn:
+                written = conn.executemany(command, good_rows).rowcount
+            rows_read += num_rows
+            rows_written += written
+            rows_rejected += num_rows - len(good_rows)
+            rows_ignored += len(good_rows) - written
+            if report is not None:
+                counts, examples = _rejects(columns, first_line, good, bad_columns)
+                report(BatchReport(batch, first_line, first_line + num_rows - 1, written,
+                                   num_rows - len(good_rows), len(good_rows) - written,
+                                   counts, examples))
+    finally:
+        if drop_indexes:
+            with conn:
+                for index_command in sqlite_database1.index_commands():
+                    conn.execute(index_command)
+                for _, trigger_command in sqlite_database1.text_search_triggers():
+                    conn.execute(trigger_command)
+                #The full text index is built again from the whole table
+                conn.execute(sqlite_database1.construct_command(
+                    'INSERT INTO ', sqlite_database1.fts_table, ' (',
+                    sqlite_database1.fts_table, ") VALUES ('rebuild')"))
+        #Cached search results of this program may be out of date
+        sqlite_database1.result_cache.clear()
+        #WAL mode is left on (it is a property of the database file & readers
+        #.. benefit from it), the other settings are restored
+        set_pragmas(conn, [(name, value) for name, value in previous
+                           if name != 'journal_mode'])
+    return ImportSummary(rows_read, rows_written, rows_rejected, rows_ignored,
+                         time.perf_counter() - start)
+
+
+def main():
+    """
+    Function to read the command line options & import a file of cars
+    """
+    parser = argparse.ArgumentParser(description="Bulk import of used cars from CSV/JSONL")
+    parser.add_argument('file', help="CSV file with a header line, or JSONL file")
+    parser.add_argument('--db', default=sqlite_database1.sql3_file, help="database file")
+    parser.add_argument('--format', choices=FORMATS,
+                        help="file format (default: from the file name extension)")
+    parser.add_argument('--batch-rows', type=int, default=BATCH_ROWS,
+                        help="rows per transaction")
+    parser.add_argument('--drop-indexes', action='store_true',
+                        help="drop the indexes during the import & build them again after")
+    parser.add_argument('--quiet', action='store_true', help="no report per batch")
+    args = parser.parse_args()
+
+    conn = sqlite_database1.create_connection(args.db)
+    if conn is None:
+        return
+    #create_table() uses the connection & cursor of sqlite_database1
+    sqlite_database1.conn, sqlite_database1.c = conn, conn.cursor()
+    sqlite_database1.create_table()
+    with open(args.file, newline='', encoding='utf-8') as stream:
+        summary = import_cars(conn, stream, args.format or file_format(args.file),
+                              args.batch_rows, args.drop_indexes,
+                              None if args.quiet else print_report)
+    conn.close()
+    print("{} rows read : {} written, {} rejected, {} duplicate IDs ignored in {:.2f} s"
+          " ({:,.0f} rows/s)".format(summary.rows_read, summary.rows_written,
+                                     summary.rows_rejected, summary.rows_ignored,
+                                     summary.seconds,
+                                     summary.rows_read / max(summary.seconds, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Program to load test the car service (car_service.py) - many clients send
+a mix of requests at once & the latency & throughput are reported for each
+number of clients
+
+Each client is a thread with its own keep-alive HTTP connection, sending
+requests one after the other for 'duration' seconds. The mix of requests is
+chosen at random with the given weights
+    search - GET /search with a word or the start of a word of a make/model
+    get    - GET /cars/<id> of a random ID
+    list   - GET /cars, a page of the listing sorted by price
+    change - PATCH /cars/<id> a new price for a random ID - this changes the
+             database, so it is only sent if given in --mix
+For each number of clients the requests/second, the 50th & 99th percentile
+latency (p50, p99) & the number of errors are printed.
+
+Use from the command line, e.g.
+    python car_load_test.py --start-service --db used_car_stock.db --clients 1 4 16 64
+or against a service already running
+    python car_load_test.py --url http://127.0.0.1:8080
+& with changes, on a copy of the database
+    python car_load_test.py --start-service --db copy_of_stock.db \
+        --mix search=70,get=20,list=5,change=5
+"""
+
+import argparse
+import http.client
+import json
+import random
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+
+import numpy as np
+
+import car_service
+
+DEFAULT_MIX = (('search', 70), ('get', 20), ('list', 10))
+CLIENTS = (1, 4, 16, 64)
+DURATION = 5.0              # Seconds per number of clients
+
+
+class Client:
+    """
+    One client of the load test, with its own HTTP connection
+    Input parameters : host, port - of the service, sample - dictionary of
+    'max_id' & 'words' used to make requests, seed - integer
+    """
+
+    def __init__(self, host, port, sample, seed):
+        self.connection = http.client.HTTPConnection(host, port, timeout=60)
+        self.sample = sample
+        self.random = random.Random(seed)
+        self.latencies = {}         # kind of request -> list of seconds
+        self.errors = 0
+
+    def request(self, method, path, payload=None):
+        """
+        Function to send one request & read the whole response
+        Return parameters : integer/HTTP status
+        """
+        #Bytes are sent in one piece with the headers
+        body = None if payload is None else json.dumps(payload).encode('utf-8')
+        headers = {} if body is None else {'Content-Type': 'application/json'}
+        try:
+            self.connection.request(method, path, body, headers)
+            response = self.connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            #Open a new connection for the next request
+            self.connection.close()
+            return 0
+
+    def make_request(self, kind):
+        """
+        Function to send one request of a kind
+        Return parameters : integer/HTTP status
+        """
+        if kind == 'search':
+            word = self.random.choice(self.sample['words'])
+            word = word[:self.random.randint(3, max(3, len(word)))]
+            return self.request('GET', '/search?' + urllib.parse.urlencode(
+                {'words': word, 'limit': 20}))
+        if kind == 'get':
+            return self.request('GET', '/cars/{}'.format(
+                self.random.randint(1, self.sample['max_id'])))
+        if kind == 'list':
+            return self.request('GET', '/cars?order_by=Price&limit=50')
+        if kind == 'change':
+            return self.request('PATCH', '/cars/{}'.format(
+                self.random.randint(1, self.sample['max_id'])),
+                                {'Price': self.random.randint(500, 50000)})
+        raise ValueError("Unknown kind of request {}".format(kind))
+
+    def run(self, mix, deadline):
+        """
+        Function to send requests until the deadline (time.perf_counter())
+        Input parameters : mix - list of (kind, weight)
+        """
+        kinds = [kind for kind, _ in mix]
+        weights = [weight for _, weight in mix]
+        while time.perf_counter() < deadline:
+            kind = self.random.choices(kinds, weights)[0]
+            start = time.perf_counter()
+            status = self.make_request(kind)
+            self.latencies.setdefault(kind, []).append(time.perf_counter() - start)
+            #A missing ID is a good answer (404), a failure is not
+            if status == 0 or status >= 500:
+                self.errors += 1
+        self.connection.close()
+
+
+def sample_data(host, port):
+    """
+    Function to find the largest ID & some words of the makes & models in the
+    database, used to make the requests
+    Return parameters : dictionary of 'max_id' integer & 'words' list of text
+    """
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    connection.request('GET', '/cars?order_by=ID&descending=1&limit=1')
+    last = json.loads(connection.getresponse().read())['cars']
+    connection.request('GET', '/cars?order_by=Price&limit=500')
+    cars = json.loads(connection.getresponse().read())['cars']
+    connection.close()
+    words = sorted({car[name] for car in cars for name in ('Make', 'Model')})
+    return {'max_id': last[0]['ID'] if last else 1, 'words': words or ['ford']}
+
+
+def run_level(host, port, sample, clients, duration, mix):
+    """
+    Function to run the load test with a number of clients
+    Return parameters : dictionary of the results - requests, seconds,
+    requests/second, p50 & p99 latency in ms, errors & p50 of each kind of
+    request
+    """
+    workers = [Client(host, port, sample, seed) for seed in range(clients)]
+    start = time.perf_counter()
+    deadline = start + duration
+    threads = [threading.Thread(target=worker.run, args=(mix, deadline)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    by_kind = {}
+    for worker in workers:
+        for kind, latencies in worker.latencies.items():
+            by_kind.setdefault(kind, []).extend(latencies)
+    latencies = np.array([value for values in by_kind.values() for value in values]) * 1000
+    return {'clients': clients, 'requests': len(latencies), 'seconds': seconds,
+            'rps': len(latencies) / seconds,
+            'p50': float(np.percentile(latencies, 50)) if len(latencies) else 0.0,
+            'p99': float(np.percentile(latencies, 99)) if len(latencies) else 0.0,
+            'errors': sum(worker.errors for worker in workers),
+            'kinds': {kind: float(np.percentile(np.array(values) * 1000, 50))
+                      for kind, values in sorted(by_kind.items())}}
+
+
+def print_report(results, header=True):
+    """
+    Function to print the results of each number of clients
+    """
+    if header:
+        print("{:>8} {:>10} {:>10} {:>10} {:>10} {:>8}  p50 by request (ms)".format(
+            'clients', 'requests', 'req/s', 'p50 ms', 'p99 ms', 'errors'))
+    for result in results:
+        print("{clients:>8} {requests:>10} {rps:>10.0f} {p50:>10.2f} {p99:>10.2f} "
+              "{errors:>8}  ".format(**result) +
+              ', '.join('{} {:.2f}'.format(kind, value)
+                        for kind, value in result['kinds'].items()))
+
+
+def parse_mix(text):
+    """
+    Function to read a mix of requests e.g. 'search=70,get=20,list=5,change=5'
+    """
+    mix = []
+    for item in text.split(','):
+        kind, _, weight = item.partition('=')
+        mix.append((kind.strip(), float(weight)))
+    return mix
+
+
+def start_service_process(db_file, port, readers):
+    """
+    Function to run the service in a separate python process, so the clients
+    & the service do not share one interpreter
+    Return parameters : subprocess.Popen - call terminate() to stop it
+    """
+    process = subprocess.Popen([sys.executable, car_service.__file__, '--db', db_file,
+                                '--port', str(port), '--readers', str(readers)],
+                               stdout=subprocess.PIPE, text=True)
+    #The service prints one line when it is ready
+    process.stdout.readline()
+    return process
+
+
+def main():
+    """
+    Function to read the command line options & run the load test
+    """
+    parser = argparse.ArgumentParser(description="Load test of the car service")
+    parser.add_argument('--url', default='http://127.0.0.1:{}'.format(car_service.DEFAULT_PORT))
+    parser.add_argument('--clients', type=int, nargs='+', default=list(CLIENTS),
+                        help="numbers of clients at once")
+    parser.add_argument('--duration', type=float, default=DURATION,
+                        help="seconds per number of clients")
+    parser.add_argument('--mix', default=','.join('{}={}'.format(kind, weight)
+                                                  for kind, weight in DEFAULT_MIX),
+                        help="kinds of request & their weights")
+    parser.add_argument('--start-service', action='store_true',
+                        help="run car_service.py for the test")
+    parser.add_argument('--db', help="database file of the service started, needed "
+                        "with --start-service")
+    parser.add_argument('--readers', type=int, default=car_service.READERS)
+    args = parser.parse_args()
+    #The database is named each time, so a test is not run on the stock by mistake
+    if args.start_service and args.db is None:
+        parser.error("--start-service needs --db")
+
+    url = urllib.parse.urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    process = start_service_process(args.db, port, args.readers) \
+        if args.start_service else None
+    try:
+        sample = sample_data(host, port)
+        results = []
+        for clients in args.clients:
+            results.append(run_level(host, port, sample, clients, args.duration,
+                                     parse_mix(args.mix)))
+            #One line per number of clients, as soon as it is measured
+            print_report(results[-1:], header=len(results) == 1)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+"""
+Program & module to serve the used car database of sqlite_database1.py to
+many clients at once, as a local HTTP/JSON service
+
+1. Each request is handled on its own thread (http.server).
+2. The database is used through a pool of connections in WAL mode - one
+   writer connection, used by one request at a time, & several read only
+   connections. In WAL mode readers see the last committed data & are not
+   blocked by a write, so searches & listings do not wait behind changes.
+3. The commands are those of sqlite_database1.py (build_search(),
+   build_text_search() & build_page()) & new cars are checked as by
+   car_import.py.
+
+Requests (cars are JSON objects with the keys of column_names)
+    GET    /cars/<id>                       one car
+    GET    /cars?order_by=Price&descending=1&limit=100&after=[...]
+                                            a page of the listing, with the
+                                            'next' key to pass as after=
+    GET    /search?words=ford foc&Model=foc&Year=2010,2015&combine=AND&limit=50
+                                            text (prefix) & range search
+    POST   /cars                            add one car or a list of cars
+    PATCH  /cars/<id>                       change columns e.g. {"Price": 5000}
+    DELETE /cars/<id>                       delete a car
+    GET    /stats                           request counts of the pool
+
+Use from the command line, e.g.
+    python car_service.py --db used_car_stock.db --port 8080 --readers 4
+& see car_load_test.py to measure it.
+"""
+
+import argparse
+import contextlib
+import http.server
+import json
+import queue
+import sqlite3 as sql3
+import threading
+import urllib.parse
+
+import car_import
+import sqlite_database1
+
+DEFAULT_PORT = 8080
+READERS = 4
+BUSY_TIMEOUT = 30.0         # Seconds a connection waits for a lock
+SEARCH_ROWS = 100           # Default & most rows of a search or page
+MAX_ROWS = 1000
+
+#Pragmas of every connection of the pool
+POOL_PRAGMAS = (('journal_mode', 'WAL'), ('synchronous', 'NORMAL'),
+                ('cache_size', '-16384'), ('temp_store', 'MEMORY'))
+
+
+class ConnectionPool:
+    """
+    One writer & several read only sqlite3 connections to one database file
+    Input parameters : db_file - text/database file name, readers - integer/
+    number of read only connections
+    """
+
+    def __init__(self, db_file, readers=READERS):
+        self.db_file = db_file
+        self.writer_conn = self._connect()
+        #create_table() uses the connection & cursor of sqlite_database1
+        sqlite_database1.conn = self.writer_conn
+        sqlite_database1.c = self.writer_conn.cursor()
+        sqlite_database1.create_table()
+        self._write_lock = threading.Lock()
+        self._readers = queue.Queue()
+        for _ in range(readers):
+            reader = self._connect()
+            reader.execute('PRAGMA query_only = ON')
+            self._readers.put(reader)
+        self.num_readers = readers
+        #Request threads count at once, so the counts are kept with a lock
+        self._count_lock = threading.Lock()
+        self.reads = 0
+        self.writes = 0
+
+    def _connect(self):
+        """
+        Function to open one connection of the pool - it may be used by any
+        thread, but by only one at a time
+        """
+        conn = sql3.connect(self.db_file, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        for name, value in POOL_PRAGMAS:
+            conn.execute('PRAGMA {} = {}'.format(name, value))
+        return conn
+
+    @contextlib.contextmanager
+    def reader(self):
+        """
+        Function to borrow a read only connection, waiting for one to be free
+        e.g.  with pool.reader() as conn: ...
+        """
+        conn = self._readers.get()
+        try:
+            with self._count_lock:
+                self.reads += 1
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextlib.contextmanager
+    def writer(self):
+        """
+        Function to use the writer connection - one request at a time
+        """
+        with self._write_lock:
+            with self._count_lock:
+                self.writes += 1
+            yield self.writer_conn
+
+    def close(self):
+        """
+        Function to close all the connections of the pool
+        """
+        for _ in range(self.num_readers):
+            self._readers.get().close()
+        self.writer_conn.close()
+
+
+def car_dict(row):
+    """
+    Function to convert a row of the car table to a JSON object
+    """
+    return dict(zip(sqlite_database1.column_names, row))
+
+
+def add_cars(conn, records):
+    """
+    Function to add cars from JSON objects, one transaction
+    Input parameters : conn - writer connection, records - list of
+    dictionaries of column name (any case) -> value
+    Return parameters : dictionary - numbers added & ignored (ID already
+    used) & the rejected cars, each with its list index & bad columns
+    """
+    names = [col_name.lower() for col_name in sqlite_database1.column_names]
+    records = [{str(key).lower(): value for key, value in record.items()}
+               if isinstance(record, dict) else {} for record in records]
+    columns = [tuple(record.get(name) for record in records) for name in names]
+    good_rows, good, bad_columns = car_import.validate(columns)
+    #rowcount counts the rows inserted, not those written by the triggers
+    with conn:
+        added = conn.executemany(car_import.construct_insert(), good_rows).rowcount
+    rejected = [{'index': row_num,
+                 'columns': [col_name for col_name, bad
+                             in zip(sqlite_database1.column_names, bad_columns)
+                             if bad[row_num]]}
+                for row_num in range(len(records)) if not good[row_num]]
+    return {'added': added, 'ignored': len(good_rows) - added, 'rejected': rejected}
+
+
+def change_car(conn, car_id, changes):
+    """
+    Function to change one or more columns of a car in one statement, by
+    sqlite_database1.update_cars()
+    Input parameters : conn - writer connection, car_id - integer, changes -
+    dictionary of column name -> new value
+    Return parameters : boolean, False if there is no car with that ID
+    Raises ValueError for an unknown column, the ID or a value not allowed &
+    sqlite3.Error if the change fails
+    """
+    outcome = sqlite_database1.update_cars({car_id: changes}, local_conn=conn)[car_id]
+    return _found(outcome)
+
+
+def delete_car(conn, car_id):
+    """
+    Function to delete a car, by sqlite_database1.delete_cars()
+    Return parameters : boolean, False if there is no car with that ID
+    """
+    outcome = sqlite_database1.delete_cars([car_id], local_conn=conn)[car_id]
+    return _found(outcome)
+
+
+def _found(outcome):
+    """
+    Function to turn the outcome of a change or delete of one car into found
+    or not found
+    Return parameters : boolean
+    Raises ValueError for a rejected car & sqlite3.Error for a failed one
+    """
+    if outcome.startswith('rejected - '):
+        raise ValueError(outcome[len('rejected - '):])
+    if outcome == 'failed':
+        raise sql3.Error("The database could not be changed")
+    return outcome != 'not found'
+
+
+def row_limit(query):
+    """
+    Function to read the limit of a search or page from the URL query
+    Return parameters : integer/most cars listed, SEARCH_ROWS if not given
+    Raises ValueError if it is not from 1 to MAX_ROWS - sqlite3 would take a
+    negative LIMIT as no limit
+    """
+    limit = int(query.get('limit', [SEARCH_ROWS])[0])
+    if not 1 <= limit <= MAX_ROWS:
+        raise ValueError("limit must be from 1 to {}, not {}".format(MAX_ROWS, limit))
+    return limit
+
+
+def search(conn, query):
+    """
+    Function to run a search given as URL query parameters
+    Input parameters : conn - read only connection, query - dictionary of
+    text -> list of text from urllib.parse.parse_qs()
+    1. words - words to find in any text column
+    2. <text column>=words e.g. Model=foc
+    3. <integer column>=min,max e.g. Year=2010,2015
+    4. combine - AND or OR, limit - most cars listed
+    Return parameters : list of tuples, one per car
+    """
+    text_criteria = {}
+    range_criteria = {}
+    for name, values in query.items():
+        if name.lower() in ('words', 'combine', 'limit'):
+            continue
+        column = sqlite_database1.column_for(name)
+        col_num = [col_name.lower() for col_name in sqlite_database1.column_names].index(column)
+        if sqlite_database1.column_types[col_num] == 'TEXT':
+            text_criteria[column] = values[0]
+        else:
+            min_value, _, max_value = values[0].partition(',')
+            range_criteria[column] = (int(min_value), int(max_value or min_value))
+    limit = row_limit(query)
+    command, parameters, _ = sqlite_database1.build_text_search(
+        query.get('words', [''])[0], text_criteria, range_criteria,
+        query.get('combine', ['AND'])[0], limit)
+    return conn.execute(command, parameters).fetchall()
+
+
+def list_page(conn, query):
+    """
+    Function to read one page of the listing given as URL query parameters
+    order_by, descending (1 or 0), limit & after (JSON list, the 'next' key of
+    the previous page)
+    Return parameters : tuple (list of tuples, one per car, list/key of the
+    next page or None for the last page)
+    """
+    order_by = query.get('order_by', ['ID'])[0]
+    descending = query.get('descending', ['0'])[0] not in ('0', '', 'false')
+    limit = row_limit(query)
+    after = json.loads(query['after'][0]) if 'after' in query else None
+    command, parameters, _, col_nums = sqlite_database1.build_page(order_by, descending,
+                                                                   limit, after)
+    rows = conn.execute(command, parameters).fetchall()
+    next_key = [rows[-1][col_num] for col_num in col_nums] if len(rows) == limit else None
+    return rows, next_key
+
+
+class CarHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler of the car service, the pool is the pool attribute of
+    the server
+    """
+    protocol_version = 'HTTP/1.1'       # Allow keep-alive connections
+    #Send the headers & body at once - otherwise each small response waits
+    #.. for the client's delayed acknowledgement (about 40 ms)
+    disable_nagle_algorithm = True
+
+    def _send(self, status, payload=None):
+        body = b'' if payload is None else json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def _route(self):
+        """
+        Function to split the path into its parts & the URL query
+        Return parameters : tuple (list of text, dictionary of query values)
+        """
+        url = urllib.parse.urlsplit(self.path)
+        return [part for part in url.path.split('/') if part], \
+            urllib.parse.parse_qs(url.query)
+
+    def _handle(self, method):
+        """
+        Function to answer a request - errors in the request are answered 400
+        with a JSON error message, database errors 500
+        """
+        pool = self.server.pool
+        try:
+            #The body is read first, so a request refused early does not leave
+            #.. it in the keep-alive connection
+            payload = self._read_json() if method in ('POST', 'PATCH') else None
+            parts, query = self._route()
+            if method == 'GET' and parts == ['cars']:
+                with pool.reader() as conn:
+                    rows, next_key = list_page(conn, query)
+                self._send(200, {'cars': [car_dict(row) for row in rows], 'next': next_key})
+            elif method == 'GET' and parts == ['search']:
+                with pool.reader() as conn:
+                    rows = search(conn, query)
+                self._send(200, {'cars': [car_dict(row) for row in rows]})
+            elif method == 'GET' and parts == ['stats']:
+                self._send(200, {'reads': pool.reads, 'writes': pool.writes,
+                                 'readers': pool.num_readers})
+            elif method == 'POST' and parts == ['cars']:
+                records = payload
+                records = records if isinstance(records, list) else [records]
+                with pool.writer() as conn:
+                    outcome = add_cars(conn, records)
+                self._send(200, outcome)
+            elif len(parts) == 2 and parts[0] == 'cars':
+                car_id = sqlite_database1.check_id(parts[1])
+                if method == 'GET':
+                    with pool.reader() as conn:
+                        row = conn.execute('SELECT * FROM ' + sqlite_database1.car_table +
+                                           ' WHERE id = ?', (car_id,)).fetchone()
+                    found = row is not None
+                elif method == 'PATCH':
+                    changes = payload
+                    if not isinstance(changes, dict):
+                        raise ValueError("Send a JSON object of column -> new value")
+                    with pool.writer() as conn:
+                        found = change_car(conn, car_id, changes)
+                elif method == 'DELETE':
+                    with pool.writer() as conn:
+                        found = delete_car(conn, car_id)
+                else:
+                    self._send(405, {'error': 'Method not allowed'})
+                    return
+                if not found:
+                    self._send(404, {'error': 'No car with ID {}'.format(car_id)})
+                elif method == 'GET':
+                    self._send(200, car_dict(row))
+                else:
+                    self._send(200, {'id': car_id})
+            else:
+                self._send(404, {'error': 'Unknown request {} {}'.format(method, self.path)})
+        except (ValueError, KeyError, TypeError, OverflowError) as err:
+            self._send(400, {'error': str(err)})
+        except sql3.Error as err:
+            self._send(500, {'error': str(err)})
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    def log_message(self, format, *args):
+        #Keep the console quiet - one line per request slows the service down
+        pass
+
+
+class ThreadingServer(http.server.ThreadingHTTPServer):
+    """
+    HTTP server handling each connection on its own thread, with room for
+    many waiting connections
+    """
+    request_queue_size = 128
+
+
+def start_service(db_file, port=0, readers=READERS, host='127.0.0.1'):
+    """
+    Function to start the service on a background thread
+    Input parameters
+    1. db_file - text/database file name
+    2. port - integer/port number, 0 picks a free port
+    3. readers - integer/number of read only connections
+    4. host - text/address to listen on
+    Return parameters : (server, url) - call server.shutdown() to stop &
+    server.pool.close() to close the database
+    """
+    server = ThreadingServer((host, port), CarHandler)
+    server.pool = ConnectionPool(db_file, readers)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://{}:{}'.format(host, server.server_address[1])
+
+
+def main():
+    """
+    Function to read the command line options & run the service
+    """
+    parser = argparse.ArgumentParser(description="HTTP/JSON service of the used car database")
+    parser.add_argument('--db', default=sqlite_database1.sql3_file, help="database file")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--readers', type=int, default=READERS,
+                        help="number of read only connections")
+    args = parser.parse_args()
+
+    server, url = start_service(args.db, args.port, args.readers, args.host)
+    print("Serving {} at {} - press Ctrl+C to stop".format(args.db, url), flush=True)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        server.pool.close()
+
+
+if __name__ == '__main__':
+    main()
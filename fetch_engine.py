@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Module to download the daily stock price data of many symbols concurrently
+
+A Fetcher runs the downloads on a bounded pool of worker threads so the total
+time is set by the slowest request(s) rather than the sum of all of them.
+1. Each worker thread keeps its HTTP connection open (keep-alive) and reuses
+   it for the next request to the same host.
+2. Responses are requested gzip encoded & decompressed as they are read,
+   straight into alphavantage.parse_daily().
+3. Requests are spaced to a configurable rate limit shared by all workers.
+4. Failed requests (network errors, HTTP 429/5xx & API call frequency
+   messages) are retried with exponential backoff.
+5. Requests can be made conditional (If-None-Match/If-Modified-Since), a
+   304 Not Modified answer raises alphavantage.NotModified.
+
+Example
+    with Fetcher(max_workers=8, max_per_second=5) as fetcher:
+        results = fetcher.load_many(['MSFT', 'AAPL', 'IBM'])
+"""
+
+import concurrent.futures
+import gzip
+import http.client
+import threading
+import time
+import urllib.error
+import urllib.parse
+
+import alphavantage
+import price_cache
+
+#HTTP status codes worth retrying - too many requests & server errors
+RETRY_STATUS = (429, 500, 502, 503, 504)
+
+
+class Fetcher:
+    """
+    Concurrent, rate limited downloader of TIME_SERIES_DAILY data
+    Input parameters
+    1. max_workers - integer/maximum number of requests in progress at once
+    2. max_per_second - float/maximum number of requests started per second,
+       0 for no limit
+    3. retries - integer/number of retries after a failed request
+    4. backoff - float/seconds to wait before the first retry, doubled for
+       each retry after that
+    5. timeout - float/seconds to wait for the server
+    """
+
+    def __init__(self, max_workers=8, max_per_second=0, retries=3, backoff=1.0,
+                 timeout=30):
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self._interval = 1.0 / max_per_second if max_per_second > 0 else 0.0
+        self._next_start = time.monotonic()
+        self._rate_lock = threading.Lock()
+        self._local = threading.local()     # Open connections of each thread
+        self._connections = []              # Every connection, for close()
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """
+        Function to stop the worker threads & close all open connections
+        """
+        self._pool.shutdown(wait=True)
+        for connection in self._connections:
+            connection.close()
+        self._connections = []
+
+    def _wait_turn(self):
+        """
+        Function to sleep until the rate limit allows another request to start
+        """
+        if self._interval == 0:
+            return
+        with self._rate_lock:
+            now = time.monotonic()
+            start = max(now, self._next_start)
+            self._next_start = start + self._interval
+        if start > now:
+            time.sleep(start - now)
+
+    def _connection(self, scheme, netloc):
+        """
+        Function to return this thread's open connection to a host, opening a
+        new one if there is none
+        Input parameters : scheme - text/'http' or 'https', netloc - host[:port]
+        Return parameters : http.client.HTTPConnection
+        """
+        connections = getattr(self._local, 'connections', None)
+        if connections is None:
+            connections = self._local.connections = {}
+        connection = connections.get((scheme, netloc))
+        if connection is None:
+            connection_class = http.client.HTTPSConnection if scheme == 'https' \
+                else http.client.HTTPConnection
+            connection = connection_class(netloc, timeout=self.timeout)
+            connections[(scheme, netloc)] = connection
+            with self._rate_lock:
+                self._connections.append(connection)
+        return connection
+
+    def _drop_connection(self, scheme, netloc):
+        """
+        Function to close & forget this thread's connection to a host after an
+        error, the next request opens a new connection
+        """
+        connection = self._local.connections.pop((scheme, netloc), None)
+        if connection is not None:
+            connection.close()
+            with self._rate_lock:
+                self._connections.remove(connection)
+
+    def _fetch_once(self, url, validators=None):
+        """
+        Function to make one request & decode the response
+        Input parameters : url - text, validators - see fetch()
+        Return parameters : DailySeries of numpy arrays
+        """
+        parts = urllib.parse.urlsplit(url)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        connection = self._connection(parts.scheme, parts.netloc)
+        try:
+            headers = alphavantage.conditional_headers(validators)
+            headers['Accept-Encoding'] = 'gzip'
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            if response.status == 304:
+                response.read()
+                raise alphavantage.NotModified(url)
+            if response.status != 200:
+                response.read()
+                raise urllib.error.HTTPError(url, response.status, response.reason,
+                                             response.headers, None)
+            stream = response
+            if response.getheader('Content-Encoding', '').lower() == 'gzip':
+                stream = gzip.GzipFile(fileobj=response, mode='rb')
+                size_hint = 0
+            else:
+                size_hint = response.getheader('Content-Length', 0)
+            try:
+                prices = alphavantage.parse_daily(stream, size_hint)
+                alphavantage.update_validators(validators, response.headers)
+                return prices
+            finally:
+                #Read anything left so the connection can be used again
+                response.read()
+        except urllib.error.HTTPError:
+            #An HTTPError (an OSError) is raised after its whole answer is read,
+            #... so the connection can still be used
+            raise
+        except (OSError, http.client.HTTPException):
+            self._drop_connection(parts.scheme, parts.netloc)
+            raise
+
+    def fetch(self, url, validators=None):
+        """
+        Function to download & decode the TIME_SERIES_DAILY data at a URL,
+        retrying failed requests with exponential backoff.
+        Safe to call from several threads at once.
+        Input parameters : url - text, validators - dictionary of the 'etag' &
+        'last_modified' of the last response, for a conditional request (see
+        alphavantage.fetch_daily()) or None
+        Return parameters : DailySeries of numpy arrays, oldest trading day first
+        Raises alphavantage.NotModified on a 304 answer, and
+        urllib.error.URLError/HTTPError, OSError or ValueError when all tries fail
+        """
+        attempt = 0
+        while True:
+            self._wait_turn()
+            try:
+                return self._fetch_once(url, validators)
+            except urllib.error.HTTPError as err:
+                if err.code not in RETRY_STATUS or attempt >= self.retries:
+                    raise
+            except (OSError, http.client.HTTPException,
+                    alphavantage.ApiLimitError):
+                if attempt >= self.retries:
+                    raise
+            time.sleep(self.backoff * 2 ** attempt)
+            attempt += 1
+
+    def map(self, function, symbols):
+        """
+        Function to call function(symbol) for each symbol on the worker threads
+        Input parameters : function - callable, symbols - list of text
+        Return parameters : dictionary of symbol -> result, or the exception
+        raised for that symbol, in the order of symbols
+        """
+        futures = [self._pool.submit(function, symbol) for symbol in symbols]
+        results = {}
+        for symbol, future in zip(symbols, futures):
+            try:
+                results[symbol] = future.result()
+            except Exception as err:
+                results[symbol] = err
+        return results
+
+    def fetch_many(self, symbols, outputsize='full', apikey=alphavantage.API_KEY,
+                   query_url=alphavantage.QUERY_URL):
+        """
+        Function to download the price data of several symbols concurrently
+        Input parameters
+        1. symbols - list of text/stock symbols
+        2. outputsize, apikey, query_url - see alphavantage.daily_url()
+        Return parameters : dictionary of symbol -> DailySeries or exception
+        """
+        return self.map(lambda symbol: self.fetch(
+            alphavantage.daily_url(symbol, outputsize, apikey, query_url)), symbols)
+
+    def load_many(self, symbols, cache_dir=price_cache.CACHE_DIR, refresh=True,
+                  apikey=alphavantage.API_KEY, query_url=alphavantage.QUERY_URL):
+        """
+        Function to load the price history of several symbols concurrently
+        through the local cache (see price_cache.load_history)
+        Input parameters
+        1. symbols - list of text/stock symbols
+        2. cache_dir, refresh, apikey, query_url - see price_cache.load_history()
+        Return parameters : dictionary of symbol -> DailySeries or exception
+        """
+        return self.map(lambda symbol: price_cache.load_history(
+            symbol, cache_dir, refresh, apikey, query_url, self.fetch), symbols)
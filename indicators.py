@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+Module of technical indicators calculated from the daily price arrays
+
+SMA, EMA, Bollinger bands, RSI, ATR & VWAP. Each indicator is a small class
+1. compute(prices) calculates the indicator over the whole price history with
+   numpy (cumulative sums for windows, a block matrix product for the
+   exponential averages) - no python loop over the bars - & keeps the state
+   needed to carry on from the last bar.
+2. update(bar) takes one new bar (a DailySeries of single values) & returns
+   the indicator value(s) for it in O(1) time.
+
+The first window-1 values, before there is enough data, are NaN.
+"""
+
+import collections
+import numpy as np
+
+EMA_BLOCK = 256     # Bars per block in the vectorized exponential average
+
+
+def rolling_sum(values, window):
+    """
+    Function to return the sum of each 'window' consecutive values
+    Input parameters : values - array of float, window - integer
+    Return parameters : numpy array of float, the same length as values with
+    NaN for the first window-1 entries
+    """
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.full(len(values), np.nan)
+    if window <= len(values):
+        totals = np.concatenate(([0.0], np.cumsum(values)))
+        sums[window - 1:] = totals[window:] - totals[:-window]
+    return sums
+
+
+def sma(values, window):
+    """
+    Function to return the simple moving average of values
+    Input parameters : values - array of float, window - integer/days
+    Return parameters : numpy array of float, NaN for the first window-1 days
+    """
+    return rolling_sum(values, window) / window
+
+
+def rolling_std(values, window):
+    """
+    Function to return the (population) standard deviation of each 'window'
+    consecutive values, from cumulative sums of the values & their squares.
+    The values are first shifted by the first value to keep the sums small
+    (avoids loss of precision when subtracting the two sums).
+    Input parameters : values - array of float, window - integer/days
+    Return parameters : numpy array of float, NaN for the first window-1 days
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return np.empty(0)
+    shifted = values - values[0]
+    mean = rolling_sum(shifted, window) / window
+    variance = rolling_sum(shifted * shifted, window) / window - mean * mean
+    return np.sqrt(np.maximum(variance, 0.0))
+
+
+def ema(values, alpha, initial=None):
+    """
+    Function to return the exponential moving average of values
+        ema[i] = alpha * values[i] + (1 - alpha) * ema[i-1]
+    The series is split into blocks of EMA_BLOCK values & each block is
+    calculated with one matrix product, carrying the last average across to
+    the next block - so there are len/EMA_BLOCK python steps, not len.
+    Input parameters
+    1. values - array of float
+    2. alpha - float/smoothing factor, e.g. 2/(days+1) or 1/days (Wilder)
+    3. initial - float/average before the first value, the first value if
+       not given
+    Return parameters : numpy array of float
+    """
+    values = np.asarray(values, dtype=np.float64)
+    num_values = len(values)
+    result = np.empty(num_values)
+    if num_values == 0:
+        return result
+    previous = values[0] if initial is None else initial
+
+    #weights[j, k] = alpha * (1-alpha)^(j-k) for k <= j, decay[j] = (1-alpha)^(j+1)
+    block = min(EMA_BLOCK, num_values)
+    powers = np.arange(block)
+    lags = powers[:, None] - powers[None, :]
+    weights = np.where(lags >= 0, alpha * (1.0 - alpha) ** np.maximum(lags, 0), 0.0)
+    decay = (1.0 - alpha) ** (powers + 1)
+
+    for start in range(0, num_values, block):
+        chunk = values[start:start + block]
+        size = len(chunk)
+        result[start:start + size] = weights[:size, :size] @ chunk + decay[:size] * previous
+        previous = result[start + size - 1]
+    return result
+
+
+def true_range(high, low, close):
+    """
+    Function to return the true range of each bar - the largest of high-low,
+    |high - previous close| & |low - previous close|
+    Input parameters : high, low, close - arrays of float
+    Return parameters : numpy array of float (high-low for the first bar)
+    """
+    high = np.asarray(high, dtype=np.float64)
+    low = np.asarray(low, dtype=np.float64)
+    previous_close = np.concatenate((np.asarray(close[:1], dtype=np.float64),
+                                     np.asarray(close[:-1], dtype=np.float64)))
+    return np.maximum(high - low, np.maximum(np.abs(high - previous_close),
+                                             np.abs(low - previous_close)))
+
+
+class SMA:
+    """
+    Simple moving average of the close price over 'window' days
+    """
+    overlay = True      # Drawn on the price axis
+
+    def __init__(self, window=20):
+        self.window = window
+        self.name = 'SMA {}'.format(window)
+        self._recent = collections.deque(maxlen=window)
+        self._total = 0.0
+
+    def compute(self, prices):
+        """
+        Function to calculate the indicator over the whole price history
+        Input parameters : prices - DailySeries of numpy arrays
+        Return parameters : numpy array of float
+        """
+        close = np.asarray(prices.close, dtype=np.float64)
+        self._recent = collections.deque(close[-self.window:], maxlen=self.window)
+        self._total = float(np.sum(self._recent))
+        return sma(close, self.window)
+
+    def update(self, bar):
+        """
+        Function to add one new bar & return the indicator value for it
+        Input parameters : bar - DailySeries of single values
+        Return parameters : float
+        """
+        if len(self._recent) == self.window:
+            self._total -= self._recent[0]
+        self._recent.append(float(bar.close))
+        self._total += float(bar.close)
+        if len(self._recent) < self.window:
+            return np.nan
+        return self._total / self.window
+
+
+class EMA:
+    """
+    Exponential moving average of the close price, alpha = 2/(window+1)
+    """
+    overlay = True
+
+    def __init__(self, window=20):
+        self.window = window
+        self.alpha = 2.0 / (window + 1)
+        self.name = 'EMA {}'.format(window)
+        self._last = None
+
+    def compute(self, prices):
+        """
+        Function to calculate the indicator over the whole price history
+        """
+        result = ema(prices.close, self.alpha)
+        self._last = result[-1] if len(result) > 0 else None
+        return result
+
+    def update(self, bar):
+        """
+        Function to add one new bar & return the indicator value for it
+        """
+        close = float(bar.close)
+        self._last = close if self._last is None else \
+            self.alpha * close + (1.0 - self.alpha) * self._last
+        return self._last
+
+
+class Bollinger:
+    """
+    Bollinger bands - the SMA of the close price over 'window' days plus &
+    minus 'width' standard deviations
+    Values are tuples/arrays of (lower band, middle, upper band)
+    """
+    overlay = True
+
+    def __init__(self, window=20, width=2.0):
+        self.window = window
+        self.width = width
+        self.name = 'Bollinger {} {}'.format(window, width)
+        self._recent = collections.deque(maxlen=window)
+        self._shift = 0.0
+        self._total = 0.0
+        self._total_squares = 0.0
+
+    def compute(self, prices):
+        """
+        Function to calculate the indicator over the whole price history
+        Return parameters : numpy array of float, shape (bars, 3)
+        """
+        close = np.asarray(prices.close, dtype=np.float64)
+        middle = sma(close, self.window)
+        spread = self.width * rolling_std(close, self.window)
+        self._shift = close[0] if len(close) > 0 else 0.0
+        self._recent = collections.deque(close[-self.window:] - self._shift,
+                                         maxlen=self.window)
+        self._total = float(np.sum(self._recent))
+        self._total_squares = float(np.sum(np.square(self._recent)))
+        return np.column_stack((middle - spread, middle, middle + spread))
+
+    def update(self, bar):
+        """
+        Function to add one new bar & return (lower, middle, upper) for it
+        """
+        value = float(bar.close) - self._shift
+        if len(self._recent) == self.window:
+            oldest = self._recent[0]
+            self._total -= oldest
+            self._total_squares -= oldest * oldest
+        self._recent.append(value)
+        self._total += value
+        self._total_squares += value * value
+        if len(self._recent) < self.window:
+            return (np.nan, np.nan, np.nan)
+        mean = self._total / self.window
+        spread = self.width * np.sqrt(max(self._total_squares / self.window - mean * mean,
+                                          0.0))
+        middle = mean + self._shift
+        return (middle - spread, middle, middle + spread)
+
+
+class RSI:
+    """
+    Relative strength index of the close price over 'window' days, using
+    Wilder's smoothing (an exponential average with alpha = 1/window) of the
+    daily gains & losses. Values are between 0 & 100.
+    """
+    overlay = False     # Drawn on its own axis
+
+    def __init__(self, window=14):
+        self.window = window
+        self.name = 'RSI {}'.format(window)
+        self._previous_close = None
+        self._gain = 0.0
+        self._loss = 0.0
+        self._count = 0
+
+    def compute(self, prices):
+        """
+        Function to calculate the indicator over the whole price history
+        """
+        close = np.asarray(prices.close, dtype=np.float64)
+        result = np.full(len(close), np.nan)
+        self._count = len(close)
+        if len(close) < 2:
+            self._previous_close = close[-1] if len(close) > 0 else None
+            return result
+        change = np.diff(close)
+        alpha = 1.0 / self.window
+        gain = ema(np.maximum(change, 0.0), alpha)
+        loss = ema(np.maximum(-change, 0.0), alpha)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result[1:] = np.where(loss == 0.0, 100.0, 100.0 - 100.0 / (1.0 + gain / loss))
+        result[:self.window] = np.nan
+        self._previous_close, self._gain, self._loss = close[-1], gain[-1], loss[-1]
+        return result
+
+    def update(self, bar):
+        """
+        Function to add one new bar & return the indicator value for it
+        """
+        close = float(bar.close)
+        self._count += 1
+        if self._previous_close is None:
+            self._previous_close = close
+            return np.nan
+        change = close - self._previous_close
+        self._previous_close = close
+        alpha = 1.0 / self.window
+        if self._count == 2:
+            self._gain, self._loss = max(change, 0.0), max(-change, 0.0)
+        else:
+            self._gain = alpha * max(change, 0.0) + (1.0 - alpha) * self._gain
+            self._loss = alpha * max(-change, 0.0) + (1.0 - alpha) * self._loss
+        if self._count <= self.window:
+            return np.nan
+        if self._loss == 0.0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self._gain / self._loss)
+
+
+class ATR:
+    """
+    Average true range over 'window' days, using Wilder's smoothing
+    """
+    overlay = False
+
+    def __init__(self, window=14):
+        self.window = window
+        self.name = 'ATR {}'.format(window)
+        self._previous_close = None
+        self._last = None
+        self._count = 0
+
+    def compute(self, prices):
+        """
+        Function to calculate the indicator over the whole price history
+        """
+        ranges = true_range(prices.high, prices.low, prices.close)
+        result = ema(ranges, 1.0 / self.window)
+        self._count = len(result)
+        if len(result) > 0:
+            self._previous_close, self._last = float(prices.close[-1]), result[-1]
+        result[:self.window - 1] = np.nan
+        return result
+
+    def update(self, bar):
+        """
+        Function to add one new bar & return the indicator value for it
+        """
+        high, low = float(bar.high), float(bar.low)
+        previous_close = float(bar.close) if self._previous_close is None \
+            else self._previous_close
+        bar_range = max(high - low, abs(high - previous_close), abs(low - previous_close))
+        self._last = bar_range if self._last is None else \
+            bar_range / self.window + (1.0 - 1.0 / self.window) * self._last
+        self._previous_close = float(bar.close)
+        self._count += 1
+        return self._last if self._count >= self.window else np.nan
+
+
+class VWAP:
+    """
+    Volume weighted average price over 'window' days, using the typical price
+    (high + low + close)/3 of each day. window=0 gives the cumulative VWAP
+    from the first bar.
+    """
+    overlay = True
+
+    def __init__(self, window=20):
+        self.window = window
+        self.name = 'VWAP {}'.format(window) if window else 'VWAP'
+        self._recent = collections.deque(maxlen=window or None)
+        self._value_total = 0.0
+        self._volume_total = 0.0
+
+    @staticmethod
+    def _typical_value(prices):
+        """
+        Function to return typical price x volume & volume of each bar
+        """
+        typical = (np.asarray(prices.high, dtype=np.float64) + prices.low + prices.close) / 3.0
+        volume = np.asarray(prices.volume, dtype=np.float64)
+        return typical * volume, volume
+
+    def compute(self, prices):
+        """
+        Function to calculate the indicator over the whole price history
+        """
+        value, volume = self._typical_value(prices)
+        if self.window:
+            value_total = rolling_sum(value, self.window)
+            volume_total = rolling_sum(volume, self.window)
+            self._recent = collections.deque(zip(value[-self.window:], volume[-self.window:]),
+                                             maxlen=self.window)
+            self._value_total = float(np.sum(value[-self.window:]))
+            self._volume_total = float(np.sum(volume[-self.window:]))
+        else:
+            value_total, volume_total = np.cumsum(value), np.cumsum(volume)
+            self._value_total = float(value_total[-1]) if len(value) > 0 else 0.0
+            self._volume_total = float(volume_total[-1]) if len(value) > 0 else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return value_total / volume_total
+
+    def update(self, bar):
+        """
+        Function to add one new bar & return the indicator value for it
+        """
+        volume = float(bar.volume)
+        value = (float(bar.high) + float(bar.low) + float(bar.close)) / 3.0 * volume
+        if self.window:
+            if len(self._recent) == self.window:
+                old_value, old_volume = self._recent[0]
+                self._value_total -= old_value
+                self._volume_total -= old_volume
+            self._recent.append((value, volume))
+        self._value_total += value
+        self._volume_total += volume
+        if (self.window and len(self._recent) < self.window) or self._volume_total == 0:
+            return np.nan
+        return self._value_total / self._volume_total
+
+
+#Indicator classes by name, see from_spec()
+INDICATORS = {'SMA': SMA, 'EMA': EMA, 'BOLLINGER': Bollinger, 'RSI': RSI, 'ATR': ATR,
+              'VWAP': VWAP}
+
+
+def from_spec(spec):
+    """
+    Function to create an indicator from text, e.g. 'SMA:50', 'Bollinger:20:2'
+    or 'RSI' (default parameters)
+    Input parameters : spec - text, name & parameters separated by ':'
+    Return parameters : indicator object
+    Raises ValueError for an unknown name or bad parameters
+    """
+    name, *params = spec.split(':')
+    indicator_class = INDICATORS.get(name.strip().upper())
+    if indicator_class is None:
+        raise ValueError("Unknown indicator {}, expected one of {}"
+                         .format(name, ', '.join(INDICATORS)))
+    return indicator_class(*(float(param) if '.' in param else int(param)
+                             for param in params))
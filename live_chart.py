@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+"""
+Module to keep a shown stock price chart up to date with new bars, redrawing
+only what changed (matplotlib blitting) instead of the whole figure
+
+The chart is first drawn as usual (see stock_charts.py). LiveChart then takes
+over the latest bar of each followed line/candlestick chart & draws it as a
+separate 'animated' artist. The rest of the chart is saved as a background
+image after every full draw.
+1. An update of the latest bar (the current trading day) restores the saved
+   background & draws just the latest bar on top - no full redraw.
+2. When a bar for a new day arrives the previous latest bar is added to the
+   history arrays & the chart is redrawn once.
+On a weekly, monthly or yearly candlestick chart the latest candle is that of
+the current period - its first open, highest high, lowest low, the latest
+close & the total volume, with the latest bar included.
+New bars are read by a polling thread (e.g. price_cache.load_history) or
+pushed with LiveChart.push() from any thread, & are applied on the GUI
+thread by a timer. The work per update does not grow as the session runs.
+"""
+
+import queue
+import threading
+
+import numpy as np
+
+import alphavantage
+import candlestick
+import resample
+import stock_dates
+
+
+def _bar(prices, index):
+    """
+    Function to return one bar of a DailySeries as a DailySeries of single values
+    """
+    return alphavantage.DailySeries(*(column[index] for column in prices))
+
+
+def _append_bar(prices, bar):
+    """
+    Function to return prices with one bar added at the end
+    """
+    records = alphavantage.to_records(prices)
+    grown = np.empty(len(records) + 1, dtype=alphavantage.OHLCV_DTYPE)
+    grown[:-1] = records
+    grown[-1] = tuple(bar)
+    return alphavantage.as_series(grown)
+
+
+class _CandleTrack:
+    """
+    Latest bar of a resample.CandleDetail chart, drawn as animated artists
+    """
+
+    def __init__(self, ax, detail):
+        self.detail = detail
+        prices = detail.prices
+        self.live = _bar(prices, -1)
+        #The chart leaves out the candle of the current period, drawn here
+        detail.live_date = self.live.date
+        detail.set_prices(alphavantage.as_series(alphavantage.to_records(prices)[:-1]))
+        self.kwargs = {key: value for key, value in detail.candle_kwargs.items()
+                       if key not in ('width', 'label')}
+        self.wicks, self.bodies = candlestick.candlestick_ohlc(
+            ax, *self._arrays(self._period_bar()), width=self._width(), **self.kwargs)
+        self.wicks.set_animated(True)
+        self.bodies.set_animated(True)
+
+    @staticmethod
+    def _arrays(bar):
+        return (stock_dates.to_mpl_dates([bar.date]), [bar.open], [bar.high],
+                [bar.low], [bar.close])
+
+    def _width(self):
+        """
+        Function to return the width of the latest candle in days - the width
+        of the candles of the period the chart shows (daily, weekly, ...)
+        """
+        return self.detail.candle_kwargs.get('width', 0.6) * \
+            resample.CALENDAR_DAYS[self.detail.period]
+
+    def _period_bar(self):
+        """
+        Function to return the candle of the current period - the latest bar
+        combined with the earlier days of its week, month or year
+        """
+        earlier = self.detail.live_bars(self.detail.period)
+        if earlier is None:
+            return self.live
+        return alphavantage.DailySeries(earlier.date, earlier.open,
+                                        max(earlier.high, self.live.high),
+                                        min(earlier.low, self.live.low), self.live.close,
+                                        earlier.volume + self.live.volume)
+
+    def artists(self):
+        return (self.wicks, self.bodies)
+
+    def set_live(self, bar):
+        """
+        Function to show a new version of the latest bar
+        """
+        self.live = bar
+        candlestick.update_candles(self.wicks, self.bodies, *self._arrays(self._period_bar()),
+                                   width=self._width(), **self.kwargs)
+
+    def roll(self, bar):
+        """
+        Function to move the latest bar into the history & show a new latest bar
+        - the candle of the current period becomes part of the chart only when
+        the new bar starts a new period
+        """
+        self.detail.live_date = bar.date
+        self.detail.set_prices(_append_bar(self.detail.prices, self.live))
+        self.set_live(bar)
+
+
+class _LineTrack:
+    """
+    Latest point of a resample.LineDetail chart, drawn as an animated line
+    segment from the previous close
+    """
+
+    def __init__(self, ax, detail, prices):
+        self.detail = detail
+        self.live = _bar(prices, -1)
+        detail.set_data(detail.mpl_dates[:-1], detail.values[:-1])
+        self.segment, = ax.plot([], [], color=detail.line.get_color(),
+                                linewidth=detail.line.get_linewidth(), animated=True)
+        self.set_live(self.live)
+
+    def artists(self):
+        return (self.segment,)
+
+    def set_live(self, bar):
+        """
+        Function to show a new version of the latest point
+        """
+        self.live = bar
+        self.segment.set_data([self.detail.mpl_dates[-1],
+                               stock_dates.to_mpl_dates([bar.date])[0]],
+                              [self.detail.values[-1], bar.close])
+
+    def roll(self, bar):
+        """
+        Function to move the latest point into the history & show a new one
+        """
+        self.detail.set_data(np.append(self.detail.mpl_dates,
+                                       stock_dates.to_mpl_dates([self.live.date])),
+                             np.append(self.detail.values, self.live.close))
+        self.set_live(bar)
+
+
+class LiveChart:
+    """
+    Keeps the line/candlestick charts on one matplotlib axes up to date
+    Input parameters : fig, ax - matplotlib figure & axes already drawn on
+
+    Example
+        charts = stock_charts.plot_candlestick(fig, ax, 'MSFT', prices)
+        live = LiveChart(fig, ax)
+        live.follow_candles('MSFT', charts[0])
+        live.start(price_cache.load_history, interval=60)
+        plt.show()
+    """
+
+    def __init__(self, fig, ax):
+        self.fig = fig
+        self.ax = ax
+        self.tracks = {}            # symbol -> list of tracks
+        self.background = None
+        self.updates = 0            # Number of blitted updates
+        self.full_draws = 0         # Number of full redraws
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._timer = None
+        self._poller = None
+        fig.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def follow_candles(self, symbol, detail):
+        """
+        Function to keep a candlestick chart of a symbol up to date
+        Input parameters : symbol - text, detail - resample.CandleDetail with at
+        least two bars
+        """
+        self.tracks.setdefault(symbol, []).append(_CandleTrack(self.ax, detail))
+
+    def follow_line(self, symbol, detail, prices):
+        """
+        Function to keep a closing price line of a symbol up to date
+        Input parameters : symbol - text, detail - resample.LineDetail of the
+        close prices, prices - the DailySeries it was drawn from
+        """
+        self.tracks.setdefault(symbol, []).append(_LineTrack(self.ax, detail, prices))
+
+    def push(self, symbol, bars):
+        """
+        Function to hand new bars to the chart - safe to call from any thread
+        Input parameters : symbol - text, bars - DailySeries in date order
+        (bars older than the latest bar shown are ignored)
+        """
+        self._queue.put((symbol, bars))
+
+    def start(self, fetch=None, interval=60.0, check_interval=0.25):
+        """
+        Function to start applying new bars to the chart
+        Input parameters
+        1. fetch - function(symbol) returning a DailySeries of recent bars, called
+           every 'interval' seconds on a background thread, e.g.
+           price_cache.load_history. None if bars are only pushed.
+        2. interval - float/seconds between polls
+        3. check_interval - float/seconds between checks for new bars on the
+           GUI thread
+        """
+        if fetch is not None:
+            self._poller = threading.Thread(target=self._poll, args=(fetch, interval),
+                                            daemon=True)
+            self._poller.start()
+        self._timer = self.fig.canvas.new_timer(interval=int(check_interval * 1000))
+        self._timer.add_callback(self.process_updates)
+        self._timer.start()
+
+    def stop(self):
+        """
+        Function to stop polling & applying new bars
+        """
+        self._stop.set()
+        if self._timer is not None:
+            self._timer.stop()
+
+    def _poll(self, fetch, interval):
+        """
+        Function run on the polling thread
+        """
+        while not self._stop.wait(interval):
+            for symbol in list(self.tracks):
+                try:
+                    self.push(symbol, fetch(symbol))
+                except Exception as err:
+                    print("Error when reading new data for {} : {}".format(symbol, err))
+
+    def process_updates(self):
+        """
+        Function to apply all the waiting new bars & update the chart -
+        called by the GUI timer
+        """
+        changed = redraw = False
+        while True:
+            try:
+                symbol, bars = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            for track in self.tracks.get(symbol, ()):
+                #Skip the bars already in the history - fetch may return it all
+                first = int(np.searchsorted(bars.date, track.live.date))
+                for index in range(first, len(bars.date)):
+                    bar = _bar(bars, index)
+                    if bar.date == track.live.date:
+                        track.set_live(bar)
+                        changed = True
+                    elif bar.date > track.live.date:
+                        track.roll(bar)
+                        changed = redraw = True
+                    redraw = redraw or self._outside_limits(bar)
+        if redraw:
+            self._expand_limits()
+            self.full_draws += 1
+            self.fig.canvas.draw_idle()
+        elif changed:
+            self._blit()
+
+    def _outside_limits(self, bar):
+        """
+        Function to check if a bar is outside the visible price range
+        """
+        low, high = self.ax.get_ylim()
+        return bar.high > high or bar.low < low
+
+    def _expand_limits(self):
+        """
+        Function to extend the data limits to the latest bars, the axes follow
+        if autoscaling is on
+        """
+        for tracks in self.tracks.values():
+            for track in tracks:
+                date = stock_dates.to_mpl_dates([track.live.date])[0]
+                self.ax.update_datalim(((date, track.live.low), (date, track.live.high)))
+        self.ax.autoscale_view()
+        low, high = self.ax.get_ylim()
+        top = max(track.live.high for tracks in self.tracks.values() for track in tracks)
+        if top > high:
+            self.ax.set_ylim(low, top * 1.15)
+
+    def _artists(self):
+        return [artist for tracks in self.tracks.values() for track in tracks
+                for artist in track.artists()]
+
+    def _on_draw(self, event):
+        """
+        Function called after every full draw - save the background of the
+        axes & draw the latest bars on top. The chart may have been zoomed, so
+        the latest bars are first fitted to it again (e.g. the candle width).
+        """
+        self.background = self.fig.canvas.copy_from_bbox(self.ax.bbox)
+        for tracks in self.tracks.values():
+            for track in tracks:
+                track.set_live(track.live)
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+
+    def _blit(self):
+        """
+        Function to redraw only the latest bars over the saved background -
+        only the axes area is copied to the screen
+        """
+        if self.background is None:
+            self.fig.canvas.draw_idle()
+            return
+        self.fig.canvas.restore_region(self.background)
+        for artist in self._artists():
+            self.ax.draw_artist(artist)
+        self.fig.canvas.blit(self.ax.bbox)
+        self.updates += 1
@@ -1,124 +1,127 @@
 """
-Code to read Microsoft stock price data from an URL, extract specific data & plot using
-matplotlib
+Code to read stock price data (e.g. Microsoft) from an URL, extract specific data
+& plot using matplotlib
 
 Specific task include 
-(i)     reading data from a web page using urllib.request.urlopen(),
-(ii)    extracting relevant data including: date, float & integer types, using:
-          dateutil.parser() for date info
-          re.findall()      to find floats & integers i.e. price & volume
-          split()
-(iii)   plot the results using matplotlib.pyplot.plot_date
+(i)     reading data from a web page, for several stock symbols concurrently
+        (fetch_engine.py), with a local cache of the data so only the latest
+        days are read on later runs (price_cache.py)
+(ii)    extracting relevant data including: date, float & integer types, using
+          alphavantage.parse_daily() to decode the data into numpy arrays
+(iii)   plot the results using matplotlib with date numbers, drawing only as
+        many points as the graph width can show (resample.py)
         To experiment in working with the required format of date info
-        (numpy.ndarray array), three methods of generating this are tried.
+        (numpy.ndarray array), three methods of generating this are tried,
+        each converting the whole date column at once (stock_dates.py).
+
+The work is done by main(), so the module can be imported without reading
+the web page or opening a window. Matplotlib is imported by main() only.
 
 Note - the correct functioning of this code depends on the (i) the URL &
 (ii) format of stock data/info from www.alphavantage.com 
 
 """
 
-import time
-import urllib
-import re          #re = regular expressions matching options 
-import datetime as dt
-import matplotlib.pyplot as plt
-import dateutil.parser as dparser
-import numpy as np
-
-#URL of the Microsoft stock price data
-stock_price_url = "http://www.alphavantage.co/query?function=\
-TIME_SERIES_DAILY&symbol=MSFT&outputsize=full&apikey=demo"
-
-try:
-   #Open stock price date web page & read all the stock data
-   source_code = urllib.request.urlopen(stock_price_url).read()\
-   .decode("utf-8", "ignore")
-except urllib.error.URLError as e1:
-    print ("URL error : {}".format(e1))
-except urllib.error.HTTPError as e2:
-    print ("HTTP or Authentication error : {}".format(e2))
-except urllib.error.ContentTooShortError as e3:
-    print ("URL content too short : {}".format(e3))
-except Exception as e4:
-    print ("Error when reading Web data : {}".format(e4))
-else:   #read operation was successful
-    
-    #Split by the newline character
-    split_source = source_code.split('\n')
-
-    #Calculate the number of lines in the file
-    lines_in_file = len(split_source)
-
-    line_of_first_trade_date = 9  # The first record is known to start at line 9
-    lines_at_file_end = 3       # Last three lines are known not to contain data
-    lines_per_record = 7        # 7 lines of stock data per day, i.e. 7 lines of data per record
-    close_price_offset = 4      # Stock closing price offset within each day of data
-    volume_offset = 5           # Stock volume offset within each day of data
-
-    #Caluculate the number of records/days worth of stock
-    records_in_file = (lines_in_file - line_of_first_trade_date -\
-                       lines_at_file_end +1)//lines_per_record
-
-    trade_dates = []    #Date of trading day
-    unix_time_1 = []    # List of days in integer format
-    unix_time_2 = []
-    close_prices = []   #Closing stock price for each date
-    volume_traded = []  #Volume of stocks traded on each date
-
-    record_number = 1
-
-    while record_number <= records_in_file:
-        record_start_line = line_of_first_trade_date + \
-        (record_number-1)*lines_per_record
-        date = dparser.parse(split_source[record_start_line], fuzzy=True)
-        trade_dates.append(date)    #trade_date is type datetime.datetime
-
-        #Date type of trade_date.timetuple() is time.struct_time - full 9-tuple
-        #Time.mktime produces a float (which is compatible with time())
-        unix_time_1.append(int(time.mktime(date.timetuple())))
-
-
-        #Find & extract the End of Day stock price (type=float) by
-        #(i) searching for combination of : <int>+'.'+<int> within the string
-        #(ii) converting using string->float &
-        #(iii) append/add to the close_price array
-        eod_price = re.findall("\d+\.\d+",
-                               split_source[record_start_line + close_price_offset])[0]
-        close_prices.append(float(eod_price))
-
-        #Stock volume info is contained is in a line of text
-        # (i) split the line on the ":" character
-        # (ii) use re.findall(),
-        # (iii) convert from string->integer &
-        # (iv) append/add to the volume_traded array
-        list_from_string = split_source[record_start_line + volume_offset].split(':')
-        volume = re.findall("\d+", list_from_string[1])[0]
-        volume_traded.append(int(volume))
-
-        record_number += 1  #increment the recond number
-
-    # Note Matplotlib.pyplot (below) needs a numpy ndarray containg dates ...
-    #... (i.e. x-axis data) to work with matplotlib.pyplot.plot_date
-    #Either of 3 methods below that generate the dates work ...
-    # (i) using array trade_dates
-    # (ii) using numpy.asarray(trade_dates)
-    # (iii) convering the array of date interger value unix_time_1 to numpy.ndarray
-
-    #Convert date array to numpy array using numpy.asarray()
-    mpl_dates = np.asarray(trade_dates)
-
-    #Run date conversion function to create unix_time_2 of type numpy.ndarray from
-    #unix_time_1, a list of integers.
-    date_convert = np.vectorize(dt.datetime.fromtimestamp)
-    unix_time_2 = date_convert(unix_time_1)
-
-    #Plot the data, labels of x & y axis, title & legend
-    plt.plot_date(trade_dates, close_prices, '-', label='MSFT/Microsoft')
+import urllib.error
+
+import fetch_engine
+import price_cache
+import price_db
+import stock_dates
+
+#Symbols of the stock price data to plot, e.g. ['MSFT', 'AAPL', 'IBM']
+stock_symbols = ['MSFT']
+
+#Set live_mode to True to keep the graph up to date while it is shown - the
+#... latest days are read again every live_interval seconds & only the latest
+#... point of each line is redrawn, see live_chart.py
+live_mode = False
+live_interval = 60
+
+
+def main():
+    """
+    Function to load the stock data & show the line graph
+    """
+    #Imported here - loading matplotlib is most of the start up time
+    import matplotlib.pyplot as plt
+
+    import indicators
+    import live_chart
+    import stock_charts
+
+    #Load the stock data from the local cache, reading only the latest days
+    #... from the web page (the full history is read on the first run only).
+    #All the symbols are read concurrently, see fetch_engine.py
+    with fetch_engine.Fetcher(max_workers=8) as fetcher:
+        all_prices = fetcher.load_many(stock_symbols)
+
+    #resample.LineDetail of each line plotted - these must be kept as
+    #... matplotlib only keeps a weak reference to their zoom/pan callbacks
+    line_charts = []
+    live = live_chart.LiveChart(plt.gcf(), plt.gca()) if live_mode else None
+
+    #A copy of the bars of each symbol is kept in the sqlite3 price database, see
+    #... price_db.py - only the bars from the latest stored day on are written
+    price_conn = price_db.connect()
+
+    for stock_symbol in stock_symbols:
+        prices = all_prices[stock_symbol]
+        #load_many() returns the exception in place of the data if a read failed
+        if isinstance(prices, urllib.error.HTTPError):
+            print ("HTTP or Authentication error {} : {}".format(stock_symbol, prices))
+            continue
+        elif isinstance(prices, urllib.error.ContentTooShortError):
+            print ("URL content too short {} : {}".format(stock_symbol, prices))
+            continue
+        elif isinstance(prices, urllib.error.URLError):
+            print ("URL error {} : {}".format(stock_symbol, prices))
+            continue
+        elif isinstance(prices, ValueError):
+            print ("Error when decoding stock data {} : {}".format(stock_symbol, prices))
+            continue
+        elif isinstance(prices, Exception):
+            print ("Error when reading Web data {} : {}".format(stock_symbol, prices))
+            continue
+
+        if price_conn is not None:
+            price_db.save_new_prices(price_conn, stock_symbol, prices)
+
+        #prices holds one numpy array per column (date, open, high, low, close &
+        #... volume), see alphavantage.py & price_cache.py
+        trade_dates = prices.date       #Date of trading day, numpy.datetime64[D]
+        close_prices = prices.close     #Closing stock price for each date
+        volume_traded = prices.volume   #Volume of stocks traded on each date
+
+        # Note Matplotlib.pyplot (below) needs a numpy ndarray containg dates ...
+        #... (i.e. x-axis data). Each of the 3 date columns below works & each
+        #... is converted from trade_dates in one vectorized step, see stock_dates.py
+        # (i) trade_dates, the numpy.datetime64 array itself
+        # (ii) mpl_dates, matplotlib date numbers (as matplotlib.dates.date2num)
+        # (iii) unix_time_2, from the unix time (seconds) integers in unix_time_1
+        mpl_dates = stock_dates.to_mpl_dates(trade_dates)
+        unix_time_1 = stock_dates.to_unix_time(trade_dates)
+        unix_time_2 = stock_dates.from_unix_time(unix_time_1)
+
+        #Plot the data, matplotlib date numbers on the x axis. Only about one
+        #... point per pixel of the visible date range is drawn & the line is
+        #... redrawn when the graph is zoomed or panned, see stock_charts.py
+        #The 50 day simple moving average is drawn with each line, see indicators.py
+        symbol_charts = stock_charts.plot_close_prices(plt.gca(), stock_symbol, prices,
+                                                       overlays=[indicators.SMA(50)])
+        if live is not None:
+            live.follow_line(stock_symbol, symbol_charts[0], prices)
+        line_charts += symbol_charts
+
+    if price_conn is not None:
+        price_conn.close()
 
     #add gridlines. labels for x & y axes & graph title & show the plot/graph
-    plt.grid(True, color='y', linestyle='-', linewidth=1)
-    plt.xlabel('Date')
-    plt.ylabel('$')
-    plt.title('Stock prices')
-    plt.legend()
+    stock_charts.format_line_chart(plt.gca())
+    if live is not None:
+        live.start(price_cache.load_history, interval=live_interval)
     plt.show()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+Module to store daily stock price data in memory-mapped binary files
+
+There is one file per stock symbol, <store_dir>/<SYMBOL>.ohlcv, laid out as
+1. a 64 byte header : magic text, number of records & capacity (records)
+2. six fixed width columns, one after the other, each 'capacity' records
+   long : date (datetime64[D]), open, high, low, close (float64) & volume
+   (int64). Every value is 8 bytes.
+
+The columns are opened with numpy.memmap, so loading a file costs no parsing
+& no copying - the operating system reads in only the pages that are used.
+Spare capacity at the end of each column lets new bars be appended in place,
+the file is only rewritten when it is full (with double the capacity) or a
+stored bar changes.
+"""
+
+import os
+import struct
+import numpy as np
+
+import alphavantage
+
+#Default directory holding the store files, relative to the working directory
+STORE_DIR = 'price_store'
+
+MAGIC = b'OHLCV001'
+HEADER_FORMAT = '<8sqq'     # magic, number of records, capacity
+HEADER_SIZE = 64
+VALUE_SIZE = 8              # Bytes per value, the same for every column
+MIN_CAPACITY = 1024
+
+
+def store_path(symbol, store_dir=STORE_DIR):
+    """
+    Function to return the name of the store file of a stock symbol
+    Input parameters : symbol - text, store_dir - text/store directory
+    Return parameters : text/file name
+    """
+    return os.path.join(store_dir, symbol.upper() + '.ohlcv')
+
+
+def read_header(file_name):
+    """
+    Function to read the header of a store file
+    Input parameters : file_name - text
+    Return parameters : tuple of integers (number of records, capacity)
+    Raises OSError if the file cannot be read & ValueError if it is not a
+    store file
+    """
+    with open(file_name, 'rb') as store_file:
+        header = store_file.read(struct.calcsize(HEADER_FORMAT))
+    if len(header) < struct.calcsize(HEADER_FORMAT):
+        raise ValueError("{} is not a price store file".format(file_name))
+    magic, num_records, capacity = struct.unpack(HEADER_FORMAT, header)
+    if magic != MAGIC or not 0 <= num_records <= capacity:
+        raise ValueError("{} is not a price store file".format(file_name))
+    return num_records, capacity
+
+
+def _write_count(file_name, num_records, capacity):
+    """
+    Function to write the header of a store file in place
+    """
+    with open(file_name, 'r+b') as store_file:
+        store_file.write(struct.pack(HEADER_FORMAT, MAGIC, num_records, capacity))
+
+
+def _column(file_name, col_num, capacity, start, stop, mode='r'):
+    """
+    Function to memory-map records start to stop of one column of a file
+    Input parameters
+    1. file_name - text
+    2. col_num - integer/column number, see alphavantage.COLUMN_DTYPES
+    3. capacity - integer/capacity of the file (records per column)
+    4. start, stop - integers/first & one past the last record mapped
+    5. mode - text/numpy.memmap mode, 'r' or 'r+'
+    Return parameters : numpy.memmap, or an empty array if start == stop
+    """
+    dtype = alphavantage.COLUMN_DTYPES[col_num]
+    if stop <= start:
+        return np.empty(0, dtype=dtype)
+    offset = HEADER_SIZE + (col_num * capacity + start) * VALUE_SIZE
+    return np.memmap(file_name, dtype=dtype, mode=mode, offset=offset,
+                     shape=(stop - start,))
+
+
+def write_series(symbol, prices, store_dir=STORE_DIR, capacity=0):
+    """
+    Function to write (or overwrite) the store file of a stock symbol
+    The file is written under a temporary name & then renamed, so a reader
+    never sees a partly written file.
+    Input parameters
+    1. symbol - text/stock symbol
+    2. prices - DailySeries of numpy arrays in date order
+    3. store_dir - text/store directory, created if it does not exist
+    4. capacity - integer/records reserved per column, at least 2x the
+       number of records
+    Return parameters : None
+    """
+    num_records = len(prices.date)
+    capacity = max(capacity, 2 * num_records, MIN_CAPACITY)
+    os.makedirs(store_dir, exist_ok=True)
+    file_name = store_path(symbol, store_dir)
+    temp_name = file_name + '.tmp'
+    with open(temp_name, 'wb') as store_file:
+        store_file.write(struct.pack(HEADER_FORMAT, MAGIC, num_records, capacity)
+                         .ljust(HEADER_SIZE, b'\0'))
+        for col_num, values in enumerate(prices):
+            column = np.zeros(capacity, dtype=alphavantage.COLUMN_DTYPES[col_num])
+            column[:num_records] = values
+            store_file.write(column.tobytes())
+    os.replace(temp_name, file_name)
+
+
+def open_series(symbol, store_dir=STORE_DIR):
+    """
+    Function to open the stored price data of a stock symbol, read only
+    Input parameters : symbol - text, store_dir - text/store directory
+    Return parameters : DailySeries of numpy.memmap arrays, oldest day first
+    Raises OSError if there is no store file & ValueError for a bad file
+    """
+    file_name = store_path(symbol, store_dir)
+    num_records, capacity = read_header(file_name)
+    return alphavantage.DailySeries(*(_column(file_name, col_num, capacity, 0, num_records)
+                                      for col_num in range(len(alphavantage.COLUMN_DTYPES))))
+
+
+def read_range(symbol, start_date=None, end_date=None, store_dir=STORE_DIR):
+    """
+    Function to return the stored price data between two dates (inclusive)
+    The date column is binary searched, then only the records in range are
+    mapped, so only the pages holding them are read from disk.
+    Input parameters
+    1. symbol - text/stock symbol
+    2. start_date, end_date - numpy.datetime64, datetime.date or ISO text
+       e.g. '2008-01-01', None for no limit
+    3. store_dir - text/store directory
+    Return parameters : DailySeries of numpy.memmap arrays, oldest day first
+    """
+    file_name = store_path(symbol, store_dir)
+    num_records, capacity = read_header(file_name)
+    dates = _column(file_name, 0, capacity, 0, num_records)
+    first, last = 0, num_records
+    if start_date is not None:
+        first = int(np.searchsorted(dates, np.datetime64(start_date, 'D'), side='left'))
+    if end_date is not None:
+        last = int(np.searchsorted(dates, np.datetime64(end_date, 'D'), side='right'))
+    return alphavantage.DailySeries(*(_column(file_name, col_num, capacity, first, last)
+                                      for col_num in range(len(alphavantage.COLUMN_DTYPES))))
+
+
+def append_series(symbol, prices, store_dir=STORE_DIR):
+    """
+    Function to add new bars to the store file of a stock symbol, in place
+    Bars in prices replace the stored bars between their first & last dates
+    (the last stored bar may have been saved part way through a trading day).
+    Only bars after the stored ones are written in place - their values are
+    written before the record count in the header is updated, so a reader
+    never sees a partly written bar. If a stored bar would change, or the file
+    is full, the file is rewritten & replaced instead (see write_series()).
+    The file is created if it does not exist.
+    Input parameters
+    1. symbol - text/stock symbol
+    2. prices - DailySeries of numpy arrays in date order
+    3. store_dir - text/store directory
+    Return parameters : integer/number of records stored
+    """
+    file_name = store_path(symbol, store_dir)
+    try:
+        num_records, capacity = read_header(file_name)
+    except (OSError, ValueError):
+        write_series(symbol, prices, store_dir)
+        return len(prices.date)
+    if len(prices.date) == 0:
+        return num_records
+
+    dates = _column(file_name, 0, capacity, 0, num_records)
+    first = int(np.searchsorted(dates, prices.date[0], side='left'))
+    after = int(np.searchsorted(dates, prices.date[-1], side='right'))
+    end = first + len(prices.date)
+    #Bars already stored are left alone if they are the same
+    changed = first < num_records and \
+        any(not np.array_equal(_column(file_name, col_num, capacity, first, num_records),
+                               values[:num_records - first])
+            for col_num, values in enumerate(prices))
+    if after < num_records or end > capacity or changed:
+        #The new bars lie inside the stored history (the later bars must be
+        #... moved), change stored bars a reader may be using or the file is
+        #... full - rewrite it with room to grow
+        stored = open_series(symbol, store_dir)
+        merged = alphavantage.DailySeries(*(np.concatenate((old[:first], new, old[after:]))
+                                            for old, new in zip(stored, prices)))
+        del stored, dates       # Unmap the old file before it is replaced
+        write_series(symbol, merged, store_dir,
+                     2 * capacity if end > capacity else capacity)
+        return len(merged.date)
+
+    if end <= num_records:
+        return num_records
+    for col_num, values in enumerate(prices):
+        column = _column(file_name, col_num, capacity, num_records, end, mode='r+')
+        column[:] = values[num_records - first:]
+        column.flush()
+    _write_count(file_name, end, capacity)
+    return end
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Program & module to compare many stock symbols - daily log returns and their
+correlation & covariance matrices, full period & rolling, plus a heatmap
+
+1. close_matrix() lines the close prices of all symbols up on one trading-day
+   calendar, a (dates x symbols) matrix. A symbol with no bar on a day takes
+   its last close before it (as-of, see price_index.py) & is NaN before its
+   first bar.
+2. log_returns() - differences of log prices, NaN where a price is missing.
+3. The covariance & correlation matrices are built from sums over the dates
+   (count, sum, sum of squares & cross products of each pair of symbols),
+   each a matrix product of a block of dates. So
+   a. pairs of symbols use all the dates both have returns for, and
+   b. the dates are processed in blocks of 'chunk_rows', the memory used is
+      bounded by the block size & the number of symbols, not the history.
+   The rolling matrices add the newest block of returns to the sums & take
+   away the block leaving the window.
+
+Use from the command line, e.g.
+    python portfolio.py MSFT AAPL IBM --window 60 --out correlation.png
+"""
+
+import argparse
+
+import numpy as np
+
+import alphavantage
+import price_cache
+import price_index
+
+CHUNK_ROWS = 1024       # Dates per block of the (dates x symbols) matrix
+CALENDARS = ('union', 'intersection')
+
+
+def common_calendar(series, how='union'):
+    """
+    Function to build the trading-day calendar of several symbols
+    Input parameters
+    1. series - dictionary of symbol -> DailySeries in date order
+    2. how - text/'union' days any symbol traded, 'intersection' days all
+       symbols traded
+    Return parameters : numpy array of datetime64[D] in increasing order
+    """
+    calendar = None
+    for prices in series.values():
+        dates = np.asarray(prices.date, dtype='datetime64[D]')
+        if calendar is None:
+            calendar = np.unique(dates)
+        elif how == 'union':
+            calendar = np.union1d(calendar, dates)
+        elif how == 'intersection':
+            calendar = np.intersect1d(calendar, dates, assume_unique=True)
+        else:
+            raise ValueError("Unknown calendar {}, expected one of {}".format(how, CALENDARS))
+    return np.empty(0, dtype='datetime64[D]') if calendar is None else calendar
+
+
+def close_matrix(series, dates=None, how='union'):
+    """
+    Function to line up the close prices of several symbols on one calendar
+    Input parameters
+    1. series - dictionary of symbol -> DailySeries in date order
+    2. dates - array of dates wanted, the common_calendar() if not given
+    3. how - text/calendar used if dates is not given, see common_calendar()
+    Return parameters : tuple (array of dates, list of symbols, numpy array of
+    float64 with one row per date & one column per symbol)
+    """
+    if dates is None:
+        dates = common_calendar(series, how)
+    symbols = list(series)
+    matrix = np.empty((len(dates), len(symbols)), dtype=np.float64)
+    for col_num, (symbol, values) in enumerate(
+            price_index.as_of_join(dates, series, 'close').items()):
+        matrix[:, col_num] = values
+    return dates, symbols, matrix
+
+
+def log_returns(matrix):
+    """
+    Function to calculate daily log returns
+    Input parameters : matrix - numpy array of prices, one row per date
+    Return parameters : numpy array with one row less, NaN where either price
+    is missing
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_prices = np.log(np.asarray(matrix, dtype=np.float64))
+    return np.diff(log_prices, axis=0)
+
+
+class Moments:
+    """
+    Sums over dates of the returns of each pair of symbols, from which their
+    covariance & correlation are calculated. Entry [i, j] of each matrix
+    covers the dates where both symbol i & symbol j have a return.
+    Input parameters : num_symbols - integer, shift - array of float, one
+    value per symbol taken off the returns before they are summed (e.g. their
+    means) to keep the sums small & accurate
+    """
+
+    def __init__(self, num_symbols, shift=None):
+        self.shift = np.zeros(num_symbols) if shift is None else np.asarray(shift)
+        self.count = np.zeros((num_symbols, num_symbols))
+        self.sum = np.zeros((num_symbols, num_symbols))        # of x_i
+        self.sum_sq = np.zeros((num_symbols, num_symbols))     # of x_i ** 2
+        self.cross = np.zeros((num_symbols, num_symbols))      # of x_i * x_j
+
+    def add(self, returns, sign=1.0):
+        """
+        Function to add (sign 1) or take away (sign -1) a block of returns
+        Input parameters : returns - numpy array, one row per date & one
+        column per symbol, NaN where missing
+        """
+        valid = np.isfinite(returns)
+        values = np.where(valid, returns - self.shift, 0.0)
+        mask = valid.astype(np.float64)
+        self.count += sign * (mask.T @ mask)
+        self.sum += sign * (values.T @ mask)
+        self.sum_sq += sign * ((values * values).T @ mask)
+        self.cross += sign * (values.T @ values)
+
+    def covariance(self, ddof=1, min_periods=2):
+        """
+        Function to return the covariance matrix, NaN for pairs with fewer
+        than min_periods dates in common
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = (self.cross - self.sum * self.sum.T / self.count) / (self.count - ddof)
+        cov[self.count < max(min_periods, ddof + 1)] = np.nan
+        return cov
+
+    def correlation(self, min_periods=2):
+        """
+        Function to return the correlation matrix, NaN for pairs with fewer
+        than min_periods dates in common
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            cov = self.cross - self.sum * self.sum.T / self.count
+            #Sum of squares of symbol i over the dates symbol j also has
+            var = self.sum_sq - self.sum ** 2 / self.count
+            corr = cov / np.sqrt(var * var.T)
+        corr[self.count < min_periods] = np.nan
+        return np.clip(corr, -1.0, 1.0, out=corr)
+
+
+def _column_means(returns):
+    """
+    Function to return the mean of each column ignoring NaN, 0 for a column
+    with no values
+    """
+    valid = np.isfinite(returns)
+    return np.where(valid, returns, 0.0).sum(axis=0) / np.maximum(valid.sum(axis=0), 1)
+
+
+def _moments(returns, chunk_rows):
+    """
+    Function to sum the moments of returns block by block
+    """
+    moments = Moments(returns.shape[1], _column_means(returns[:chunk_rows]))
+    for start in range(0, len(returns), chunk_rows):
+        moments.add(returns[start:start + chunk_rows])
+    return moments
+
+
+def covariance_matrix(returns, ddof=1, min_periods=2, chunk_rows=CHUNK_ROWS):
+    """
+    Function to calculate the covariance matrix of returns over all dates
+    Input parameters
+    1. returns - numpy array, one row per date & one column per symbol
+    2. ddof - integer/delta degrees of freedom, 1 for the sample covariance
+    3. min_periods - integer/fewest dates in common for a value
+    4. chunk_rows - integer/dates processed per block
+    Return parameters : numpy array (symbols x symbols)
+    """
+    return _moments(returns, chunk_rows).covariance(ddof, min_periods)
+
+
+def correlation_matrix(returns, min_periods=2, chunk_rows=CHUNK_ROWS):
+    """
+    Function to calculate the correlation matrix of returns over all dates
+    Input parameters : as covariance_matrix()
+    Return parameters : numpy array (symbols x symbols)
+    """
+    return _moments(returns, chunk_rows).correlation(min_periods)
+
+
+def rolling_matrices(returns, window, step=1, kind='correlation', min_periods=2):
+    """
+    Function to calculate the correlation or covariance matrix of each
+    'window' dates of returns, moving 'step' dates at a time
+    Only the moment sums of one window are held, so memory does not grow with
+    the number of windows - the matrices are yielded one at a time.
+    Input parameters
+    1. returns - numpy array, one row per date & one column per symbol
+    2. window - integer/dates per window
+    3. step - integer/dates between the ends of successive windows
+    4. kind - text/'correlation' or 'covariance'
+    5. min_periods - integer/fewest dates in common for a value
+    Yield parameters : tuple (index of the last date of the window, numpy
+    array symbols x symbols)
+    """
+    if kind not in ('correlation', 'covariance'):
+        raise ValueError("Unknown kind {}, expected correlation or covariance".format(kind))
+    moments = Moments(returns.shape[1], _column_means(returns[:window]))
+    moments.add(returns[:window])
+    end = window
+    while end <= len(returns):
+        if kind == 'correlation':
+            yield end - 1, moments.correlation(min_periods)
+        else:
+            yield end - 1, moments.covariance(min_periods=min_periods)
+        new_end = end + step
+        if new_end > len(returns):
+            break
+        #Add the dates entering the window & take away those leaving it
+        moments.add(returns[end:new_end])
+        moments.add(returns[end - window:new_end - window], -1.0)
+        end = new_end
+
+
+def main():
+    """
+    Function to read the command line options, calculate the correlation
+    matrix of the symbols' daily returns & save it as a heatmap
+    """
+    parser = argparse.ArgumentParser(description="Correlation heatmap of stock returns")
+    parser.add_argument('symbols', nargs='+', help="stock symbols e.g. MSFT AAPL IBM")
+    parser.add_argument('--window', type=int, default=0,
+                        help="use the last WINDOW trading days only (default: all)")
+    parser.add_argument('--kind', choices=('correlation', 'covariance'),
+                        default='correlation')
+    parser.add_argument('--out', default='correlation.png', help="image file name")
+    parser.add_argument('--cache-dir', default=price_cache.CACHE_DIR)
+    parser.add_argument('--no-refresh', action='store_true',
+                        help="use the cached price data without reading the web")
+    parser.add_argument('--query-url', default=alphavantage.QUERY_URL)
+    parser.add_argument('--apikey', default=alphavantage.API_KEY)
+    args = parser.parse_args()
+
+    #Imported here - the calculations do not need matplotlib
+    import fetch_engine
+    import stock_charts
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    with fetch_engine.Fetcher() as fetcher:
+        loaded = fetcher.load_many([symbol.upper() for symbol in args.symbols],
+                                   args.cache_dir, not args.no_refresh, args.apikey,
+                                   args.query_url)
+    series = {}
+    for symbol, prices in loaded.items():
+        if isinstance(prices, Exception):
+            print("{} : Error - {} : {}".format(symbol, type(prices).__name__, prices))
+        else:
+            series[symbol] = prices
+    if not series:
+        return
+
+    dates, symbols, closes = close_matrix(series)
+    returns = log_returns(closes)
+    if args.window > 0:
+        returns = returns[-args.window:]
+    matrix = (correlation_matrix(returns) if args.kind == 'correlation'
+              else covariance_matrix(returns))
+
+    fig = Figure(figsize=(8, 7))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot(1, 1, 1)
+    stock_charts.plot_heatmap(fig, ax, matrix, symbols, "Daily return {} {} to {}".format(
+        args.kind, dates[-len(returns)] if len(returns) else '', dates[-1]))
+    fig.savefig(args.out)
+    print("{} written".format(args.out))
+
+
+if __name__ == '__main__':
+    main()
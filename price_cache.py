@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Module to keep a local, per-symbol cache of daily stock price history
+
+The first request for a symbol downloads the full history (outputsize=full)
+and saves the decoded numpy arrays to <cache_dir>/<SYMBOL>.ohlcv, a memory-
+mapped file (see ohlcv_store.py).
+Later requests open the cached file & download only the latest window
+(outputsize=compact, the last 100 trading days), which is merged into the
+cached history by date - new days are appended in place. If the cached history is older than the
+compact window the full history is downloaded again.
+
+The ETag/Last-Modified headers of the latest window are kept in
+<cache_dir>/<SYMBOL>.http & sent back with the next request for it. If the
+server answers 304 Not Modified the cached history is returned as it is, so
+unchanged data costs one round trip & no download.
+"""
+
+import json
+import os
+
+import alphavantage
+import ohlcv_store
+
+#Default directory holding the cache files, relative to the working directory
+CACHE_DIR = 'price_cache'
+
+
+def cache_path(symbol, cache_dir=CACHE_DIR):
+    """
+    Function to return the name of the cache file of a stock symbol
+    Input parameters : symbol - text, cache_dir - text/cache directory
+    Return parameters : text/file name
+    """
+    return ohlcv_store.store_path(symbol, cache_dir)
+
+
+def load_cached(symbol, cache_dir=CACHE_DIR):
+    """
+    Function to load the cached price history of a stock symbol
+    Input parameters : symbol - text, cache_dir - text/cache directory
+    Return parameters : DailySeries of read only numpy.memmap arrays or None
+    if the symbol is not cached
+    """
+    try:
+        return ohlcv_store.open_series(symbol, cache_dir)
+    except (OSError, ValueError):
+        #No cache file, or one that is incomplete/unreadable
+        return None
+
+
+def save_cached(symbol, prices, cache_dir=CACHE_DIR):
+    """
+    Function to save the price history of a stock symbol to the cache,
+    replacing any cached history
+    Input parameters
+    1. symbol - text/stock symbol
+    2. prices - DailySeries of numpy arrays
+    3. cache_dir - text/cache directory, created if it does not exist
+    Return parameters : None
+    """
+    ohlcv_store.write_series(symbol, prices, cache_dir)
+
+
+def validators_path(symbol, cache_dir=CACHE_DIR):
+    """
+    Function to return the name of the file holding the HTTP validators
+    (ETag & Last-Modified) of the latest data read for a stock symbol
+    """
+    return os.path.join(cache_dir, symbol.upper() + '.http')
+
+
+def load_validators(symbol, cache_dir=CACHE_DIR):
+    """
+    Function to read the HTTP validators of a stock symbol
+    Return parameters : dictionary, empty if none are saved
+    """
+    try:
+        with open(validators_path(symbol, cache_dir)) as validators_file:
+            return json.load(validators_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_validators(symbol, validators, cache_dir=CACHE_DIR):
+    """
+    Function to save the HTTP validators of a stock symbol - nothing is saved
+    if the server sent neither an ETag nor a Last-Modified header
+    """
+    file_name = validators_path(symbol, cache_dir)
+    if any(validators.values()):
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(file_name, 'w') as validators_file:
+            json.dump(validators, validators_file)
+    elif os.path.exists(file_name):
+        os.remove(file_name)
+
+
+def load_history(symbol, cache_dir=CACHE_DIR, refresh=True,
+                 apikey=alphavantage.API_KEY, query_url=alphavantage.QUERY_URL,
+                 fetch=alphavantage.fetch_daily):
+    """
+    Function to return the daily price history of a stock symbol, using the
+    local cache plus a small download of the latest bars
+    Input parameters
+    1. symbol - text/stock symbol e.g. 'MSFT'
+    2. cache_dir - text/cache directory
+    3. refresh - boolean, if False cached data is returned without any download
+    4. apikey - text/Alpha Vantage API key
+    5. query_url - text/URL of the query service, e.g. a local stand-in
+    6. fetch - function(url, validators=...) returning a DailySeries, e.g.
+       Fetcher.fetch from fetch_engine.py to reuse its connections
+    Return parameters : DailySeries of numpy arrays, oldest trading day first
+    Raises urllib.error.URLError on network errors & ValueError on bad data
+    """
+    cached = load_cached(symbol, cache_dir)
+    if cached is not None and len(cached.date) > 0:
+        if not refresh:
+            return cached
+        validators = load_validators(symbol, cache_dir)
+        try:
+            latest = fetch(alphavantage.daily_url(symbol, 'compact', apikey, query_url),
+                           validators=validators)
+        except alphavantage.NotModified:
+            #Nothing new since the last request - the cache is up to date
+            return cached
+        if latest.date[0] <= cached.date[-1]:
+            #The latest window overlaps the cache, so no trading days are
+            #... missing - append the new bars to the cache file in place
+            ohlcv_store.append_series(symbol, latest, cache_dir)
+            #Saved only once the cache holds the new bars
+            save_validators(symbol, validators, cache_dir)
+            return ohlcv_store.open_series(symbol, cache_dir)
+        #There is a gap between the cache & the latest window - reload in full
+        prices = fetch(alphavantage.daily_url(symbol, 'full', apikey, query_url))
+        save_cached(symbol, prices, cache_dir)
+        save_validators(symbol, validators, cache_dir)
+        return prices
+
+    prices = fetch(alphavantage.daily_url(symbol, 'full', apikey, query_url))
+    save_cached(symbol, prices, cache_dir)
+    return prices
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Module to keep daily stock price history in a sqlite3 database, one table
+for all symbols, using the connection helper of sqlite_database1.py
+
+1. The table is keyed by (symbol, date) & created WITHOUT ROWID, so the rows
+   are stored in primary key order - the key is a covering index & a query
+   for one symbol & a date range reads one contiguous run of the table.
+2. Dates are stored as integer days since 1970-01-01 (numpy datetime64[D]),
+   so no text dates are parsed or formatted.
+3. The bars of a symbol are upserted with one executemany() in one
+   transaction, in WAL mode with synchronous=NORMAL - save_new_prices() writes
+   only the bars from the latest stored day on.
+4. Range queries are converted in one step to a record array (numpy
+   structured array, alphavantage.OHLCV_DTYPE), no python loop over the rows.
+"""
+
+import numpy as np
+
+import alphavantage
+import sqlite_database1
+
+#Default database file & table name
+PRICE_DB = 'stock_prices.db'
+PRICE_TABLE = 'price_history'
+
+#Pragmas set on every connection
+#1. WAL - readers do not block the writer & a commit is one sequential append
+#2. synchronous NORMAL - no fsync per commit in WAL mode (a power cut can lose
+#   the last commits but not corrupt the database)
+#3. 64 MB page cache & memory-mapped reads, temporary tables in memory
+PRAGMAS = (('journal_mode', 'WAL'), ('synchronous', 'NORMAL'),
+           ('cache_size', '-65536'), ('mmap_size', '268435456'),
+           ('temp_store', 'MEMORY'))
+
+#Columns of the table after symbol, in the order of alphavantage.OHLCV_DTYPE
+COLUMNS = alphavantage.DailySeries._fields
+
+
+def connect(db_file=PRICE_DB, table=PRICE_TABLE):
+    """
+    Function to open (or create) the price database & its table
+    Input parameters : db_file - text/database file name or ':memory:',
+    table - text/table name
+    Return parameters : sqlite3 connection or None in the case of failure
+    """
+    conn = sqlite_database1.create_connection(db_file)
+    if conn is None:
+        return None
+    for name, value in PRAGMAS:
+        conn.execute('PRAGMA {} = {}'.format(name, value))
+    conn.execute('CREATE TABLE IF NOT EXISTS ' + table +
+                 ' (symbol TEXT NOT NULL, date INTEGER NOT NULL,'
+                 ' open REAL, high REAL, low REAL, close REAL, volume INTEGER,'
+                 ' PRIMARY KEY (symbol, date)) WITHOUT ROWID')
+    return conn
+
+
+def save_prices(conn, symbol, prices, table=PRICE_TABLE):
+    """
+    Function to insert or replace the daily bars of one stock symbol, in one
+    transaction
+    Input parameters
+    1. conn - sqlite3 connection from connect()
+    2. symbol - text/stock symbol
+    3. prices - DailySeries of numpy arrays
+    4. table - text/table name
+    Return parameters : integer/number of bars written
+    """
+    days = np.asarray(prices.date, dtype='datetime64[D]').astype(np.int64)
+    #tolist() converts each column to python numbers in one step
+    rows = zip([symbol] * len(days), days.tolist(),
+               np.asarray(prices.open, dtype=np.float64).tolist(),
+               np.asarray(prices.high, dtype=np.float64).tolist(),
+               np.asarray(prices.low, dtype=np.float64).tolist(),
+               np.asarray(prices.close, dtype=np.float64).tolist(),
+               np.asarray(prices.volume, dtype=np.int64).tolist())
+    #The table has no other index, so replacing a row is as cheap as an
+    #... update & works with sqlite versions before UPSERT (3.24)
+    with conn:
+        conn.executemany('INSERT OR REPLACE INTO ' + table + ' (symbol, ' +
+                         ', '.join(COLUMNS) + ') VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+    return len(days)
+
+
+def save_new_prices(conn, symbol, prices, table=PRICE_TABLE):
+    """
+    Function to upsert only the bars of a stock symbol from its latest stored
+    day on (that day is written again, its bar may have changed since), so a
+    run that already has the history in the database writes a few rows
+    Input parameters : as save_prices()
+    Return parameters : integer/number of bars written
+    """
+    stored = last_date(conn, symbol, table)
+    if stored is not None:
+        #The dates are in order, oldest first
+        first = int(np.searchsorted(np.asarray(prices.date, dtype='datetime64[D]'), stored))
+        prices = alphavantage.DailySeries(*(column[first:] for column in prices))
+    return save_prices(conn, symbol, prices, table)
+
+
+def load_prices(conn, symbol, start_date=None, end_date=None, table=PRICE_TABLE):
+    """
+    Function to read the daily bars of one stock symbol in a date range
+    Input parameters
+    1. conn - sqlite3 connection from connect()
+    2. symbol - text/stock symbol
+    3. start_date, end_date - first & last dates wanted (numpy.datetime64 or
+       'YYYY-MM-DD' text), None for no limit
+    4. table - text/table name
+    Return parameters : DailySeries of numpy arrays, oldest trading day first
+    (empty arrays if there is no data)
+    """
+    first = -2 ** 62 if start_date is None else \
+        int(np.datetime64(start_date, 'D').astype(np.int64))
+    last = 2 ** 62 if end_date is None else \
+        int(np.datetime64(end_date, 'D').astype(np.int64))
+    rows = conn.execute('SELECT ' + ', '.join(COLUMNS) + ' FROM ' + table +
+                        ' WHERE symbol = ? AND date BETWEEN ? AND ? ORDER BY date',
+                        (symbol, first, last)).fetchall()
+    #The integer day numbers convert straight to datetime64[D]
+    return alphavantage.as_series(np.array(rows, dtype=alphavantage.OHLCV_DTYPE))
+
+
+def last_date(conn, symbol, table=PRICE_TABLE):
+    """
+    Function to return the latest trading day stored for a stock symbol
+    Return parameters : numpy.datetime64[D] or None if there is no data
+    """
+    day, = conn.execute('SELECT MAX(date) FROM ' + table + ' WHERE symbol = ?',
+                        (symbol,)).fetchone()
+    return None if day is None else np.datetime64(day, 'D')
+
+
+def list_symbols(conn, table=PRICE_TABLE):
+    """
+    Function to return the stock symbols stored in the database
+    Return parameters : list of text
+    """
+    return [row[0] for row in conn.execute('SELECT DISTINCT symbol FROM ' + table +
+                                           ' ORDER BY symbol')]
+
+
+def load_history(conn, symbol, refresh=True, apikey=alphavantage.API_KEY,
+                 query_url=alphavantage.QUERY_URL, fetch=alphavantage.fetch_daily,
+                 table=PRICE_TABLE):
+    """
+    Function to return the daily price history of a stock symbol from the
+    database, as price_cache.load_history() does from the cache files
+    The first request downloads the full history. Later requests download the
+    latest window (outputsize=compact) & upsert it, overlapping bars replace
+    the stored ones.
+    Input parameters : conn - sqlite3 connection from connect(), the others
+    as price_cache.load_history()
+    Return parameters : DailySeries of numpy arrays, oldest trading day first
+    """
+    stored = last_date(conn, symbol, table)
+    if stored is not None:
+        if refresh:
+            latest = fetch(alphavantage.daily_url(symbol, 'compact', apikey, query_url))
+            if len(latest.date) > 0 and latest.date[0] > stored:
+                #There is a gap between the database & the latest window
+                latest = fetch(alphavantage.daily_url(symbol, 'full', apikey, query_url))
+            save_prices(conn, symbol, latest, table)
+        return load_prices(conn, symbol, table=table)
+    prices = fetch(alphavantage.daily_url(symbol, 'full', apikey, query_url))
+    save_prices(conn, symbol, prices, table)
+    return prices
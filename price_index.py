@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Module to find trading days in a price history by binary search
+
+The date column of a DailySeries is in increasing order (see alphavantage.py),
+so it is its own sorted index - every lookup here is a numpy.searchsorted,
+O(log n), with no scan of the dates.
+1. date_range() & window() - the bars between two dates. window() returns
+   views of the price arrays, nothing is copied.
+2. trailing() - the last N days/months/years of bars, e.g. the last 6 months.
+3. nearest_trading_day() - the trading day on/before/after any date.
+4. as_of() & as_of_join() - for each of a list of dates the latest bar on or
+   before it, e.g. to line up symbols with different trading days.
+"""
+
+import numpy as np
+
+import alphavantage
+
+SIDES = ('before', 'after', 'nearest')
+
+
+def _day(date):
+    return np.datetime64(date, 'D')
+
+
+def date_range(prices, start_date=None, end_date=None):
+    """
+    Function to find the index range of the bars between two dates (inclusive)
+    Input parameters
+    1. prices - DailySeries in date order
+    2. start_date, end_date - numpy.datetime64, datetime.date or ISO text,
+       None for no limit
+    Return parameters : tuple of integers (first, stop)
+    """
+    dates = prices.date
+    first = 0 if start_date is None else \
+        int(np.searchsorted(dates, _day(start_date), side='left'))
+    stop = len(dates) if end_date is None else \
+        int(np.searchsorted(dates, _day(end_date), side='right'))
+    return first, max(first, stop)
+
+
+def window(prices, start_date=None, end_date=None):
+    """
+    Function to return the bars between two dates (inclusive)
+    Input parameters : as date_range()
+    Return parameters : DailySeries of views of the price arrays
+    """
+    first, stop = date_range(prices, start_date, end_date)
+    return alphavantage.DailySeries(*(column[first:stop] for column in prices))
+
+
+def trailing(prices, days=0, months=0, years=0):
+    """
+    Function to return the latest bars covering a number of calendar days,
+    months or years up to the last trading day, e.g. trailing(prices, months=6)
+    Return parameters : DailySeries of views of the price arrays
+    """
+    if len(prices.date) == 0:
+        return prices
+    last = _day(prices.date[-1])
+    month = last.astype('datetime64[M]')
+    start = (month - months - 12 * years).astype('datetime64[D]') + (last - month) - days
+    #A month end such as 31-Mar - 1 month gives 31-Feb, i.e. 3-Mar - close enough
+    return window(prices, start + 1, last)
+
+
+def nearest_trading_day(prices, date, side='before'):
+    """
+    Function to find the bar of the trading day closest to a date
+    Input parameters
+    1. prices - DailySeries in date order
+    2. date - numpy.datetime64, datetime.date or ISO text
+    3. side - text/'before' the last trading day on or before the date,
+       'after' the first on or after it, 'nearest' the closest of the two
+    Return parameters : integer index of the bar, or None if there is no
+    trading day on that side
+    """
+    dates = prices.date
+    date = _day(date)
+    if side == 'before':
+        index = int(np.searchsorted(dates, date, side='right')) - 1
+        return index if index >= 0 else None
+    if side == 'after':
+        index = int(np.searchsorted(dates, date, side='left'))
+        return index if index < len(dates) else None
+    if side == 'nearest':
+        before = nearest_trading_day(prices, date, 'before')
+        after = nearest_trading_day(prices, date, 'after')
+        if before is None or after is None:
+            return after if before is None else before
+        return before if date - dates[before] <= dates[after] - date else after
+    raise ValueError("Unknown side {}, expected one of {}".format(side, SIDES))
+
+
+def as_of(prices, dates):
+    """
+    Function to find, for each date, the last bar on or before it
+    Input parameters : prices - DailySeries in date order, dates - array of
+    dates in any order
+    Return parameters : numpy array of integer indices, -1 where there is no
+    bar on or before the date
+    """
+    return np.searchsorted(prices.date, np.asarray(dates, dtype='datetime64[D]'),
+                           side='right') - 1
+
+
+def as_of_join(dates, series, column='close'):
+    """
+    Function to line up one column of several price histories on one list of
+    dates, taking the last value on or before each date (an as-of join)
+    Input parameters
+    1. dates - array of dates, e.g. the trading days of one symbol
+    2. series - dictionary of symbol -> DailySeries in date order
+    3. column - text/column wanted, e.g. 'close'
+    Return parameters : dictionary of symbol -> numpy array of float, one value
+    per date, NaN before the first bar of the symbol
+    """
+    joined = {}
+    for symbol, prices in series.items():
+        indices = as_of(prices, dates)
+        values = np.asarray(getattr(prices, column), dtype=np.float64)
+        if len(values) == 0:
+            joined[symbol] = np.full(len(indices), np.nan)
+            continue
+        joined[symbol] = np.where(indices >= 0, values[np.maximum(indices, 0)], np.nan)
+    return joined
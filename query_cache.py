@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+"""
+Module to keep the results of database queries in memory, so a query that
+is repeated is answered without reading the database (a read-through cache)
+
+1. Results are kept in least recently used order & the oldest are removed
+   when there are more than max_entries results or max_rows rows in total.
+2. A result older than ttl seconds is read again - this covers changes made
+   by other programs or connections, which the cache is not told about.
+3. With each result the cache keeps the columns its query depends on (search
+   criteria & sort order), the IDs of the rows it returned & the IDs its
+   query is limited to (e.g. a look up of one ID). A change to the table then
+   removes only the results it can affect:
+   a. a new row - every result except those limited to other IDs
+   b. a deleted row - the results that include it
+   c. a changed value - the results that include the row & the results whose
+      query depends on the column changed
+4. hits, misses & evictions are counted.
+"""
+
+import collections
+import time
+
+CacheEntry = collections.namedtuple('CacheEntry', ['rows', 'columns', 'ids', 'key_ids',
+                                                   'expires'])
+
+
+class QueryCache:
+    """
+    Least recently used cache of query results with an age limit
+    Input parameters
+    1. max_entries - integer/most results kept
+    2. max_rows - integer/most rows kept, over all results
+    3. ttl - float/seconds a result is kept, None for no limit
+    4. clock - function returning the time in seconds
+    """
+
+    def __init__(self, max_entries=1024, max_rows=100000, ttl=60.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = collections.OrderedDict()    # key -> CacheEntry, oldest first
+        self.num_rows = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """
+        Function to return the rows of a cached query result
+        Input parameters : key - hashable/the normalized query, e.g. (command,
+        parameters)
+        Return parameters : list of tuples, or None if the result is not cached
+        or has expired
+        """
+        entry = self.entries.get(key)
+        if entry is not None and entry.expires is not None and entry.expires <= self.clock():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return list(entry.rows)
+
+    def put(self, key, rows, columns=(), key_ids=None):
+        """
+        Function to keep a query result
+        Input parameters
+        1. key - hashable/the normalized query
+        2. rows - list of tuples, the first value of each is the row's ID
+        3. columns - iterable of text/lower case names of the columns the
+           query depends on
+        4. key_ids - iterable of the IDs the query is limited to, None if
+           it can return any row
+        """
+        if len(rows) > self.max_rows:
+            return
+        if key in self.entries:
+            self._remove(key)
+        rows = tuple(rows)
+        self.entries[key] = CacheEntry(
+            rows, frozenset(columns), frozenset(row[0] for row in rows),
+            None if key_ids is None else frozenset(key_ids),
+            None if self.ttl is None else self.clock() + self.ttl)
+        self.num_rows += len(rows)
+        while len(self.entries) > self.max_entries or self.num_rows > self.max_rows:
+            self._remove(next(iter(self.entries)))
+            self.evictions += 1
+
+    def _remove(self, key):
+        self.num_rows -= len(self.entries.pop(key).rows)
+
+    def _remove_where(self, test):
+        """
+        Function to remove the results for which test(entry) is True
+        """
+        keys = [key for key, entry in self.entries.items() if test(entry)]
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+
+    def invalidate_insert(self, ids):
+        """
+        Function to remove the results a new row may belong to
+        Input parameters : ids - iterable of the IDs of the new rows, None
+        for an ID chosen by the database
+        """
+        ids = set(ids)
+        if None in ids:
+            self._remove_where(lambda entry: True)
+        else:
+            self._remove_where(lambda entry: entry.key_ids is None or
+                               not entry.key_ids.isdisjoint(ids))
+
+    def invalidate_delete(self, row_id):
+        """
+        Function to remove the results that include a deleted row
+        """
+        self._remove_where(lambda entry: row_id in entry.ids)
+
+    def invalidate_change(self, row_id, column):
+        """
+        Function to remove the results a changed value may affect
+        Input parameters : row_id - ID of the row changed, column - text/lower
+        case name of the column changed
+        """
+        self._remove_where(lambda entry: row_id in entry.ids or column in entry.columns)
+
+    def clear(self):
+        """
+        Function to remove all the results, e.g. after a bulk import
+        """
+        self.invalidations += len(self.entries)
+        self.entries.clear()
+        self.num_rows = 0
+
+    def stats(self):
+        """
+        Function to return the cache counters
+        Return parameters : dictionary of text -> number
+        """
+        lookups = self.hits + self.misses
+        return {'entries': len(self.entries), 'rows': self.num_rows, 'hits': self.hits,
+                'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions, 'invalidations': self.invalidations}
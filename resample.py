@@ -0,0 +1,277 @@
+# -*- coding: utf-8 -*-
+"""
+Module to limit the number of bars/points drawn on a chart to what the
+screen can show
+
+1. resample_ohlcv() aggregates daily bars into weekly, monthly or yearly bars
+   (open of the first day, highest high, lowest low, close of the last day
+   & total volume) with numpy reduceat, no python loop over the bars.
+2. lttb_indices() picks the points of a line that keep its visual shape
+   (Largest-Triangle-Three-Buckets downsampling).
+3. LineDetail & CandleDetail connect to an axes' 'xlim_changed' callback and
+   redraw only the visible part of the data, at a resolution chosen from the
+   visible date range & the axes width in pixels, every time the chart is
+   zoomed or panned. So the number of drawn primitives stays bounded however
+   long the price history is.
+"""
+
+import numpy as np
+
+import alphavantage
+import candlestick
+import stock_dates
+
+#Periods bars can be aggregated to & the approximate number of trading days
+#... (daily bars) in each
+PERIODS = ('D', 'W', 'M', 'Y')
+TRADING_DAYS = {'D': 1, 'W': 5, 'M': 21, 'Y': 252}
+CALENDAR_DAYS = {'D': 1, 'W': 7, 'M': 30.4, 'Y': 365.25}
+
+
+def period_keys(dates, period):
+    """
+    Function to label each date with the period (week, month, ...) it is in
+    Input parameters
+    1. dates - array of datetime64[D]
+    2. period - text/'D' day, 'W' week (Monday to Sunday), 'M' month, 'Y' year
+    Return parameters : numpy array of int64, equal for dates in the same period
+    """
+    days = np.asarray(dates, dtype='datetime64[D]').astype(np.int64)
+    if period == 'D':
+        return days
+    if period == 'W':
+        #Day 0 (1970-01-01) was a Thursday, so weeks start at day 4, 11, ...
+        return (days + 3) // 7
+    if period in ('M', 'Y'):
+        return np.asarray(dates, dtype='datetime64[D]').astype(
+            'datetime64[' + period + ']').astype(np.int64)
+    raise ValueError("Unknown period {}, expected one of {}".format(period, PERIODS))
+
+
+def resample_ohlcv(prices, period):
+    """
+    Function to aggregate daily bars into bars of a longer period
+    Input parameters
+    1. prices - DailySeries of numpy arrays in date order
+    2. period - text/'D', 'W', 'M' or 'Y', see period_keys()
+    Return parameters : DailySeries with one bar per period, dated on the
+    first trading day of the period
+    """
+    if period == 'D' or len(prices.date) == 0:
+        return prices
+    keys = period_keys(prices.date, period)
+    starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    ends = np.append(starts[1:], len(keys)) - 1
+    bars = np.empty(len(starts), dtype=alphavantage.OHLCV_DTYPE)
+    bars['date'] = np.asarray(prices.date)[starts]
+    bars['open'] = np.asarray(prices.open)[starts]
+    bars['high'] = np.maximum.reduceat(prices.high, starts)
+    bars['low'] = np.minimum.reduceat(prices.low, starts)
+    bars['close'] = np.asarray(prices.close)[ends]
+    bars['volume'] = np.add.reduceat(prices.volume, starts)
+    return alphavantage.as_series(bars)
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Function to choose 'threshold' points of a line that keep its shape, by the
+    Largest-Triangle-Three-Buckets method. The first & last points are always
+    kept, the others are split into equal buckets & from each bucket the point
+    making the largest triangle with the previous chosen point & the average
+    of the next bucket is kept.
+    Input parameters
+    1. x, y - arrays of float, x in increasing order
+    2. threshold - integer/number of points wanted
+    Return parameters : numpy array of integer indices into x & y
+    """
+    num_points = len(x)
+    if threshold >= num_points or threshold < 3:
+        return np.arange(num_points)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+
+    #Bucket boundaries of the points between the first & the last
+    every = (num_points - 2) / (threshold - 2)
+    bounds = (np.floor(np.arange(threshold - 1) * every) + 1).astype(np.intp)
+    bounds[-1] = num_points - 1
+    #Averages of each bucket - plus the last point as the final 'next bucket'
+    counts = np.diff(bounds)
+    avg_x = np.append(np.add.reduceat(x[:-1], bounds[:-1]) / counts, x[-1])
+    avg_y = np.append(np.add.reduceat(y[:-1], bounds[:-1]) / counts, y[-1])
+
+    indices = np.empty(threshold, dtype=np.intp)
+    indices[0], indices[-1] = 0, num_points - 1
+    chosen = 0
+    for bucket in range(threshold - 2):
+        start, stop = bounds[bucket], bounds[bucket + 1]
+        areas = np.abs((x[chosen] - avg_x[bucket + 1]) * (y[start:stop] - y[chosen]) -
+                       (x[chosen] - x[start:stop]) * (avg_y[bucket + 1] - y[chosen]))
+        chosen = start + int(np.argmax(areas))
+        indices[bucket + 1] = chosen
+    return indices
+
+
+def visible_range(mpl_dates, ax, margin=1):
+    """
+    Function to return the index range of the dates inside the x axis limits
+    Input parameters
+    1. mpl_dates - array of matplotlib date numbers in increasing order
+    2. ax - matplotlib axes
+    3. margin - integer/extra points included each side, so lines & candles
+       continue to the edge of the axes
+    Return parameters : tuple of integers (first, stop)
+    """
+    x_min, x_max = sorted(ax.get_xlim())
+    first = int(np.searchsorted(mpl_dates, x_min, side='left')) - margin
+    stop = int(np.searchsorted(mpl_dates, x_max, side='right')) + margin
+    return max(first, 0), min(stop, len(mpl_dates))
+
+
+class LineDetail:
+    """
+    Line chart (e.g. close price) that draws at most about one point per
+    pixel of the axes width for the visible date range, using lttb_indices()
+    Input parameters
+    1. ax - matplotlib axes
+    2. mpl_dates - array of matplotlib date numbers in increasing order
+    3. values - array of float
+    4. points_per_pixel - float/points drawn per pixel of axes width
+    5. plot_kwargs - passed to ax.plot(), e.g. label, color
+    """
+
+    def __init__(self, ax, mpl_dates, values, points_per_pixel=1.0, **plot_kwargs):
+        self.ax = ax
+        self.mpl_dates = np.asarray(mpl_dates, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.points_per_pixel = points_per_pixel
+        self.line, = ax.plot([], [], **plot_kwargs)
+        if np.any(np.isfinite(self.values)):
+            #Indicator lines start with NaN values, before there is enough data
+            ax.update_datalim(((self.mpl_dates[0], np.nanmin(self.values)),
+                               (self.mpl_dates[-1], np.nanmax(self.values))))
+            ax.autoscale_view()
+        self.update(ax)
+        self.callback_id = ax.callbacks.connect('xlim_changed', self.update)
+
+    def max_points(self):
+        """
+        Function to return the number of points the axes width can show
+        """
+        return max(3, int(self.ax.bbox.width * self.points_per_pixel))
+
+    def update(self, ax=None):
+        """
+        Function to redraw the line for the current x axis limits - called by
+        matplotlib when the chart is zoomed or panned
+        """
+        first, stop = visible_range(self.mpl_dates, self.ax)
+        x, y = self.mpl_dates[first:stop], self.values[first:stop]
+        keep = lttb_indices(x, y, self.max_points())
+        self.line.set_data(x[keep], y[keep])
+
+    def set_data(self, mpl_dates, values):
+        """
+        Function to replace the full data of the line & redraw it
+        """
+        self.mpl_dates = np.asarray(mpl_dates, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.update()
+
+
+class CandleDetail:
+    """
+    Candlestick chart that draws daily, weekly, monthly or yearly candles,
+    choosing the shortest period that keeps the visible candles at least
+    'pixels_per_bar' pixels wide, and draws only the visible candles
+    Input parameters
+    1. ax - matplotlib axes
+    2. prices - DailySeries of daily bars in date order
+    3. pixels_per_bar - float/minimum width of a candle in pixels
+    4. candle_kwargs - passed to candlestick.candlestick_ohlc(), e.g. label
+    The live_date attribute (None, or a datetime64[D] after the last bar) is
+    set by live_chart.py - the candle of the period that date is in is then
+    not drawn here, it is drawn with the live bar by the live chart.
+    """
+
+    def __init__(self, ax, prices, pixels_per_bar=2.0, **candle_kwargs):
+        self.ax = ax
+        self.pixels_per_bar = pixels_per_bar
+        self.candle_kwargs = candle_kwargs
+        self.live_date = None
+        self.set_prices(prices, redraw=False)
+        self.period = None
+        #Start with no candles - update() draws the visible ones
+        no_data = np.empty(0)
+        self.wicks, self.bodies = candlestick.candlestick_ohlc(
+            ax, no_data, no_data, no_data, no_data, no_data, **candle_kwargs)
+        if len(self.daily_dates) > 0:
+            ax.update_datalim(((self.daily_dates[0] - 1, np.min(prices.low)),
+                               (self.daily_dates[-1] + 1, np.max(prices.high))))
+            ax.autoscale_view()
+        self.update(ax)
+        self.callback_id = ax.callbacks.connect('xlim_changed', self.update)
+
+    def set_prices(self, prices, redraw=True):
+        """
+        Function to replace the daily bars shown & redraw the chart
+        """
+        self.prices = prices
+        self.daily_dates = stock_dates.to_mpl_dates(prices.date)
+        self.levels = {}        # period -> (resampled prices, mpl dates)
+        if redraw:
+            self.update()
+
+    def level(self, period):
+        """
+        Function to return the bars of one period, aggregated on first use
+        Return parameters : tuple (DailySeries, array of mpl date numbers)
+        """
+        if period not in self.levels:
+            bars = resample_ohlcv(self.prices, period)
+            self.levels[period] = (bars, stock_dates.to_mpl_dates(bars.date))
+        return self.levels[period]
+
+    def live_bars(self, period):
+        """
+        Function to return the bar of a period aggregated from the days before
+        live_date in the same period (e.g. Monday to Wednesday of this week)
+        Return parameters : DailySeries of single values, or None if there are
+        none (always for daily bars)
+        """
+        if self.live_date is None:
+            return None
+        bars, _ = self.level(period)
+        if len(bars.date) == 0 or \
+                period_keys(bars.date[-1:], period)[0] != period_keys([self.live_date], period)[0]:
+            return None
+        return alphavantage.DailySeries(*(column[-1] for column in bars))
+
+    def choose_period(self):
+        """
+        Function to choose the candle period for the current x axis limits
+        Return parameters : text/'D', 'W', 'M' or 'Y'
+        """
+        first, stop = visible_range(self.daily_dates, self.ax, margin=0)
+        max_bars = max(1.0, self.ax.bbox.width / self.pixels_per_bar)
+        for period in PERIODS:
+            if (stop - first) / TRADING_DAYS[period] <= max_bars:
+                return period
+        return PERIODS[-1]
+
+    def update(self, ax=None):
+        """
+        Function to redraw the candles for the current x axis limits - called
+        by matplotlib when the chart is zoomed or panned
+        """
+        self.period = self.choose_period()
+        bars, mpl_dates = self.level(self.period)
+        first, stop = visible_range(mpl_dates, self.ax)
+        if self.live_bars(self.period) is not None:
+            stop = min(stop, len(mpl_dates) - 1)
+        width = self.candle_kwargs.get('width', 0.6) * CALENDAR_DAYS[self.period]
+        candle_kwargs = {key: value for key, value in self.candle_kwargs.items()
+                         if key not in ('width', 'label')}
+        candlestick.update_candles(self.wicks, self.bodies, mpl_dates[first:stop],
+                                   bars.open[first:stop], bars.high[first:stop],
+                                   bars.low[first:stop], bars.close[first:stop],
+                                   width=width, **candle_kwargs)
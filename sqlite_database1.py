@@ -15,13 +15,21 @@ functionality that can be partitioned with no loss of code readibility
 2. Some Global variables are used in the functions including : (i) cursor &
 (ii) tuples ofinfo on the database columns : column_names, column_types,
 column_defaults, column_justify & column_min_max (iii) Database table name
+3. Every searchable column has an index (table_indexes), check_query_plans()
+confirms that no search reads the whole table
 
 Code written & tested in Python 3.6
 """
 
 import sqlite3 as sql3
 from sqlite3 import Error
+import argparse
+import csv
 import datetime
+import json
+import sys
+
+import query_cache
 
 def construct_command(*args):
     """
@@ -75,11 +83,102 @@ def create_table():
             if col_num == len(column_names) - 1:
                 command += (')')
         c.execute(command)
+        create_indexes()
+        create_text_search()
 
     except Error as err:
         print("Error when creating table {}\n{}".format(car_table, err))
 
 
+def index_commands():
+    """
+    Function to build the commands that create the indexes declared in
+    table_indexes, if they do not already exist
+    TEXT columns are indexed with their column_collations entry - NOCASE, so
+    the case insensitive LIKE searches of build_search() can use the index
+    (for a value that does not start with a % or _ wildcard)
+    Input parameters: None
+    Global Parameters used : car_table, column_names, column_collations,
+    table_indexes
+    Return Paramters : list of text/CREATE INDEX commands
+    """
+    commands = []
+    for index_name, index_columns in table_indexes:
+        index_terms = []
+        for name in index_columns:
+            column = column_for(name)
+            col_num = [col_name.lower() for col_name in column_names].index(column)
+            if column_collations[col_num]:
+                column += ' COLLATE ' + column_collations[col_num]
+            index_terms.append(column)
+        commands.append(construct_command('CREATE INDEX IF NOT EXISTS ', index_name, ' ON ',
+                                          car_table, ' (', ', '.join(index_terms), ')'))
+    return commands
+
+
+def create_indexes():
+    """
+    Function to create the indexes declared in table_indexes (e.g. for a
+    database file created before they were added) - see index_commands()
+    Return Paramters : None
+    """
+    for command in index_commands():
+        c.execute(command)
+
+
+def text_search_triggers():
+    """
+    Function to build the commands that create the triggers keeping the
+    full text search table (fts_table) in step with the car table - every
+    insert, delete & change of a text column (or ID) of car_table is copied
+    to it by sqlite3 itself, whichever function or program makes it
+    Return Paramters : list of tuples (text/trigger name, text/command)
+    Global Parameters used : car_table, fts_table, fts_columns
+    """
+    columns = ', '.join(column_for(name) for name in fts_columns)
+    new_values = ', '.join('new.' + column_for(name) for name in fts_columns)
+    old_values = ', '.join('old.' + column_for(name) for name in fts_columns)
+    insert_new = construct_command('INSERT INTO ', fts_table, ' (rowid, ', columns,
+                                   ') VALUES (new.id, ', new_values, '); ')
+    #An external content table is told which values to take out of its index
+    delete_old = construct_command('INSERT INTO ', fts_table, ' (', fts_table,
+                                   ', rowid, ', columns, ") VALUES ('delete', old.id, ",
+                                   old_values, '); ')
+    triggers = (('_ai', 'AFTER INSERT', insert_new),
+                ('_ad', 'AFTER DELETE', delete_old),
+                ('_au', 'AFTER UPDATE OF id, ' + columns, delete_old + insert_new))
+    return [(car_table + suffix,
+             construct_command('CREATE TRIGGER IF NOT EXISTS ', car_table, suffix, ' ',
+                               event, ' ON ', car_table, ' BEGIN ', body, 'END'))
+            for suffix, event, body in triggers]
+
+
+def create_text_search(local_conn=None):
+    """
+    Function to create the full text search table of the text columns
+    (fts_columns) & its triggers, if they do not already exist
+    The table is an sqlite3 FTS5 table that stores only the index of words, the
+    values are read from car_table (external content). A new table is filled
+    from the cars already in car_table.
+    Input parameters : local_conn - sqlite3 connection, conn if None
+    Return Paramters : None
+    Global Parameters used : conn, car_table, fts_table, fts_columns
+    """
+    local_conn = conn if local_conn is None else local_conn
+    exists = local_conn.execute("SELECT 1 FROM sqlite_master WHERE name = ?",
+                                (fts_table,)).fetchone()
+    local_conn.execute(construct_command(
+        'CREATE VIRTUAL TABLE IF NOT EXISTS ', fts_table, ' USING fts5(',
+        ', '.join(column_for(name) for name in fts_columns), ", content='", car_table,
+        "', content_rowid='id', prefix='2 3')"))
+    for _, command in text_search_triggers():
+        local_conn.execute(command)
+    if not exists:
+        local_conn.execute(construct_command('INSERT INTO ', fts_table, ' (', fts_table,
+                                             ") VALUES ('rebuild')"))
+    local_conn.commit()
+
+
 def add_cars(car_records):
     """
     Function to enter new records into the database table
@@ -95,8 +194,10 @@ def add_cars(car_records):
                       "(id, make, model, type, year, mileage, price) \
                       VALUES (?, ?, ?, ?, ?, ?, ? )", car_records)
     except Error as err:
-        print("Error : Entry was not written to DataBase, check ID is unique\n{}\n{}\n"
-              .format(car_records, err))
+        print("Error : {} entries were not written to DataBase, check ID is unique\n{}\n"
+              .format(len(car_records), err))
+    #Cached search results the new cars may belong to are read again
+    result_cache.invalidate_insert(record[0] for record in car_records)
     #Notes
     #1. This construction of the INSERT statement is more secure and avoids.
     #..potential injection errors from rogue strings
@@ -129,6 +230,7 @@ def delete_car(car):
     except Error as err:
         print("Error : Entry could not be deleted from to DataBase, check ID : {} is valid\n{}"
               .format(car, err))
+    result_cache.invalidate_delete(int(car))
 
 
 def create_connection(db_file):
@@ -157,119 +259,751 @@ def change_entry(row, column_name, new_entry):
     Return parameters - None
     """
     try:
+        column = column_for(column_name)
         with conn:
-            conn.execute("UPDATE " + car_table + " set " + column_name +
+            conn.execute("UPDATE " + car_table + " set " + column +
                          " = ? where ID = ?", (new_entry, row))
-            conn.commit()
-    except Error as err:
+    except (Error, ValueError) as err:
         print("Error when trying to change ID {}, column {} to value {}\n{}"
               .format(row, column_name, new_entry, err))
+        return
+    result_cache.invalidate_change(int(row), column)
+    if column == 'id':
+        #The car is now found under its new ID
+        result_cache.invalidate_insert([int(new_entry)])
+
+
+def check_id(car_id):
+    """
+    Function to check an ID of a car & convert it to an integer, as it is
+    kept in the table & in result_cache
+    Input parameters : car_id - integer or text
+    Return parameters : integer/ID
+    Raises ValueError if it is not a whole number within the sqlite3 INTEGER
+    range
+    """
+    if isinstance(car_id, bool) or not isinstance(car_id, (int, str)):
+        raise ValueError("ID must be a whole number, not {!r}".format(car_id))
+    car_id = int(car_id)
+    if not -2 ** 63 <= car_id < 2 ** 63:
+        raise ValueError("ID {} is too large".format(car_id))
+    return car_id
+
+
+def _outcome_key(car_id):
+    """
+    Function to return the key of an ID rejected by check_id() in the outcomes
+    of update_cars() & delete_cars() - the value given, or its repr() if it
+    cannot be a dictionary key (e.g. a list)
+    """
+    try:
+        hash(car_id)
+    except TypeError:
+        return repr(car_id)
+    return car_id
+
+
+def check_value(name, value):
+    """
+    Function to check a new value of a column - INTEGER columns must be whole
+    numbers within column_min_max (if given), TEXT columns must not be empty
+    Input parameters : name - text/column name, value - text or number
+    Return parameters : tuple (text/lower case column name, value converted
+    to the column type)
+    Raises ValueError if the column is unknown or the value is not allowed
+    Global variables used : column_names, column_types, column_min_max
+    """
+    column = column_for(name)
+    col_num = [col_name.lower() for col_name in column_names].index(column)
+    if column_types[col_num] == 'INTEGER':
+        if isinstance(value, bool) or not isinstance(value, (int, str)):
+            raise ValueError("{} must be a whole number, not {!r}".format(name, value))
+        value = int(value)
+        if column_min_max[col_num]:
+            min_value, max_value = column_min_max[col_num]
+            if not min_value <= value <= max_value:
+                raise ValueError("{} must be from {} to {}, not {}".format(
+                    name, min_value, max_value, value))
+    elif not isinstance(value, str) or value == '':
+        raise ValueError("{} must be text, not {!r}".format(name, value))
+    return column, value
+
+
+def update_cars(changes, local_conn=None):
+    """
+    Function to change any columns of many cars in one transaction
+    There is no search for the IDs first - the number of rows each UPDATE
+    changes (rowcount) shows if the car exists. Changes of the same columns
+    use the same command text, compiled once by sqlite3.
+    Input parameters
+    1. changes - dictionary of ID -> dictionary of column name -> new value
+       e.g. {3: {'Price': 5000}, 7: {'Price': 4500, 'Mileage': 51000}}
+    2. local_conn - sqlite3 connection, conn if None
+    Return parameters : dictionary of ID -> text/outcome, 'updated', 'not
+    found', 'rejected - <reason>' (the ID or a value not allowed, nothing is
+    changed for that car) or 'failed' (a database error, no car is changed).
+    The keys are the IDs as integers (check_id(), e.g. '5' -> 5) - an ID that
+    is not valid is the key as given (see _outcome_key()).
+    Global variables used : conn, car_table, result_cache
+    """
+    local_conn = conn if local_conn is None else local_conn
+    outcomes = {}
+    statements = []
+    for given_id, columns in changes.items():
+        try:
+            car_id = check_id(given_id)
+        except ValueError as err:
+            outcomes[_outcome_key(given_id)] = 'rejected - {}'.format(err)
+            continue
+        try:
+            if not isinstance(columns, dict):
+                raise ValueError("give a dictionary of column name -> new value")
+            checked = sorted(check_value(name, value) for name, value in columns.items())
+            if not checked or any(column == 'id' for column, _ in checked):
+                raise ValueError("give the columns to change, other than the ID")
+        except ValueError as err:
+            outcomes[car_id] = 'rejected - {}'.format(err)
+            continue
+        command = construct_command('UPDATE ', car_table, ' SET ',
+                                    ', '.join(column + ' = ?' for column, _ in checked),
+                                    ' WHERE id = ?')
+        statements.append((car_id, command, [value for _, value in checked] + [car_id],
+                           [column for column, _ in checked]))
+    try:
+        with local_conn:
+            for car_id, command, parameters, _ in statements:
+                changed = local_conn.execute(command, parameters).rowcount
+                outcomes[car_id] = 'updated' if changed else 'not found'
+    except Error as err:
+        print("Error when trying to change {} entries, no entry was changed\n{}"
+              .format(len(statements), err))
+        for car_id, _, _, _ in statements:
+            outcomes[car_id] = 'failed'
+    for car_id, _, _, columns in statements:
+        if outcomes[car_id] == 'updated':
+            for column in columns:
+                result_cache.invalidate_change(car_id, column)
+    return outcomes
+
+
+def delete_cars(car_ids, local_conn=None):
+    """
+    Function to delete many cars in one transaction, without searching for
+    them first - the number of rows each DELETE removes (rowcount) shows if
+    the car existed
+    Input parameters : car_ids - iterable of integer IDs, local_conn - sqlite3
+    connection, conn if None
+    Return parameters : dictionary of ID -> text/outcome, 'deleted', 'not
+    found', 'rejected - <reason>' (not a valid ID) or 'failed' (a database
+    error, no car is deleted). The keys are the IDs as integers (check_id(),
+    e.g. '5' -> 5) - an ID that is not valid is the key as given (see
+    _outcome_key()).
+    Global variables used : conn, car_table, result_cache
+    """
+    local_conn = conn if local_conn is None else local_conn
+    outcomes = {}
+    checked_ids = []
+    for car_id in car_ids:
+        try:
+            checked_ids.append(check_id(car_id))
+        except ValueError as err:
+            outcomes[_outcome_key(car_id)] = 'rejected - {}'.format(err)
+    #Each ID once - a second DELETE of an ID would find nothing
+    checked_ids = list(dict.fromkeys(checked_ids))
+    command = construct_command('DELETE FROM ', car_table, ' WHERE id = ?')
+    try:
+        with local_conn:
+            for car_id in checked_ids:
+                removed = local_conn.execute(command, (car_id,)).rowcount
+                outcomes[car_id] = 'deleted' if removed else 'not found'
+    except Error as err:
+        print("Error when trying to delete {} entries, no entry was deleted\n{}"
+              .format(len(checked_ids), err))
+        for car_id in checked_ids:
+            outcomes[car_id] = 'failed'
+        return outcomes
+    for car_id in checked_ids:
+        if outcomes[car_id] == 'deleted':
+            result_cache.invalidate_delete(car_id)
+    return outcomes
+
+
+def _matching_ids(text_criteria, range_criteria, equal_criteria, combine):
+    """
+    Function to build a sub-query of the IDs of the cars matching search
+    criteria (see build_search()), to use as 'WHERE id IN (...)'
+    Return parameters : tuple (text/sub-query, tuple of parameters)
+    Raises ValueError if there are no criteria - a change of every car must
+    not be made by mistake
+    """
+    if not (text_criteria or range_criteria or equal_criteria):
+        raise ValueError("No search criteria given")
+    command, parameters = build_search(text_criteria, range_criteria, equal_criteria,
+                                       combine)
+    return construct_command('SELECT id FROM (', command, ')'), parameters
+
+
+def delete_matching(text_criteria=None, range_criteria=None, equal_criteria=None,
+                    combine='AND', local_conn=None):
+    """
+    Function to delete all the cars matching search criteria with one DELETE
+    Input parameters : the criteria as build_search(), local_conn - sqlite3
+    connection, conn if None
+    Return parameters : integer/number of cars deleted, 0 if the criteria are
+    not valid or the delete fails
+    Global variables used : conn, car_table, result_cache
+    """
+    local_conn = conn if local_conn is None else local_conn
+    try:
+        sub_query, parameters = _matching_ids(text_criteria, range_criteria,
+                                              equal_criteria, combine)
+        with local_conn:
+            removed = local_conn.execute(construct_command(
+                'DELETE FROM ', car_table, ' WHERE id IN (', sub_query, ')'),
+                                         parameters).rowcount
+    except (Error, ValueError) as err:
+        print("Error when trying to delete entries from the database {}\n".format(err))
+        return 0
+    #The cars deleted are not known one by one
+    result_cache.clear()
+    return removed
+
+
+def adjust_prices(factor=1.0, amount=0, text_criteria=None, range_criteria=None,
+                  equal_criteria=None, combine='AND', local_conn=None):
+    """
+    Function to change the price of all the cars matching search criteria with
+    one UPDATE, new price = price x factor + amount, rounded to a whole number
+    & kept within the column_min_max of Price
+    e.g. adjust_prices(0.9, range_criteria={'Year': (1970, 2012)}) takes 10%
+    off the cars from 2012 & before
+    Input parameters
+    1. factor - float, amount - integer
+    2. text_criteria, range_criteria, equal_criteria, combine - as
+       build_search()
+    3. local_conn - sqlite3 connection, conn if None
+    Return parameters : integer/number of cars repriced, 0 if the criteria are
+    not valid or the update fails
+    Global variables used : conn, car_table, column_names, column_min_max,
+    result_cache
+    """
+    local_conn = conn if local_conn is None else local_conn
+    min_price, max_price = column_min_max[column_names.index('Price')]
+    try:
+        sub_query, parameters = _matching_ids(text_criteria, range_criteria,
+                                              equal_criteria, combine)
+        with local_conn:
+            changed = local_conn.execute(construct_command(
+                'UPDATE ', car_table, ' SET price = MIN(MAX(CAST(ROUND(price * ? + ?) ',
+                'AS INTEGER), ?), ?) WHERE id IN (', sub_query, ')'),
+                                         (float(factor), amount, min_price, max_price) +
+                                         parameters).rowcount
+    except (Error, ValueError) as err:
+        print("Error when trying to change prices in the database {}\n".format(err))
+        return 0
+    result_cache.clear()
+    return changed
+
+
+def column_for(name):
+    """
+    Function to check a column name against the table columns & return it in
+    the form used in sqlite3 commands. Column names cannot be passed as
+    parameters, so only names found in column_names are ever put in a command.
+    Input parameters : name - text/column name, any case
+    Return parameters : text/lower case column name
+    Global variables used : column_names
+    """
+    for col_name in column_names:
+        if col_name.lower() == str(name).lower():
+            return col_name.lower()
+    raise ValueError("Unknown column {}, expected one of {}".format(name, column_names))
+
+
+def build_search(text_criteria=None, range_criteria=None, equal_criteria=None,
+                 combine='AND', order_by='ID', descending=False, limit=None):
+    """
+    Function to build a parameterized SELECT command from search criteria
+    The same criteria columns always give the same command text, whatever the
+    values searched for (the values are all '?' parameters) or the order of
+    the criteria, so sqlite3 reuses the compiled statement from its cache.
+    Input parameters
+    1. text_criteria - dictionary of column name -> text (or list of texts,
+       any of which may match) compared with LIKE, i.e. case insensitive, %
+       & _ wildcards allowed
+    2. range_criteria - dictionary of column name -> (min, max), BETWEEN
+    3. equal_criteria - dictionary of column name -> value, e.g. {'ID': 3}
+    4. combine - text/'AND' all criteria must match, 'OR' any criterion
+    5. order_by - text/column name the results are sorted by
+    6. descending - boolean, sort order
+    7. limit - integer/maximum number of rows, None for all
+    Return parameters : tuple (text/command, tuple of parameters)
+    Raises ValueError for an unknown column or combine value
+    Global variables used : car_table, column_names
+    """
+    combine = combine.upper()
+    if combine not in ('AND', 'OR'):
+        raise ValueError("combine must be AND or OR, not {}".format(combine))
+    conditions = []
+    parameters = []
+    for name, value in sorted((text_criteria or {}).items()):
+        values = [value] if isinstance(value, str) else list(value)
+        column = column_for(name)
+        conditions.append('(' + ' OR '.join([column + ' LIKE ?'] * len(values)) + ')')
+        parameters.extend(values)
+    for name, (min_value, max_value) in sorted((range_criteria or {}).items()):
+        conditions.append(column_for(name) + ' BETWEEN ? AND ?')
+        parameters.extend((min_value, max_value))
+    for name, value in sorted((equal_criteria or {}).items()):
+        conditions.append(column_for(name) + ' = ?')
+        parameters.append(value)
+
+    command = construct_command('SELECT * FROM ', car_table)
+    if combine == 'OR' and len(conditions) > 1:
+        #Each criterion is a separate SELECT of the IDs it matches, so each uses
+        #.. its own index - for a long list of ORs sqlite3 would otherwise
+        #.. often choose to read the whole table
+        command += construct_command(' WHERE id IN (', ' UNION '.join(
+            construct_command('SELECT id FROM ', car_table, ' WHERE ', condition)
+            for condition in conditions), ')')
+    elif conditions:
+        command += ' WHERE ' + ' AND '.join(conditions)
+    command += construct_command(' ORDER BY ', column_for(order_by),
+                                 ' DESC' if descending else '', ' LIMIT ?')
+    #A negative LIMIT is no limit - the command text is the same either way
+    parameters.append(-1 if limit is None else int(limit))
+    return command, tuple(parameters)
+
+
+def cached_rows(command, parameters, columns=(), key_ids=None):
+    """
+    Function to return the rows selected by a command, from result_cache if
+    the same command & parameters were run before, otherwise from the
+    database (the rows are then kept in result_cache)
+    Input parameters
+    1. command - text/sqlite3 command, parameters - tuple of its parameters
+    2. columns - iterable of text/lower case names of the columns the result
+       depends on (criteria & sort order)
+    3. key_ids - iterable of the IDs the command is limited to, None if any
+    Return parameters : list of tuples, one per row
+    Global variables used : conn, result_cache
+    """
+    key = (command, tuple(parameters))
+    rows = result_cache.get(key)
+    if rows is None:
+        rows = conn.execute(command, parameters).fetchall()
+        result_cache.put(key, rows, columns, key_ids)
+    return rows
+
+
+def search_cars(text_criteria=None, range_criteria=None, equal_criteria=None,
+                combine='AND', order_by='ID', descending=False, limit=None):
+    """
+    Function to find the cars matching a set of search criteria
+    Input parameters : see build_search()
+    Return parameters : list of tuples, one per car (empty if none match or
+    the search fails)
+    Global variables used : conn
+    """
+    try:
+        #IDs are integers in the cache (see check_id()) - '5' & 5 find the same car
+        equal_criteria = {name: check_id(value) if column_for(name) == 'id' else value
+                          for name, value in (equal_criteria or {}).items()}
+        command, parameters = build_search(text_criteria, range_criteria, equal_criteria,
+                                           combine, order_by, descending, limit)
+        columns = [column_for(name) for criteria in (text_criteria, range_criteria,
+                                                     equal_criteria)
+                   for name in (criteria or {})] + [column_for(order_by)]
+        #A search for an ID with every criterion to match can only find that car
+        key_ids = None
+        if combine.upper() == 'AND' and any(column_for(name) == 'id'
+                                            for name in equal_criteria):
+            key_ids = [value for name, value in equal_criteria.items()
+                       if column_for(name) == 'id']
+        return cached_rows(command, parameters, columns, key_ids)
+    except (Error, ValueError) as err:
+        print("Error when trying to find entries in database {}\n".format(err))
+        return []
+
+
+def explain_search(text_criteria=None, range_criteria=None, equal_criteria=None,
+                   combine='AND', order_by='ID'):
+    """
+    Function to return the sqlite3 query plan of a search
+    Input parameters : see build_search()
+    Return parameters : list of text, one line of EXPLAIN QUERY PLAN per step
+    e.g. 'SEARCH cars_for_sale USING INDEX idx_price (price>? AND price<?)'
+    Global variables used : conn
+    """
+    command, parameters = build_search(text_criteria, range_criteria, equal_criteria,
+                                       combine, order_by)
+    return [row[-1] for row in conn.execute('EXPLAIN QUERY PLAN ' + command, parameters)]
+
+
+def search_shapes():
+    """
+    Function to list every shape of search the menu can make - each set of
+    columns searched, all or any of which must match
+    Text columns are searched with LIKE, integer columns with BETWEEN their
+    column_min_max values & the ID with '='. The values are examples, only the
+    shape of the search affects its plan (a LIKE value starting with a
+    wildcard cannot use an index, whatever the shape).
+    Return parameters : list of tuples (text/description, text_criteria,
+    range_criteria, equal_criteria, combine)
+    Global variables used : column_names, column_types, column_min_max
+    """
+    shapes = []
+    for mask in range(1, 2 ** len(column_names)):
+        text_criteria, range_criteria, equal_criteria = {}, {}, {}
+        columns = [col_num for col_num in range(len(column_names)) if mask >> col_num & 1]
+        for col_num in columns:
+            if col_num == 0:
+                equal_criteria[column_names[col_num]] = 1
+            elif column_types[col_num] == 'TEXT':
+                text_criteria[column_names[col_num]] = 'A'
+            else:
+                range_criteria[column_names[col_num]] = column_min_max[col_num]
+        for combine in (('AND', 'OR') if len(columns) > 1 else ('AND',)):
+            description = (' ' + combine + ' ').join(column_names[col_num]
+                                                     for col_num in columns)
+            shapes.append((description, text_criteria, range_criteria, equal_criteria,
+                           combine))
+    return shapes
+
+
+def check_query_plans():
+    """
+    Function to run EXPLAIN QUERY PLAN for every search shape & find those
+    that read the whole table instead of using an index
+    Return parameters : dictionary of text/search description -> list of
+    text/query plan, one entry per search that scans the table (empty if
+    every search uses an index)
+    Global variables used : car_table
+    """
+    scans = {}
+    for description, text_criteria, range_criteria, equal_criteria, combine \
+            in search_shapes():
+        plan = explain_search(text_criteria, range_criteria, equal_criteria, combine)
+        #'SCAN cars_for_sale' ('SCAN TABLE cars_for_sale' in older sqlite3)
+        if any(detail.split()[0] == 'SCAN' and car_table in detail.split()
+               for detail in plan):
+            scans[description] = plan
+    return scans
+
+
+def match_query(words='', text_criteria=None, combine='AND'):
+    """
+    Function to build an FTS5 query from words typed by the user
+    Each word matches any word starting with it (a prefix search, e.g. 'foc'
+    finds Focus), in any case. The words are quoted, so characters with a
+    meaning in FTS5 queries are searched for as text.
+    Input parameters
+    1. words - text/words to find in any of fts_columns, all must be found
+    2. text_criteria - dictionary of column name -> text/words to find in
+       that column, e.g. {'Model': 'foc'}
+    3. combine - text/'AND' words & all criteria must match, 'OR' any
+    Return parameters : text/FTS5 query, empty if there are no words
+    """
+    def prefixes(text):
+        return ' '.join('"' + word.replace('"', '""') + '"*' for word in str(text).split())
+
+    terms = []
+    if prefixes(words):
+        terms.append('(' + prefixes(words) + ')')
+    for name, text in sorted((text_criteria or {}).items()):
+        column = column_for(name)
+        if column not in [column_for(fts_name) for fts_name in fts_columns]:
+            raise ValueError("Column {} is not one of the text search columns {}"
+                             .format(name, fts_columns))
+        if prefixes(text):
+            terms.append(column + ' : (' + prefixes(text) + ')')
+    return (' ' + combine.upper() + ' ').join(terms)
+
+
+def build_text_search(words='', text_criteria=None, range_criteria=None, combine='AND',
+                      limit=None):
+    """
+    Function to build the command of search_text()
+    Input parameters : see search_text()
+    Return parameters : tuple (text/command, list of parameters, list of
+    text/lower case names of the columns the result depends on)
+    Raises ValueError for an unknown column or combine value
+    Global variables used : car_table, fts_table, fts_columns
+    """
+    combine = combine.upper()
+    if combine not in ('AND', 'OR'):
+        raise ValueError("combine must be AND or OR, not {}".format(combine))
+    query = match_query(words, text_criteria, combine)
+    ranges = []
+    parameters = []
+    for name, (min_value, max_value) in sorted((range_criteria or {}).items()):
+        ranges.append(construct_command('c.', column_for(name), ' BETWEEN ? AND ?'))
+        parameters.extend((min_value, max_value))
+    limit = -1 if limit is None else int(limit)
+    if not query:
+        command, parameters = build_search(range_criteria=range_criteria, combine=combine,
+                                           limit=limit)
+        return command, list(parameters), \
+            [column_for(name) for name in (range_criteria or {})] + ['id']
+
+    #The rank of a match depends on the words of every car
+    columns = [column_for(name) for name in fts_columns] + \
+        [column_for(name) for name in (range_criteria or {})]
+    select = construct_command('SELECT c.* FROM ', fts_table, ' JOIN ', car_table,
+                               ' c ON c.id = ', fts_table, '.rowid WHERE ', fts_table,
+                               ' MATCH ?')
+    if combine == 'AND' or not ranges:
+        command = construct_command(select, ''.join(' AND ' + term for term in ranges),
+                                    ' ORDER BY ', fts_table, '.rank, c.id LIMIT ?')
+        return command, [query] + parameters + [limit], columns
+
+    #Any criterion - the word matches by rank, then cars matched by a range only
+    command = construct_command(
+        'SELECT * FROM (', select, ' ORDER BY ', fts_table, '.rank, c.id LIMIT ?)',
+        ' UNION ALL SELECT * FROM (SELECT c.* FROM ', car_table, ' c WHERE c.id IN (',
+        ' UNION '.join('SELECT id FROM ' + car_table + ' c WHERE ' + term
+                       for term in ranges),
+        ') AND c.id NOT IN (SELECT rowid FROM ', fts_table, ' WHERE ', fts_table,
+        ' MATCH ?) ORDER BY c.id) LIMIT ?')
+    return command, [query, limit] + parameters + [query, limit], columns
+
+
+def search_text(words='', text_criteria=None, range_criteria=None, combine='AND',
+                limit=None):
+    """
+    Function to find cars by the words in their text columns, best matches
+    first, together with BETWEEN ranges of the integer columns
+    Input parameters
+    1. words, text_criteria - see match_query()
+    2. range_criteria - dictionary of column name -> (min, max), BETWEEN
+    3. combine - text/'AND' all must match, 'OR' any
+    4. limit - integer/maximum number of rows, None for all
+    Return parameters : list of tuples, one per car (empty if none match or
+    the search fails). Cars matching the words are listed by rank (FTS5 bm25,
+    best first), then cars found by the ranges only, each by ID.
+    Global variables used : conn
+    """
+    try:
+        command, parameters, columns = build_text_search(words, text_criteria,
+                                                         range_criteria, combine, limit)
+        return cached_rows(command, parameters, columns)
+    except (Error, ValueError) as err:
+        print("Error when trying to find entries in database {}\n".format(err))
+        return []
+
+
+def find_car(car_id):
+    """
+    Function to return the database entry of one car
+    Input parameters : car_id - integer/database record ID (or its text)
+    Return parameters : tuple of the car's data, or None if there is no such ID
+    """
+    rows = search_cars(equal_criteria={'ID': car_id})
+    return rows[0] if rows else None
 
 
 def find_in_db(search_data):
     """
-    This function selects cars from  the database and selects cars in specified
-    table with the specified "search_data".
-    It first build up the database query string from the parameters given in
-    the input tuple "search_data" before executing the command.
+    This function selects cars from the database with the specified
+    "search_data" - see search_cars() for more search options.
     Input Paramaters
     1. search_data -tuple with two entries on search data, one for text &
        integer based queries
-    Global variables used : car_table/name database table, Cursor
-    Return parameters - None, but it does change the global cursor variable
-    c (create_connection.cursor()).
+    Return parameters - list of tuples, one per car found
     """
+    if not search_data[0] and not search_data[1]:
+        # Search parameters were empty
+        print("Error - No search parameters given\n")
+        return []
+    return search_cars(search_data[0], search_data[1])
 
-    #Define the common text at the start and end of the command string
-    command = construct_command("SELECT * FROM ", car_table, " WHERE")
 
-    count = 0
-    for key, value in search_data[0].items():
-        #search_data[0] contains the criteria for searching the columns with
-        # text data
-        # Search term "LIKE" is used => the search is case *insensitive*
-        if count == 0:
-            command += construct_command(" ", key, " LIKE '", value, "'")
-        else:
-            command += construct_command(" and ", key, " LIKE '", value, "'")
-        #Add the text " and " only for second and subsequant search criteria
-        count += 1
-
-    for key, value in search_data[1].items():
-        #search_data[1] contains the criteria for searching the columns with
-        # integer data
-        #Note - error checking, including if max > min value should be done
-        #.. by the calling function.
-        if count == 0:
-            command += construct_command(" ", key, " BETWEEN ", str(value[0]),
-                                         " AND ", str(value[1]))
-        else:
-            command += construct_command(" and ", key, " BETWEEN ", str(value[0]),
-                                         " AND ", str(value[1]))
-        #Add the text " and " only for second and subsequant search criteria
-        count += 1
+def text_formatter():
+    """
+    Function to build the formatting of one row as text, once per listing
+    rather than once per value - each value is right justified to its
+    column_justify width
+    Return parameters : function(*row) returning text
+    Global variables used : column_justify
+    """
+    return ''.join('{!s:>' + str(width) + '}' for width in column_justify).format
 
-    if count != 0:
-        try:
-            with conn:
-                c.execute(command)
-        except Error as err:
-            print("Error when trying to find entries in database {}\nCommand line {}\n"
-                  .format(err, command))
+
+def fetch_rows(local_cursor, size=0):
+    """
+    Function to read the rows selected by a cursor 'size' rows at a time, so
+    only one batch of rows is held in memory
+    Input parameters : local_cursor - cursor, or a list of rows, size - integer,
+    rows per fetchmany(), fetch_size if 0
+    Yield parameters : tuple, one per row
+    """
+    if not hasattr(local_cursor, 'fetchmany'):
+        yield from local_cursor
+        return
+    while True:
+        rows = local_cursor.fetchmany(size or fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+def write_rows(rows, output='text', stream=None):
+    """
+    Function to write rows of car data with a header line
+    Input parameters
+    1. rows - iterable of tuples, e.g. fetch_rows() or list_cars()
+    2. output - text/'text' columns right justified as print_cursor_data(),
+       'csv' or 'jsonl' (one JSON object per line) for other programs to read
+    3. stream - open text file, standard output if None
+    Return parameters : integer/number of rows written
+    Global variables used : column_names
+    """
+    if output not in output_modes:
+        raise ValueError("Unknown output {}, expected one of {}".format(output, output_modes))
+    stream = sys.stdout if stream is None else stream
+    num_rows = 0
+    if output == 'csv':
+        writer = csv.writer(stream, lineterminator='\n')
+        writer.writerow(column_names)
+        for row in rows:
+            writer.writerow(row)
+            num_rows += 1
+    elif output == 'jsonl':
+        names = column_names
+        for row in rows:
+            stream.write(json.dumps(dict(zip(names, row))) + '\n')
+            num_rows += 1
     else:
-        # Search parameters were empty
-        print("Error - No search parameters given\n")
+        formatter = text_formatter()
+        stream.write(formatter(*column_names) + '\n')
+        for row in rows:
+            stream.write(formatter(*row) + '\n')
+            num_rows += 1
+    return num_rows
 
 
-def print_cursor_data(title, local_cursor):
+def print_cursor_data(title, local_cursor, output='text'):
     """
     Function to print the data selected by the cursor
-    This will print all columns or each row selected by the cursor.
+    This will print all columns or each row selected by the cursor. The rows
+    are read from the cursor fetch_size at a time, not all at once.
     Input parameters:
-    1. title - text, title printed before the database values
-    2. local-Cursor - cursor
+    1. title - text, title printed before the database values (text output only)
+    2. local-Cursor - cursor, or a list of rows e.g. from search_cars()
+    3. output - text/'text', 'csv' or 'jsonl', see write_rows()
     Global variables used
-    1. column_names, column_types, column_justify - tuples of info on the
-    column names, types, widths(used when right justifying text) etc.
+    1. column_names, column_justify - tuples of info on the column names,
+    widths(used when right justifying text) etc.
     """
-    print(title)
-    num_columns = len(column_names)
-    num_rows = 0
+    if output == 'text':
+        print(title)
+    if write_rows(fetch_rows(local_cursor), output) == 0 and output == 'text':
+        print("No data found")
 
-    #Print the column names
-    #The right justification value is in the tuple column_justify..
-    #.. which has global scope
-    row_text = ""
-    for col in range(num_columns):
-        row_text += column_names[col].rjust(column_justify[col])
-    print(row_text)
-
-    #Now print database values for each row
-    for row in local_cursor.fetchall():
-        row_text = ""
-        for item in range(num_columns):
-            if column_types[item] == "INTEGER":
-                row_text += repr(row[item]).rjust(column_justify[item])
-            else:
-                if column_types[item] == "TEXT":
-                    row_text += row[item].rjust(column_justify[item])
-        print(row_text)
-        num_rows += 1
 
-    if num_rows == 0:
-        print("No data found")
+def sort_key(order_by='ID'):
+    """
+    Function to find the columns a listing sorted by one column is ordered by -
+    the columns of the index that starts with it (see table_indexes) & the ID,
+    so every row has a different key & the index gives the order
+    Input parameters : order_by - text/column name
+    Return parameters : list of text/column names as used in sqlite3 commands,
+    with the collation of the index e.g. ['make COLLATE NOCASE',
+    'model COLLATE NOCASE', 'id'], & list of their column numbers
+    Global variables used : column_names, column_collations, table_indexes
+    """
+    column = column_for(order_by)
+    key_columns = [column]
+    for _, index_columns in table_indexes:
+        if column_for(index_columns[0]) == column:
+            key_columns = [column_for(name) for name in index_columns]
+            break
+    if 'id' not in key_columns:
+        key_columns.append('id')
+    names = [col_name.lower() for col_name in column_names]
+    col_nums = [names.index(key_column) for key_column in key_columns]
+    key = [key_column + (' COLLATE ' + column_collations[col_num]
+                         if column_collations[col_num] else '')
+           for key_column, col_num in zip(key_columns, col_nums)]
+    return key, col_nums
+
+
+def build_page(order_by='ID', descending=False, page_size=0, after=None):
+    """
+    Function to build the command that selects one page of a listing sorted
+    by a column (keyset pagination) - the page starts after the key of the
+    last row of the previous page, found through the index of the sort
+    column, so every page costs the same however far into the table it is
+    Input parameters
+    1. order_by - text/column name, ID or the first column of an index
+    2. descending - boolean, sort order
+    3. page_size - integer/rows per page, page_rows if 0
+    4. after - list of the key values of the last row of the previous page
+       (see sort_key()), None for the first page
+    Return parameters : tuple (text/command, list of parameters, list of
+    text/lower case key column names, list of integer key column numbers)
+    Global variables used : car_table, column_names
+    """
+    key, col_nums = sort_key(order_by)
+    direction = ' DESC' if descending else ''
+    order = construct_command(' ORDER BY ', ', '.join(column + direction for column in key),
+                              ' LIMIT ?')
+    command = construct_command('SELECT * FROM ', car_table)
+    columns = [column_names[col_num].lower() for col_num in col_nums]
+    if after is None:
+        return command + order, [page_size or page_rows], columns, col_nums
+    after = list(after)
+    if len(after) != len(key):
+        raise ValueError("The key of {} has {} values, not {}".format(order_by, len(key),
+                                                                      len(after)))
+    #The first key column on its own lets sqlite3 start the index search at
+    #.. the right place, the row value comparison then skips the rows already listed
+    command += construct_command(' WHERE ', key[0], ' <= ?' if descending else ' >= ?',
+                                 ' AND (', ', '.join(key), ') ', '<' if descending else '>',
+                                 ' (', ', '.join('?' * len(key)), ')')
+    return command + order, [after[0]] + after + [page_size or page_rows], columns, col_nums
+
+
+def list_cars(order_by='ID', descending=False, page_size=0):
+    """
+    Function to list the whole table a page at a time, sorted by a column
+    Only one page of rows is read at a time (the first page is also kept in
+    result_cache), see build_page().
+    Input parameters
+    1. order_by - text/column name, ID or the first column of an index
+    2. descending - boolean, sort order
+    3. page_size - integer/rows per page, page_rows if 0
+    Yield parameters : tuple, one per car
+    Global variables used : conn
+    Note - a row with no value (NULL) in a sort column is not listed
+    """
+    page_size = page_size or page_rows
+    after = None
+    while True:
+        command, parameters, columns, col_nums = build_page(order_by, descending,
+                                                            page_size, after)
+        #Only the first page is kept in result_cache - the later pages of a
+        #.. large table are seldom read again & would push the searches out
+        if after is None:
+            rows = cached_rows(command, parameters, columns)
+        else:
+            rows = conn.execute(command, parameters).fetchall()
+        yield from rows
+        if len(rows) < page_size:
+            return
+        after = [rows[-1][col_num] for col_num in col_nums]
 
 
-def print_entire_db(message):
+def print_entire_db(message, order_by='ID', output='text'):
     """
-    Function to select and print the entire database
+    Function to select and print the entire database, a page at a time
     Input parameters
     1. text - a header message to be printed
-    Global variables used : c/Cursor
+    2. order_by - text/column the cars are sorted by, see list_cars()
+    3. output - text/'text', 'csv' or 'jsonl', see write_rows()
     Output paramters : None (but it will print the database!)
     """
-    c.execute("SELECT * FROM " + car_table)
-    print_cursor_data(message, c)
+    print_cursor_data(message, list_cars(order_by), output)
 
 
 def input_integer(msg_prompt, min_value=0, max_value=0):
@@ -390,6 +1124,35 @@ def enter_column_number(local_prompt, display_options):
                 print("\n")
     return input_integer(local_prompt, 1, num_columns)
 
+def enter_search_criteria():
+    """
+    Function to prompt for the search criteria of one or more columns
+    Return parameters : tuple (dictionary of column name -> text for text
+    columns, dictionary of column name -> (min, max) for integer columns,
+    text/'AND' or 'OR')
+    Global variables used: column_names, column_types
+    """
+    text_search = {}
+    int_search = {}
+    num_columns = len(column_names)
+    print("Column numbers & names")
+    print(",  ".join("{} : {}".format(col, column_names[col])
+                     for col in range(1, num_columns)))
+    while True:
+        search_column = input_integer("Enter search column number (0 to search)",
+                                      0, num_columns - 1)
+        if search_column == 0:
+            break
+        if column_types[search_column] == 'INTEGER':
+            int_search[column_names[search_column]] = input_min_max_int(search_column)
+        elif column_types[search_column] == 'TEXT':
+            text_search[column_names[search_column]] = input_text(column_names[search_column])
+    combine = 'AND'
+    if len(text_search) + len(int_search) > 1:
+        if input_text("1 to match all the criteria or 2 to match any") == '2':
+            combine = 'OR'
+    return text_search, int_search, combine
+
 #End of function definitions
 
 #Start of main body of code
@@ -411,6 +1174,20 @@ column_names = ("ID", "Make", "Model", "Type", "Year", "Mileage", "Price")
 column_types = ("INTEGER", "TEXT", "TEXT", "TEXT", "INTEGER", "INTEGER", "INTEGER")
 column_defaults = ("", "", "", "", "0", "0", "0")
 column_justify = (5, 10, 10, 12, 7, 10, 8)
+#Collation of each column in the indexes - NOCASE for the TEXT columns, to
+#.. match the case insensitive LIKE searches
+column_collations = ("", "NOCASE", "NOCASE", "NOCASE", "", "", "")
+
+#Indexes created with the table : (i) index name (ii) tuple of column names.
+#Every column that can be searched has an index it comes first in, so no search
+#.. needs to read the whole table - Make & Model share a composite index, which
+#.. also serves searches on Make alone. See check_query_plans()
+table_indexes = (("idx_make_model", ("Make", "Model")),
+                 ("idx_model", ("Model",)),
+                 ("idx_type", ("Type",)),
+                 ("idx_year", ("Year",)),
+                 ("idx_mileage", ("Mileage",)),
+                 ("idx_price", ("Price",)))
 
 # Set minimum & maximum values for integer types.
 # Price & mileage are both set to 0 (min) & 250000 (max).
@@ -433,91 +1210,128 @@ initial_stock_2 = (6, 'Ford', 'Mondeo', 'Hatchback', 2010, 100000, 3750)
 initial_stock_3 = (7, 'Citroen', 'C2', 'Hatchback', 2015, 10500, 8200)
 initial_stock_4 = (8, 'Honda', 'Civic', 'Cabriolet', 2014, 45000, 6500)
 
+#Full text search table of the TEXT columns, kept up to date by triggers -
+#.. see create_text_search() & search_text()
+fts_table = car_table + '_fts'
+fts_columns = ("Make", "Model", "Type")
+#Most cars listed by a search of the menu
+search_rows = 100
 
-#Create a connection to a new database
-conn = create_connection(sql3_file)
-
-#create a cursor element
-c = conn.cursor()
-
-#Call function to create the table.
-create_table()
-
-#Populate the table with initial_stock_1 of cars
-add_cars(initial_stock_1)
-
-#Add two new cars to the table in the database
-#Use .extend method to add two tuples of data
-more_cars = []
-more_cars.extend((initial_stock_2, initial_stock_3, initial_stock_4))
-#Add these to the database with add_cars() function
-add_cars(more_cars)
-
-print_entire_db("Database after inserting inital stock of cars")
-
-while True:
-    choice = menu_options()
-    if choice == 0:
-        #exit from program
-        break
-    elif choice == 1:
-        #print entire database option
-        print_entire_db("Car Database")
-    elif choice == 2:
-        #add a new database entry
-        new_cars = enter_car_info()
-        add_cars([new_cars])
-        print_entire_db("Database with new car added")
-    elif choice == 3:
-        #change a database entry
-        change_id = input_integer("Enter car ID number to be changed")
-
-        find_in_db(({'ID':str(change_id)}, {}))    #Search database for ID number
-        record_exists = c.fetchone()
-        if record_exists is None:
-            print("Invalid ID number {}".format(change_id))
-        else:
-            change_column = enter_column_number("Enter column name to be changed", True)
-            prompt = "Enter new value for " + column_names[change_column]
-            if column_types[change_column] == 'INTEGER':
-                new_int = input_integer(prompt, column_min_max[change_column][0],
-                                        column_min_max[change_column][1])
-                change_entry(str(change_id), column_names[change_column], str(new_int))
-            elif column_types[change_column] == 'TEXT':
-                new_text = input_text(prompt,column_justify[change_column]-1 )
-                change_entry(str(change_id), column_names[change_column], new_text)
-            find_in_db(({'ID':str(change_id)}, {}))
-            print_cursor_data("Changed entry", c)
-    elif choice == 4:
-        #Delete a car from the database
-        del_id = input_integer("Enter ID number of car to be deleted")
-        find_in_db(({'ID':str(del_id)}, {}))    #Search database for ID number
-        record_exists = c.fetchone()
-        if record_exists is None:
-            print("Invalid ID number {}".format(del_id))
-        else:
-            delete_car(del_id)
-    elif choice == 5:
-        #Search database
-        #At this time searching is done by (a set of) data values on ..
-        #.. *one* column only
-        text_search = {}
-        int_search = {}
-        search_column = enter_column_number("Enter search column name", True)
+#Rows read from sqlite3 at a time when printing & rows per page of list_cars()
+fetch_size = 500
+page_rows = 1000
 
-        if column_types[search_column] == 'INTEGER':
-            int_min_max = input_min_max_int(search_column)
-            int_search[column_names[search_column]] = int_min_max
-        elif column_types[search_column] == 'TEXT':
-            new_text = input_text(column_names[search_column])
-            text_search[column_names[search_column]] = new_text
-        else:
-            print("Unexpected type {}\n".format(column_types[search_column]))
+#Formats of print_cursor_data() & write_rows() - text for people, csv & jsonl
+#.. for other programs
+output_modes = ('text', 'csv', 'jsonl')
+
+#Search results & pages of listings kept in memory - at most 1024 results or
+#.. 100,000 rows, each for at most 60 seconds (changes made by other programs
+#.. are seen after that). See query_cache.py
+result_cache = query_cache.QueryCache(max_entries=1024, max_rows=100000, ttl=60.0)
+
+#Connection & cursor used by the functions above, created by main()
+conn = None
+c = None
+
+
+def main():
+    """
+    Function to create & populate the database, then run the menu of options
+    """
+    global conn, c
+    parser = argparse.ArgumentParser(description="Used car database")
+    parser.add_argument('--list', choices=output_modes,
+                        help="print the whole table in this format & exit, e.g. to pipe "
+                             "csv or jsonl to another program")
+    parser.add_argument('--order-by', default='ID', help="column the --list is sorted by")
+    parser.add_argument('--descending', action='store_true')
+    args = parser.parse_args()
+
+    #Create a connection to a new database
+    conn = create_connection(sql3_file)
+
+    #create a cursor element
+    c = conn.cursor()
+
+    #Call function to create the table.
+    create_table()
+
+    if args.list:
+        print_cursor_data("Car Database", list_cars(args.order_by, args.descending),
+                          args.list)
+        conn.close()
+        return
+
+    #Populate the table with initial_stock_1 of cars
+    add_cars(initial_stock_1)
+
+    #Add two new cars to the table in the database
+    #Use .extend method to add two tuples of data
+    more_cars = []
+    more_cars.extend((initial_stock_2, initial_stock_3, initial_stock_4))
+    #Add these to the database with add_cars() function
+    add_cars(more_cars)
+
+    print_entire_db("Database after inserting inital stock of cars")
+
+    while True:
+        choice = menu_options()
+        if choice == 0:
+            #exit from program
             break
-        find_in_db((text_search, int_search))
-        print_cursor_data("Search Results", c)
+        elif choice == 1:
+            #print entire database option
+            print_entire_db("Car Database")
+        elif choice == 2:
+            #add a new database entry
+            new_cars = enter_car_info()
+            add_cars([new_cars])
+            print_entire_db("Database with new car added")
+        elif choice == 3:
+            #change a database entry
+            change_id = input_integer("Enter car ID number to be changed")
+
+            record_exists = find_car(change_id)    #Search database for ID number
+            if record_exists is None:
+                print("Invalid ID number {}".format(change_id))
+            else:
+                change_column = enter_column_number("Enter column name to be changed", True)
+                prompt = "Enter new value for " + column_names[change_column]
+                if column_types[change_column] == 'INTEGER':
+                    new_int = input_integer(prompt, column_min_max[change_column][0],
+                                            column_min_max[change_column][1])
+                    change_entry(str(change_id), column_names[change_column], str(new_int))
+                elif column_types[change_column] == 'TEXT':
+                    new_text = input_text(prompt,column_justify[change_column]-1 )
+                    change_entry(str(change_id), column_names[change_column], new_text)
+                print_cursor_data("Changed entry", [find_car(change_id)])
+        elif choice == 4:
+            #Delete a car from the database
+            del_id = input_integer("Enter ID number of car to be deleted")
+            #The delete itself shows if the ID number exists
+            if delete_cars([del_id])[del_id] == 'not found':
+                print("Invalid ID number {}".format(del_id))
+        elif choice == 5:
+            #Search database
+            #Searching is done by words (or the start of words) found in the
+            #.. text columns & data values on one or more columns, all or any
+            #.. of which must match. Best matches are listed first.
+            words = input_text("words to find in Make, Model or Type e.g. ford foc "
+                               "(return for none)")
+            text_search, int_search, combine = enter_search_criteria()
+            if words.strip() or text_search or int_search:
+                print_cursor_data("Search Results",
+                                  search_text(words, text_search, int_search, combine,
+                                              limit=search_rows))
+            else:
+                print("Error - No search parameters given\n")
+
+    #Finally, close the cursor & connection to the database
+    c.close()
+
+    conn.close()
 
-#Finally, close the cursor & connection to the database
-c.close()
 
-conn.close()
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Module with the drawing steps of the stock price charts, shared by the
+interactive programs & the batch renderer (batch_charts.py)
+1. Line chart of closing prices, one line per stock symbol (matplotlib1.py)
+2. Candlestick chart of one stock symbol (Candlestick_1.py)
+3. Heatmap of the correlations of many symbols (portfolio.py)
+The line & candlestick charts can have technical indicators (indicators.py) drawn over it.
+
+The functions draw on a given matplotlib figure/axes & do not use pyplot, so
+they work both on screen & headless with the Agg backend.
+"""
+
+import matplotlib.dates as mdates     #Matplotlib date convertor
+import matplotlib.ticker as mticker
+import numpy as np
+
+import price_index
+import resample
+import stock_dates
+
+#Colours of the indicators drawn on the second y axis (RSI, ATR)
+OSCILLATOR_COLORS = ('tab:purple', 'tab:gray', 'tab:olive', 'tab:cyan')
+
+
+def plot_close_prices(ax, symbol, prices, overlays=()):
+    """
+    Function to add the closing price line of one stock symbol to a line chart
+    Only about one point per pixel of the visible date range is drawn & the
+    line is redrawn when the chart is zoomed or panned, see resample.py
+    Input parameters
+    1. ax - matplotlib axes
+    2. symbol - text/stock symbol, used as the line label
+    3. prices - DailySeries of numpy arrays
+    4. overlays - list of indicator objects drawn with the line, see
+       indicators.py
+    Return parameters : list of resample.LineDetail - these must be kept while
+    the chart is shown, matplotlib only keeps a weak reference to their
+    zoom/pan callbacks
+    """
+    line_charts = [resample.LineDetail(ax, stock_dates.to_mpl_dates(prices.date),
+                                       prices.close, label=symbol)]
+    line_charts += plot_indicators(ax, prices, overlays, symbol + ' ')
+    ax.xaxis_date()
+    return line_charts
+
+
+def plot_indicators(ax, prices, overlays, label_prefix=''):
+    """
+    Function to draw technical indicators over a price chart
+    Indicators on the price scale (SMA, EMA, Bollinger bands, VWAP) are drawn
+    on ax, the others (RSI, ATR) on a second y axis on the right.
+    Input parameters
+    1. ax - matplotlib axes
+    2. prices - DailySeries of numpy arrays
+    3. overlays - list of indicator objects, see indicators.py
+    4. label_prefix - text added before the indicator names in the legend
+    Return parameters : list of resample.LineDetail, to be kept (see above)
+    """
+    mpl_dates = stock_dates.to_mpl_dates(prices.date)
+    line_charts = []
+    other_ax = None
+    for indicator in overlays:
+        values = indicator.compute(prices)
+        line_style = {'linewidth': 0.8}
+        if indicator.overlay:
+            indicator_ax = ax
+        else:
+            if other_ax is None:
+                other_ax = ax.twinx()
+            indicator_ax = other_ax
+            #The second axis has its own colour cycle - use faint, distinct colours
+            line_style.update(alpha=0.5, color=OSCILLATOR_COLORS[
+                sum(1 for line in other_ax.get_lines()) % len(OSCILLATOR_COLORS)])
+        label = label_prefix + indicator.name
+        if values.ndim == 1:
+            line_charts.append(resample.LineDetail(indicator_ax, mpl_dates, values,
+                                                   label=label, **line_style))
+        else:
+            #Bands e.g. Bollinger (lower, middle, upper) - one colour per indicator
+            color = None
+            for column in range(values.shape[1]):
+                line_chart = resample.LineDetail(indicator_ax, mpl_dates, values[:, column],
+                                                 label=label if column == 0 else None,
+                                                 color=color, linewidth=0.8,
+                                                 linestyle='-' if column == 1 else ':')
+                color = line_chart.line.get_color()
+                line_charts.append(line_chart)
+    if other_ax is not None:
+        other_ax.set_ylabel(', '.join(indicator.name for indicator in overlays
+                                      if not indicator.overlay))
+    return line_charts
+
+
+def format_line_chart(ax, title='Stock prices'):
+    """
+    Function to add gridlines, labels for x & y axes, graph title & legend to
+    a line chart
+    Input parameters : ax - matplotlib axes, title - text
+    Return parameters : None
+    """
+    ax.grid(True, color='y', linestyle='-', linewidth=1)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('$')
+    ax.set_title(title)
+    ax.legend()
+
+
+def fit_price_axis(ax, prices):
+    """
+    Function to set the y axis from 0 to 15% above the highest high of the
+    bars inside the x axis limits (found by binary search, see price_index.py)
+    Input parameters : ax - matplotlib axes, prices - DailySeries in date order
+    Return parameters : None
+    """
+    start, end = stock_dates.from_mpl_dates(sorted(ax.get_xlim()))
+    high = price_index.window(prices, start, end).high
+    if len(high) > 0:
+        ax.set_ylim(0, np.max(high) * 1.15)
+
+
+def plot_candlestick(fig, ax, symbol, prices, title=None, overlays=()):
+    """
+    Function to draw & format the candlestick chart of one stock symbol
+    Input parameters
+    1. fig, ax - matplotlib figure & axes
+    2. symbol - text/stock symbol, used as the legend label
+    3. prices - DailySeries of numpy arrays
+    4. title - text/graph title, the symbol if not given
+    5. overlays - list of indicator objects drawn over the candles, see
+       indicators.py
+    Return parameters : list of resample.CandleDetail & LineDetail - these must
+    be kept while the chart is shown, matplotlib only keeps a weak reference
+    to their zoom/pan callbacks
+    """
+    #Note candlestick.candlestick_ohlc takes the price arrays directly - all the
+    #... candle bodies are drawn as one PolyCollection & all the high/low wicks
+    #... as one LineCollection, so there is no need for a list/tuple of days.
+    #resample.CandleDetail draws daily, weekly, monthly or yearly candles to suit
+    #... the visible date range & redraws when the graph is zoomed or panned
+    charts = [resample.CandleDetail(ax, prices, width=0.6, label=symbol)]
+    charts += plot_indicators(ax, prices, overlays)
+
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%d-%b-%y'))
+    ax.xaxis.set_major_locator(mticker.MaxNLocator(10))
+    ax.grid(True)
+
+    fig.autofmt_xdate() #This should avoid any overlap in date on x axis
+
+    #Set the low/high limit on the Y axis to be 0 & 15% higher than ...
+    #... maximum value of high_price - of the visible days only, again each
+    #... time the graph is zoomed or panned
+    candles = charts[0]
+    fit_price_axis(ax, candles.prices)
+    ax.callbacks.connect('xlim_changed', lambda ax: fit_price_axis(ax, candles.prices))
+
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Stock Price $')
+    ax.set_title(symbol if title is None else title)
+    ax.legend()
+    fig.tight_layout()
+    return charts
+
+
+def plot_heatmap(fig, ax, matrix, symbols, title='Correlation'):
+    """
+    Function to draw a (symbols x symbols) matrix, e.g. of correlations, as a
+    heatmap with a colour bar (see portfolio.py)
+    Input parameters
+    1. fig, ax - matplotlib figure & axes
+    2. matrix - square numpy array, NaN drawn blank
+    3. symbols - list of text/labels of the rows & columns
+    4. title - text/graph title
+    Return parameters : matplotlib AxesImage
+    """
+    matrix = np.asarray(matrix, dtype=np.float64)
+    finite = matrix[np.isfinite(matrix)]
+    #Correlations on a fixed -1 to 1 scale, other values symmetric about 0
+    limit = 1.0 if finite.size == 0 or np.abs(finite).max() <= 1.0 else np.abs(finite).max()
+    image = ax.imshow(np.ma.masked_invalid(matrix), cmap='RdBu_r', vmin=-limit,
+                      vmax=limit, interpolation='nearest')
+    fig.colorbar(image, ax=ax)
+    #Label every symbol only while the labels can be read
+    if len(symbols) <= 40:
+        ax.set_xticks(range(len(symbols)))
+        ax.set_yticks(range(len(symbols)))
+        ax.set_xticklabels(symbols, rotation=90)
+        ax.set_yticklabels(symbols)
+    ax.set_title(title)
+    fig.tight_layout()
+    return image
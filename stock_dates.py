@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Module to convert whole columns of trading dates in single numpy operations
+
+Dates are held as numpy.datetime64[D] arrays (see alphavantage.py). These
+functions convert a whole column at once, to/from ISO text, matplotlib date
+numbers & unix time, so there is no per-row python date work such as
+dateutil.parser.parse(), time.mktime() or numpy.vectorize(fromtimestamp).
+"""
+
+import numpy as np
+
+ONE_DAY = np.timedelta64(1, 'D')
+UNIX_EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def iso_to_datetime64(iso_dates):
+    """
+    Function to convert a column of ISO dates, e.g. '2018-03-02', to datetime64
+    Input parameters : iso_dates - list or array of text or bytes
+    Return parameters : numpy array of datetime64[D]
+    Raises ValueError if a value is not an ISO date
+    """
+    iso_dates = np.asarray(iso_dates)
+    if iso_dates.dtype.kind == 'O':
+        #Python str/bytes objects - let numpy pick a fixed width text type
+        iso_dates = iso_dates.astype(str)
+    return iso_dates.astype('datetime64[D]')
+
+
+def mpl_epoch():
+    """
+    Function to return the date matplotlib counts its date numbers from
+    Matplotlib 3.3 onwards uses 1970-01-01 (configurable), earlier versions
+    count 0001-01-01 as day 1.
+    Return parameters : numpy.datetime64[D]
+    """
+    #Imported here so the date conversions that do not need matplotlib (e.g.
+    #... unix time) do not pay for importing it
+    import matplotlib.dates as mdates
+    get_epoch = getattr(mdates, 'get_epoch', None)
+    if get_epoch is None:
+        return np.datetime64('0000-12-31', 'D')
+    return np.datetime64(get_epoch()).astype('datetime64[D]')
+
+
+def to_mpl_dates(dates):
+    """
+    Function to convert a column of dates to matplotlib date numbers, the same
+    values as matplotlib.dates.date2num() gives for each date
+    Input parameters : dates - array of datetime64 (or ISO text)
+    Return parameters : numpy array of float64
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    return (dates - mpl_epoch()) / ONE_DAY
+
+
+def from_mpl_dates(mpl_dates):
+    """
+    Function to convert matplotlib date numbers back to dates (whole days)
+    Input parameters : mpl_dates - array of float
+    Return parameters : numpy array of datetime64[D]
+    """
+    days = np.floor(np.asarray(mpl_dates, dtype=np.float64)).astype(np.int64)
+    return mpl_epoch() + days.astype('timedelta64[D]')
+
+
+def to_unix_time(dates):
+    """
+    Function to convert a column of dates to unix time, i.e. seconds since
+    1970-01-01 00:00 UTC
+    Input parameters : dates - array of datetime64 (or ISO text)
+    Return parameters : numpy array of int64
+    """
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    return (dates - UNIX_EPOCH).astype('timedelta64[s]').astype(np.int64)
+
+
+def from_unix_time(unix_times):
+    """
+    Function to convert a column of unix times to datetime64 (seconds)
+    Input parameters : unix_times - array of integers
+    Return parameters : numpy array of datetime64[s]
+    """
+    return np.asarray(unix_times, dtype=np.int64).astype('datetime64[s]')
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Local HTTP stand-in for the Alpha Vantage query service
+
+Serves canned TIME_SERIES_DAILY payloads from a directory so the download,
+cache & parsing code can be run without network access or an API key.
+A request for symbol=XXX&outputsize=YYY is answered with the first file
+found of
+1. <payload_dir>/XXX_YYY.json  e.g. MSFT_compact.json
+2. <payload_dir>/XXX.json
+and with an Alpha Vantage style "Error Message" payload otherwise.
+Payloads are gzip encoded if the request accepts it. File payloads are sent
+with ETag & Last-Modified headers & a conditional request for an unchanged
+file is answered 304 Not Modified.
+
+Use from the command line :  python stub_server.py <payload_dir> [port]
+then point the code at it with query_url='http://127.0.0.1:<port>/query'
+"""
+
+import email.utils
+import gzip
+import http.server
+import os
+import socketserver
+import sys
+import threading
+import urllib.parse
+
+ERROR_PAYLOAD = b'{\n    "Error Message": "Invalid API call. Unknown symbol"\n}'
+
+
+class ThreadingServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    HTTP server handling each connection on its own thread
+    """
+    daemon_threads = True
+
+
+class PayloadHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Request handler that answers GET /query?... with a canned payload file
+    The served directory is the payload_dir attribute of the server.
+    """
+    protocol_version = 'HTTP/1.1'       # Allow keep-alive connections
+
+    def do_GET(self):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(self.path).query)
+        symbol = query.get('symbol', [''])[0].upper()
+        outputsize = query.get('outputsize', ['compact'])[0]
+        self.server.requests.append((symbol, outputsize))
+
+        body = ERROR_PAYLOAD
+        validators = {}
+        for file_name in (symbol + '_' + outputsize + '.json', symbol + '.json'):
+            path = os.path.join(self.server.payload_dir, file_name)
+            if symbol and os.path.isfile(path):
+                status = os.stat(path)
+                validators = {'ETag': '"{:x}-{:x}"'.format(status.st_mtime_ns, status.st_size),
+                              'Last-Modified': email.utils.formatdate(status.st_mtime,
+                                                                      usegmt=True)}
+                if self._not_modified(validators):
+                    self.server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', validators['ETag'])
+                    self.end_headers()
+                    return
+                with open(path, 'rb') as payload_file:
+                    body = payload_file.read()
+                break
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in validators.items():
+            self.send_header(name, value)
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _not_modified(self, validators):
+        """
+        Function to check the conditional headers of the request against the
+        validators of the payload file
+        """
+        if_none_match = self.headers.get('If-None-Match')
+        if if_none_match is not None:
+            return validators['ETag'] in (tag.strip() for tag in if_none_match.split(','))
+        if_modified_since = self.headers.get('If-Modified-Since')
+        return if_modified_since == validators['Last-Modified']
+
+    def log_message(self, format, *args):
+        #Keep the console quiet - requests are recorded in server.requests
+        pass
+
+
+def start_server(payload_dir, port=0):
+    """
+    Function to start the stand-in server on a background thread
+    Input parameters
+    1. payload_dir - text/directory holding the payload files
+    2. port - integer/port number, 0 picks a free port
+    Return parameters : (server, query_url) - call server.shutdown() to stop.
+    server.requests is a list of (symbol, outputsize) for each request served
+    & server.not_modified the number answered 304 Not Modified
+    """
+    server = ThreadingServer(('127.0.0.1', port), PayloadHandler)
+    server.payload_dir = payload_dir
+    server.requests = []
+    server.not_modified = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, 'http://127.0.0.1:{}/query'.format(server.server_address[1])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage : python stub_server.py <payload_dir> [port]")
+        sys.exit(1)
+    local_server, local_url = start_server(sys.argv[1],
+                                           int(sys.argv[2]) if len(sys.argv) > 2 else 8000)
+    print("Serving {} at {} - press Ctrl+C to stop".format(sys.argv[1], local_url))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        local_server.shutdown()